@@ -23,14 +23,12 @@
 
 
 from __future__ import absolute_import
-from string_tools                             import StringTools
-from shell_command                            import ShellCommand
-import logging
-import shutil
-import os
-import sys
 
 class HistoMatplotlibProducer():
+    """
+    Main script (all.py) of the exported matplotlib scripts: the plots
+    themselves are drawn in-process by MatplotlibEngine.
+    """
 
     def __init__(self,histo_path,filenames):
         self.filenames  = []
@@ -39,14 +37,6 @@ class HistoMatplotlibProducer():
         self.histo_path = histo_path
 
 
-    def Execute(self):
-        if not self.WriteMainFile():
-            return False
-        if not self.LaunchInteractiveMatplotlib():
-            return False
-        return True
-        
-
     def WriteMainFile(self):
         output = open(self.histo_path+'/all.py','w')
         output.write('# Import all histograms\n')
@@ -63,24 +53,3 @@ class HistoMatplotlibProducer():
         output.close()
         return True
 
-
-    def LaunchInteractiveMatplotlib(self):
-        # Commands
-        theCommands=[sys.executable,'all.py']
-
-        # Log file name
-        logname=os.path.normpath(self.histo_path+'/matplotlib.log')
-
-        # Execute
-        logging.getLogger('MA5').debug('shell command: '+' '.join(theCommands))
-        ok, out= ShellCommand.ExecuteWithLog(theCommands,\
-                                             logname,\
-                                             self.histo_path,\
-                                             silent=False)
-        # return result
-        if not ok:
-            logging.getLogger('MA5').error('impossible to execute MatPlotLib. For more details, see the log file:')
-            logging.getLogger('MA5').error(logname)
-        return ok
-
-
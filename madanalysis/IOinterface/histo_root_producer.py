@@ -25,24 +25,108 @@
 from __future__ import absolute_import
 from string_tools                             import StringTools
 from shell_command                            import ShellCommand
+from madanalysis.system.process_pool          import ProcessPool
 import logging
 import shutil
 import os
 
 class HistoRootProducer():
 
-    def __init__(self,histo_path,filenames):
+    def __init__(self,histo_path,filenames,ncores=1):
         self.filenames  = []
         for filename in filenames:
             self.filenames.append((filename)+'.C')
         self.histo_path = histo_path
+        self.ncores     = max(1,min(ncores,len(self.filenames)))
 
 
     def Execute(self):
         if not self.WriteMainFile():
             return False
 #       if not self.LaunchInteractiveRoot():
-        if not self.LaunchCompileRoot():
+#       if not self.LaunchCompileRoot():
+        if not self.LaunchBatchRoot():
+            return False
+        return True
+
+
+    def WriteBatchFile(self,index,filenames):
+        """ Macro running a list of plot macros in the same ROOT session """
+        name   = 'batch_'+str(index)
+        output = open(self.histo_path+'/'+name+'.C','w')
+        output.write('void '+name+'()\n')
+        output.write('{\n')
+        output.write('  TStopwatch watch;\n')
+        output.write('  Int_t error = 0;\n')
+        output.write('  std::cout << "BEGIN-STAMP" << std::endl;\n')
+        for item in filenames:
+            myname=item.split('/')[-1][:-2]
+            output.write('\n  // '+myname+'\n')
+            output.write('  error = 0;\n')
+            output.write('  watch.Start();\n')
+            output.write('  gROOT->ProcessLine(".x '+item+'",&error);\n')
+            output.write('  watch.Stop();\n')
+            output.write('  gROOT->GetListOfCanvases()->Delete();\n')
+            output.write('  std::cout << "MA5-PLOT '+myname+' " << error << " " << watch.RealTime() << std::endl;\n')
+        output.write('\n  std::cout << "END-STAMP" << std::endl;\n')
+        output.write('}\n')
+        output.close()
+        return name
+
+
+    def RunBatch(self,name):
+        theCommands=['root','-l','-b','-q',name+'.C']
+        logname=os.path.normpath(self.histo_path+'/'+name+'.log')
+        logging.getLogger('MA5').debug('shell command: '+' '.join(theCommands))
+        ok, out= ShellCommand.ExecuteWithLog(theCommands,\
+                                             logname,\
+                                             self.histo_path,\
+                                             silent=False)
+        # Status of each plot
+        results = {}
+        if os.path.isfile(logname):
+            with open(logname,'r') as log:
+                for line in log:
+                    words = line.split()
+                    if len(words)==4 and words[0]=='MA5-PLOT':
+                        results[words[1]] = (int(words[2]),float(words[3]))
+        return results
+
+
+    def LaunchBatchRoot(self):
+        if len(self.filenames)==0:
+            return True
+
+        # The plots are shared among a few ROOT sessions running in parallel
+        chunks = [self.filenames[i::self.ncores] for i in range(self.ncores)]
+        names  = [self.WriteBatchFile(i,chunks[i]) for i in range(self.ncores)]
+        outputs = ProcessPool.Map(self.RunBatch,names,self.ncores)
+
+        # Report of each plot
+        nfailures = 0
+        for name, chunk, results in zip(names,chunks,outputs):
+            if results is None:
+                results = {}
+            for item in chunk:
+                myname=item.split('/')[-1][:-2]
+                if myname not in results:
+                    nfailures += 1
+                    logging.getLogger('MA5').warning('the histogram '+myname+' cannot be produced: '+\
+                                                     'the ROOT session stopped before it')
+                elif results[myname][0]!=0:
+                    nfailures += 1
+                    logging.getLogger('MA5').warning('the histogram '+myname+' cannot be produced: '+\
+                                                     'ROOT error code '+str(results[myname][0]))
+                else:
+                    logging.getLogger('MA5').debug('histogram '+myname+' rendered in '+\
+                                                   str(results[myname][1])+' s')
+            if len(chunk)!=len([x for x in results.values() if x[0]==0]):
+                logging.getLogger('MA5').warning('For more details, see the log file: '+\
+                                                 os.path.normpath(self.histo_path+'/'+name+'.log'))
+
+        # return result
+        if len(self.filenames)!=0 and nfailures==len(self.filenames):
+            logging.getLogger('MA5').error('impossible to execute ROOT: no histogram has been produced.')
             return False
         return True
         
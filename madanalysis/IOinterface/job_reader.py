@@ -26,15 +26,12 @@ from __future__ import absolute_import
 from madanalysis.selection.instance_name      import InstanceName
 from madanalysis.dataset.sample_info          import SampleInfo
 from madanalysis.layout.cut_info              import CutInfo
-from madanalysis.IOinterface.saf_block_status import SafBlockStatus
-from madanalysis.layout.histogram             import Histogram
-from madanalysis.layout.histogram_logx        import HistogramLogX
-from madanalysis.layout.histogram_frequency   import HistogramFrequency
+from madanalysis.IOinterface.saf_reader       import SafReader, SafHistoFile
+from madanalysis.IOinterface.saf_index        import SafIndex
 import glob
 import logging
 import shutil
 import os
-import copy
 
 
 class JobReader():
@@ -42,6 +39,7 @@ class JobReader():
     def __init__(self,jobdir):
         self.path   = jobdir
         self.safdir = os.path.normpath(self.path+"/Output/SAF/")
+        self.index  = SafIndex(os.path.normpath(self.path+"/Output/"))
 
     def CheckDir(self):
         if not os.path.isdir(self.path):
@@ -105,596 +103,177 @@ class JobReader():
         return results
 
 
-    def ExtractCutLine(self,words,numline,filename):
-
-        # Extracting xsection
-        try:
-            a=float(words[0])
-        except:
-            logging.getLogger('MA5').error("Counter is not a float value:"+words[0])
-
-        # Extracting xsection error
-        try:
-            b=float(words[1])
-        except:
-            logging.getLogger('MA5').error("Counter is not a float value:"+words[1])
-
-        # Returning exracting values
-        return [a,b]
-
-
-
-    def ExtractDescription(self,words,numline,filename):
-
-        # Extracting nbins
-        try:
-            a=int(words[0])
-        except:
-            logging.getLogger('MA5').error("nbin is not a int value:"+words[0])
-
-        # Extracting xmin
-        try:
-            b=float(words[1])
-        except:
-            logging.getLogger('MA5').error("xmin is not a float value:"+words[1])
-
-        # Extracting xmax
-        try:
-            c=float(words[2])
-        except:
-            logging.getLogger('MA5').error("xmax is not a float value:"+words[2])
-
-        # Returning exracting values
-        return [a,b,c]
-
-    def ExtractStatisticsInt(self,words,numline,filename):
-
-        # Extracting positive
-        try:
-            a=int(words[0])
-        except:
-            logging.getLogger('MA5').error(str(words[0])+' must be a positive integer value @ "'+filename+'" line='+str(numline))
-            a=0
-        if a<0:
-            logging.getLogger('MA5').error(str(words[0])+' must be a positive integer value @ "'+filename+'" line='+str(numline))
-            a=0
-
-        # Extracting negative
-        try:
-            b=int(words[1])
-        except:
-            logging.getLogger('MA5').error(str(words[1])+' must be a positive integer value @ "'+filename+'" line='+str(numline))
-            b=0
-        if b<0:
-            logging.getLogger('MA5').error(str(words[1])+' must be a positive integer value @ "'+filename+'" line='+str(numline))
-            b=0
-
-        # Returning exracting values
-        return [a,b]
-
-
-    def ExtractStatisticsFloat(self,words,numline,filename):
-
-        # Extracting positive
-        try:
-            a=float(words[0])
-        except:
-            logging.getLogger('MA5').error(str(words[0])+' must be a float value @ "'+filename+'" line='+str(numline))
-            a=0.
-
-        # Extracting negative
-        try:
-            b=float(words[1])
-        except:
-            logging.getLogger('MA5').error(str(words[1])+' must be a float value @ "'+filename+'" line='+str(numline))
-            b=0.
-
-        # Returning exracting values
-        return [a,b]
-
-
-    def ExtractDataFreq(self,words,numline,filename):
-
-        # Extracting label
-        try:
-            a=int(words[0])
-        except:
-            logging.getLogger('MA5').error(str(words[0])+' must be an integer value @ "'+filename+'" line='+str(numline))
-            a=0.
-
-        # Extracting positive
-        try:
-            b=float(words[1])
-        except:
-            logging.getLogger('MA5').error(str(words[1])+' must be a float value @ "'+filename+'" line='+str(numline))
-            b=0.
-
-        # Extracting negative
-        try:
-            c=float(words[2])
-        except:
-            logging.getLogger('MA5').error(str(words[2])+' must be a float value @ "'+filename+'" line='+str(numline))
-            c=0.
-
-        # Returning exracting values
-        return [a,b,c]
-
-
     # Extracting data from the SAF file
     # sample & file info -> dataset
     # cut counters       -> initial & cut
     # merging plots      -> merging
     # selection plots    -> plot
 
-    def ExtractGeneral(self,dataset):
+    def CheckSafTags(self,text,filename,prefix=''):
+        if not SafReader.HasBlock(text,'SAFheader'):
+            logging.getLogger('MA5').error(prefix+"SAF header <SAFheader> and </SAFheader> is not found.")
+        if not SafReader.HasBlock(text,'SAFfooter'):
+            logging.getLogger('MA5').error(prefix+"SAF footer <SAFfooter> and </SAFfooter> is not found.")
 
-        # Getting the output file name
-        name=InstanceName.Get(dataset.name)
-        filename = self.safdir+"/"+name+"/"+name+".saf"
 
-        # Opening the file
-        try:
-            file = open(filename,'r')
-        except:
-            logging.getLogger('MA5').error("File called '"+filename+"' is not found")
-            return
-
-        # Initializing tags
-        beginTag       = SafBlockStatus()
-        endTag         = SafBlockStatus()
-        globalTag      = SafBlockStatus()
-        detailTag      = SafBlockStatus()
-
-        # Loop over the lines
-        numline=0
-        for line in file:
-
-            # Incrementing line counter
-            numline+=1
-
-            # Removing comments
-            index=line.find('#')
-            if index!=-1:
-                line=line[:index]
-
-            # Treating line
-            line=line.lstrip()
-            line=line.rstrip()
+    def ParseGeneral(self,dataset,filename):
+
+        # Reading the file
+        text = SafReader.Read(filename)
+        if text is None:
+            return None
+        self.CheckSafTags(text,filename)
+        content = {'global': None, 'detail': []}
+
+        # Summary sample info
+        blocks = SafReader.Blocks(text,'SampleGlobalInfo')
+        for line in SafReader.Lines(''.join(blocks)):
             words=line.split()
-            if len(words)==0:
-                continue
-
-            # Looking for tag 'SampleGlobalInfo'
-            if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
-                if words[0].lower()=='<safheader>':
-                    beginTag.activate()
-                elif words[0].lower()=='</safheader>':
-                    beginTag.desactivate()
-                if words[0].lower()=='<saffooter>':
-                    endTag.activate()
-                elif words[0].lower()=='</saffooter>':
-                    endTag.desactivate()
-                if words[0].lower()=='<sampleglobalinfo>':
-                    globalTag.activate()
-                elif words[0].lower()=='</sampleglobalinfo>':
-                    globalTag.desactivate()
-                elif words[0].lower()=='<sampledetailedinfo>':
-                    detailTag.activate()
-                elif words[0].lower()=='</sampledetailedinfo>':
-                    detailTag.desactivate()
-
-            # Looking for summary sample info
-            elif globalTag.activated and len(words)==5:
-                dataset.measured_global = self.ExtractSampleInfo(words,numline,filename)
-
-            # Looking for detail sample info (one line for each file)
-            elif detailTag.activated and len(words)==5:
-                dataset.measured_detail.append(self.ExtractSampleInfo(words,numline,filename))
-
-        # Information found ?
-        if beginTag.Nactivated==0 or beginTag.activated:
-            logging.getLogger('MA5').error("SAF header <SAFheader> and </SAFheader> is not found.")
-        if endTag.Nactivated==0 or endTag.activated:
-            logging.getLogger('MA5').error("SAF footer <SAFfooter> and </SAFfooter> is not found.")
-        if globalTag.Nactivated==0 or globalTag.activated:
+            if len(words)==5:
+                content['global'] = vars(self.ExtractSampleInfo(words,0,filename))
+        if len(blocks)==0:
             logging.getLogger('MA5').error("Information corresponding to the block "+\
                           "<SampleGlobalInfo> is not found.")
             logging.getLogger('MA5').error("Information on the dataset '"+dataset.name+\
                           "' are not updated.")
-        if detailTag.Nactivated==0 or globalTag.activated:
+
+        # Detail sample info (one line for each file)
+        blocks = SafReader.Blocks(text,'SampleDetailedInfo')
+        for line in SafReader.Lines(''.join(blocks)):
+            words=line.split()
+            if len(words)==5:
+                content['detail'].append(vars(self.ExtractSampleInfo(words,0,filename)))
+        if len(blocks)==0:
             logging.getLogger('MA5').error("Information corresponding to the block "+\
                           "<SampleDetailInfo> is not found.")
             logging.getLogger('MA5').error("Information on the dataset '"+dataset.name+\
                           "' are not updated.")
+        return content
 
-        # Closing the file
-        file.close()
 
-    def ExtractHistos(self,dataset,plot,merging=False):
+    def ExtractGeneral(self,dataset):
+
         # Getting the output file name
         name=InstanceName.Get(dataset.name)
+        filename = self.safdir+"/"+name+"/"+name+".saf"
+
+        # Content from the index, or from the SAF file
+        content = self.index.Get(filename)
+        if content is None:
+            content = self.ParseGeneral(dataset,filename)
+            if content is None:
+                return
+            self.index.Set(filename,content)
+
+        # Filling the dataset
+        if content['global'] is not None:
+            dataset.measured_global = SampleInfo()
+            dataset.measured_global.__dict__.update(content['global'])
+        for item in content['detail']:
+            dataset.measured_detail.append(SampleInfo())
+            dataset.measured_detail[-1].__dict__.update(item)
+
+
+    def LastDirectory(self,path,prefix):
+        """ Last directory of the series <prefix>0, <prefix>1, ... in a folder """
+        try:
+            names = set(os.listdir(path))
+        except OSError:
+            names = set()
         i=0
+        while prefix+str(i) in names:
+            i+=1
+        return path+"/"+prefix+str(i-1)
+
+
+    def ExtractHistos(self,dataset,plot,merging=False):
+        # Getting the output file name
+        name=InstanceName.Get(dataset.name)
         if merging:
-            while(os.path.isdir(self.safdir+"/"+name+"/MergingPlots_"+str(i))):
-                i+=1
-            filename = self.safdir+"/"+name+"/MergingPlots_"+str(i-1)+"/Histograms/histos.saf"
+            filename = self.LastDirectory(self.safdir+"/"+name,"MergingPlots_")+"/Histograms/histos.saf"
         else:
-            while(os.path.isdir(self.safdir+"/"+name+"/MadAnalysis5job_"+str(i))):
-                i+=1
-            filename = self.safdir+"/"+name+"/MadAnalysis5job_"+str(i-1)+"/Histograms/histos.saf"
+            filename = self.LastDirectory(self.safdir+"/"+name,"MadAnalysis5job_")+"/Histograms/histos.saf"
+
+        # Histograms from the index, or decoded from the SAF file
+        histos = self.index.GetHistos(filename)
+        if histos is None:
+            histos = SafHistoFile(filename)
+            self.CheckSafTags(histos.text,filename,'histos.saf: ')
+            histos = list(histos)
+            if os.path.isfile(filename):
+                self.index.SetHistos(filename,histos)
+        plot.histos.extend(histos)
+
+
+    def ParseCuts(self,myfile):
+        # Reading the file
+        text = SafReader.Read(myfile)
+        if text is None:
+            return None
+        self.CheckSafTags(text,myfile,myfile.split('/')[-1]+": ")
+        fields = ['nentries','sumw','sumw2']
+
+        # Initial counter
+        content = {'initial': {}, 'cuts': []}
+        for block in SafReader.Blocks(text,'InitialCounter'):
+            for row, field in zip(self.ExtractCounters(block,myfile),fields):
+                content['initial'][field+'_pos'] = float(row[0])
+                content['initial'][field+'_neg'] = float(row[1])
+
+        # Cut counters
+        for block in SafReader.Blocks(text,'Counter'):
+            cutinfo = CutInfo()
+            names = [x for x in SafReader.Lines(block) if '"' in x]
+            if len(names)!=0:
+                cutinfo.cutname = names[0]
+            for row, field in zip(self.ExtractCounters(block,myfile),fields):
+                setattr(cutinfo,field+'_pos',float(row[0]))
+                setattr(cutinfo,field+'_neg',float(row[1]))
+            cutinfo.cutregion = myfile.split('/')[-1].split('.')[:-1]
+            content['cuts'].append(vars(cutinfo))
+        return content
 
-        # Opening the file
-        try:
-            file = open(filename,'r')
-        except:
-            logging.getLogger('MA5').error("File called '"+filename+"' is not found")
-            return
-
-        # Initializing tags
-        beginTag       = SafBlockStatus()
-        endTag         = SafBlockStatus()
-        histoTag       = SafBlockStatus()
-        histoLogXTag   = SafBlockStatus()
-        histoFreqTag   = SafBlockStatus()
-        descriptionTag = SafBlockStatus()
-        statisticsTag  = SafBlockStatus()
-        dataTag        = SafBlockStatus()
-
-        # Initializing temporary containers
-        histoinfo     = Histogram() 
-        histologxinfo = HistogramLogX() 
-        histofreqinfo = HistogramFrequency()
-        data_positive = []
-        data_negative = []
-        labels        = []
-
-        # Loop over the lines
-        numline=0
-        for line in file:
-            # Incrementing line counter
-            numline+=1
-
-            # Removing comments
-            index=line.find('#')
-            if index!=-1:
-                line=line[:index]
-
-            # Treating line
-            line=line.lstrip()
-            line=line.rstrip()
-            words=line.split()
-            if len(words)==0:
-                continue
-
-            # decoding the file
-            if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
-                if words[0].lower()=='<safheader>':
-                    beginTag.activate()
-                elif words[0].lower()=='</safheader>':
-                    beginTag.desactivate()
-                elif words[0].lower()=='<saffooter>':
-                    endTag.activate()
-                elif words[0].lower()=='</saffooter>':
-                    endTag.desactivate()
-                elif words[0].lower()=='<description>':
-                    descriptionTag.activate()
-                elif words[0].lower()=='</description>':
-                    descriptionTag.desactivate()
-                elif words[0].lower()=='<statistics>':
-                    statisticsTag.activate()
-                elif words[0].lower()=='</statistics>':
-                    statisticsTag.desactivate()
-                elif words[0].lower()=='<data>':
-                    dataTag.activate()
-                elif words[0].lower()=='</data>':
-                    dataTag.desactivate()
-                elif words[0].lower()=='<histo>':
-                    histoTag.activate()
-                elif words[0].lower()=='</histo>':
-                    histoTag.desactivate()
-                    plot.histos.append(copy.copy(histoinfo))
-                    plot.histos[-1].positive.array = data_positive[:]
-                    plot.histos[-1].negative.array = data_negative[:]
-                    histoinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-                elif words[0].lower()=='<histofrequency>':
-                    histoFreqTag.activate()
-                elif words[0].lower()=='</histofrequency>':
-                    histoFreqTag.desactivate()
-                    plot.histos.append(copy.copy(histofreqinfo))
-                    plot.histos[-1].labels = labels[:]
-                    plot.histos[-1].positive.array = data_positive[:]
-                    plot.histos[-1].negative.array = data_negative[:]
-                    histofreqinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-                    labels        = []
-                elif words[0].lower()=='<histologx>':
-                    histoLogXTag.activate()
-                elif words[0].lower()=='</histologx>':
-                    histoLogXTag.desactivate()
-                    plot.histos.append(copy.copy(histologxinfo))
-                    plot.histos[-1].positive.array = data_positive[:]
-                    plot.histos[-1].negative.array = data_negative[:]
-                    histologxinfo.Reset()
-                    data_positive = []
-                    data_negative = []
-
-            # Looking from histogram description
-            elif descriptionTag.activated:
-                if descriptionTag.Nlines==0:
-                    if len(line)>1 and line[0]=='"' and line[-1]=='"':
-                        myname=line[1:-1]
-                        if histoTag.activated:
-                            histoinfo.name=myname
-                        elif histoLogXTag.activated:
-                            histologxinfo.name=myname
-                        elif histoFreqTag.activated:
-                            histofreqinfo.name=myname
-                    else:
-                        logging.getLogger('MA5').error('invalid name for histogram @ line=' + str(numline) +' : ')
-                        logging.getLogger('MA5').error(str(line))
-                elif descriptionTag.Nlines==1 and not histoFreqTag.activated and len(words)==3:
-                    results = self.ExtractDescription(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.nbins=results[0]
-                        histoinfo.xmin=results[1]
-                        histoinfo.xmax=results[2]
-                    elif histoLogXTag.activated:
-                        histologxinfo.nbins=results[0]
-                        histologxinfo.xmin=results[1]
-                        histologxinfo.xmax=results[2]
-                    else:
-                        logging.getLogger('MA5').error('invalid histogram description @ line=' + str(numline) +' : ')
-                        logging.getLogger('MA5').error(str(line))
-                elif descriptionTag.Nlines>=1:
-                    if histoTag.activated and len(words)==1:
-                        histoinfo.regions.append(words[0])
-                    elif histoLogXTag.activated and len(words)==1:
-                        histologxinfo.regions.append(words[0])
-                    elif histoFreqTag.activated and len(words)==1:
-                        histofreqinfo.regions.append(words[0])
-                    else:
-                        logging.getLogger('MA5').error('invalid region for a histogram @ line=' + str(numline) +' : ')
-                        logging.getLogger('MA5').error(str(line))
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                descriptionTag.newline()
-
-            # Looking from histogram statistics
-            elif statisticsTag.activated and len(words)==2:
-                if statisticsTag.Nlines==0:
-                    results = self.ExtractStatisticsInt(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.nevents=results[0]
-                        histoinfo.negative.nevents=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.nevents=results[0]
-                        histologxinfo.negative.nevents=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.nevents=results[0]
-                        histofreqinfo.negative.nevents=results[1]
-
-                elif statisticsTag.Nlines==1:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumwentries=results[0]
-                        histoinfo.negative.sumwentries=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumwentries=results[0]
-                        histologxinfo.negative.sumwentries=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.sumwentries=results[0]
-                        histofreqinfo.negative.sumwentries=results[1]
-
-                elif statisticsTag.Nlines==2:
-                    results = self.ExtractStatisticsInt(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.nentries=results[0]
-                        histoinfo.negative.nentries=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.nentries=results[0]
-                        histologxinfo.negative.nentries=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.nentries=results[0]
-                        histofreqinfo.negative.nentries=results[1]
-
-                elif statisticsTag.Nlines==3:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw=results[0]
-                        histoinfo.negative.sumw=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw=results[0]
-                        histologxinfo.negative.sumw=results[1]
-                    elif histoFreqTag.activated:
-                        histofreqinfo.positive.sumw=results[0]
-                        histofreqinfo.negative.sumw=results[1]
-
-                elif statisticsTag.Nlines==4 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw2=results[0]
-                        histoinfo.negative.sumw2=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw2=results[0]
-                        histologxinfo.negative.sumw2=results[1]
-
-                elif statisticsTag.Nlines==5 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumwx=results[0]
-                        histoinfo.negative.sumwx=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumwx=results[0]
-                        histologxinfo.negative.sumwx=results[1]
-
-                elif statisticsTag.Nlines==6 and not histoFreqTag.activated:
-                    results = self.ExtractStatisticsFloat(words,numline,filename)
-                    if histoTag.activated:
-                        histoinfo.positive.sumw2x=results[0]
-                        histoinfo.negative.sumw2x=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.sumw2x=results[0]
-                        histologxinfo.negative.sumw2x=results[1]
-
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                statisticsTag.newline()
-
-            # Looking from histogram data [ histo and histoLogX ]
-            elif dataTag.activated and len(words)==2 and (histoTag.activated or histoLogXTag.activated):
-                results = self.ExtractStatisticsFloat(words,numline,filename)
-                if dataTag.Nlines==0:
-                    if histoTag.activated:
-                        histoinfo.positive.underflow=results[0]
-                        histoinfo.negative.underflow=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.underflow=results[0]
-                        histologxinfo.negative.underflow=results[1]
-                elif dataTag.Nlines==(histoinfo.nbins+1):
-                    if histoTag.activated:
-                        histoinfo.positive.overflow=results[0]
-                        histoinfo.negative.overflow=results[1]
-                    elif histoLogXTag.activated:
-                        histologxinfo.positive.overflow=results[0]
-                        histologxinfo.negative.overflow=results[1]
-                elif dataTag.Nlines>=1 and dataTag.Nlines<=histoinfo.nbins:
-                    if histoTag.activated or histoLogXTag.activated:
-                        data_positive.append(results[0])
-                        data_negative.append(results[1])
-                else:
-                    logging.getLogger('MA5').warning('Extra line is found: '+line)
-                dataTag.newline()
-
-            # Looking from histogram data [ histoFreq ]
-            elif dataTag.activated and len(words)==3 and histoFreqTag.activated:
-                results = self.ExtractDataFreq(words,numline,filename)
-                labels.append(results[0])
-                data_positive.append(results[1])
-                data_negative.append(results[2])
-                dataTag.newline()    
-
-        # Information found ?
-        if beginTag.Nactivated==0 or beginTag.activated:
-            logging.getLogger('MA5').error("histos.saf: SAF header <SAFheader> and </SAFheader> is not found.")
-        if endTag.Nactivated==0 or endTag.activated:
-            logging.getLogger('MA5').error("histos.saf: SAF footer <SAFfooter> and </SAFfooter> is not found.")
-
-        # Closing the file
-        file.close()
 
     def ExtractCuts(self,dataset,cut):
         # Getting the output file name
         name=InstanceName.Get(dataset.name)
-        i=0
-        while(os.path.isdir(self.safdir+"/"+name+"/MadAnalysis5job_"+str(i))):
-            i+=1
-        filenames = sorted(glob.glob(self.safdir+"/"+name+"/MadAnalysis5job_"+str(i-1)+"/Cutflows/*.saf"))
+        jobdir=self.LastDirectory(self.safdir+"/"+name,"MadAnalysis5job_")
+        filenames = sorted(glob.glob(jobdir+"/Cutflows/*.saf"))
 
         # Treating the files one by one
         for myfile in filenames:
-            # Opening the file
-            try:
-                file = open(myfile,'r')
-            except:
-                logging.getLogger('MA5').error("File called '"+myfile+"' is not found")
-                return
-
-            # Initializing tags
-            beginTag       = SafBlockStatus()
-            endTag         = SafBlockStatus()
-            initialTag     = SafBlockStatus()
-            cutTag         = SafBlockStatus()
-            cutinfo       = CutInfo()
+            # Content from the index, or from the SAF file
+            content = self.index.Get(myfile)
+            if content is None:
+                content = self.ParseCuts(myfile)
+                if content is None:
+                    return
+                self.index.Set(myfile,content)
+
+            # Filling the cutflow
+            cut.initial.__dict__.update(content['initial'])
             cutflow_for_region = []
+            for item in content['cuts']:
+                cutflow_for_region.append(CutInfo())
+                cutflow_for_region[-1].__dict__.update(item)
+            cut.cuts.append(cutflow_for_region)
+
 
-            # Loop over the lines
-            numline=0
-            for line in file:
-
-                # Incrementing line counter
-                numline+=1
-
-                # Removing comments
-                index=line.find('#')
-                if index!=-1:
-                    line=line[:index]
-
-                # Treating line
-                line=line.lstrip()
-                line=line.rstrip()
-                words=line.split()
-                if len(words)==0:
-                    continue
-
-                # Looking for tag 'SampleGlobalInfo'
-                if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
-                    if words[0].lower()=='<safheader>':
-                        beginTag.activate()
-                    elif words[0].lower()=='</safheader>':
-                        beginTag.desactivate()
-                    elif words[0].lower()=='<saffooter>':
-                        endTag.activate()
-                    elif words[0].lower()=='</saffooter>':
-                        endTag.desactivate()
-                    elif words[0].lower()=='<initialcounter>':
-                        initialTag.activate()
-                    elif words[0].lower()=='</initialcounter>':
-                        initialTag.desactivate()
-                    elif words[0].lower()=='<counter>':
-                        cutTag.activate()
-                    elif words[0].lower()=='</counter>':
-                        cutTag.desactivate()
-                        cutinfo.cutregion = myfile.split('/')[-1].split('.')[:-1]
-                        cutflow_for_region.append(copy.copy(cutinfo))
-                        cutinfo.Reset()
-
-                elif initialTag.activated and len(words)==2:
-                    results = self.ExtractCutLine(words,numline,myfile)
-                    if initialTag.Nlines==0:
-                        cut.initial.nentries_pos = results[0]
-                        cut.initial.nentries_neg = results[1]
-                    elif initialTag.Nlines==1:
-                        cut.initial.sumw_pos = results[0]
-                        cut.initial.sumw_neg = results[1]
-                    elif initialTag.Nlines==2:
-                        cut.initial.sumw2_pos = results[0]
-                        cut.initial.sumw2_neg = results[1]
-                    else:
-                        logging.getLogger('MA5').warning('Extra line is found: '+line)
-                    initialTag.newline()
-
-                # Looking for cut counter
-                elif cutTag.activated and '"' in line:
-                    if cutTag.Nlines==0:
-                        cutinfo.cutname = line.strip()
-                    else:
-                        logging.getLogger('MA5').warning('Extra line is found: '+line)
-                    cutTag.newline()
-
-                elif cutTag.activated and len(words)==2:
-                    results = self.ExtractCutLine(words,numline,myfile)
-                    if cutTag.Nlines==1:
-                        cutinfo.nentries_pos = results[0]
-                        cutinfo.nentries_neg = results[1]
-                    elif cutTag.Nlines==2:
-                        cutinfo.sumw_pos = results[0]
-                        cutinfo.sumw_neg = results[1]
-                    elif cutTag.Nlines==3:
-                        cutinfo.sumw2_pos = results[0]
-                        cutinfo.sumw2_neg = results[1]
-                    else:
-                        logging.getLogger('MA5').warning('Extra line is found: '+line)
-                    cutTag.newline()
-
-            # Information found ?
-            if beginTag.Nactivated==0 or beginTag.activated:
-                logging.getLogger('MA5').error(myfile.split('/')[-1]+": SAF header <SAFheader> and </SAFheader> is not found.")
-            if endTag.Nactivated==0 or endTag.activated:
-                logging.getLogger('MA5').error(myfile.split('/')[-1]+": SAF footer <SAFfooter> and </SAFfooter> is not found.")
-
-            # Closing the file
-            file.close()
-            cut.cuts.append(copy.copy(cutflow_for_region))
+    def Extract(self,dataset,cut,merging,plot,withmerging):
+        self.ExtractGeneral(dataset)
+        self.ExtractHistos(dataset,plot)
+        self.ExtractCuts(dataset,cut)
+        if withmerging:
+            self.ExtractHistos(dataset,merging,merging=True)
+
+
+    def SaveIndex(self):
+        return self.index.Save()
+
+
+    def ExtractCounters(self,block,filename):
+        try:
+            return SafReader.Numbers('\n'.join(x for x in SafReader.Lines(block) if '"' not in x),2)
+        except ValueError:
+            logging.getLogger('MA5').error('Counter is not a float value @ "'+filename+'"')
+            return []
@@ -27,6 +27,8 @@ from madanalysis.selection.instance_name      import InstanceName
 from madanalysis.IOinterface.folder_writer    import FolderWriter
 from shell_command                            import ShellCommand
 from madanalysis.enumeration.ma5_running_type import MA5RunningType
+import hashlib
+import json
 import logging
 import shutil
 import os
@@ -884,6 +886,82 @@ class JobWriter(object):
         return result
 
 
+    def BuildHash(self):
+        """
+        Hash of what determines the SampleAnalyzer executable and its runs:
+        generated analysis code, main program, Makefile and setup files
+        (compilation and link options), cards of the Input folder and
+        running options.
+        """
+        hasher = hashlib.sha1()
+        names = []
+        for folder in ['Build/SampleAnalyzer/User/Analyzer','Build/Main']:
+            if os.path.isdir(self.path+'/'+folder):
+                names.extend(sorted(folder+'/'+x for x in os.listdir(self.path+'/'+folder) \
+                                    if x.endswith('.h') or x.endswith('.cpp')))
+        names.extend(['Build/Makefile','Build/setup.sh','Build/setup.csh'])
+        if os.path.isdir(self.path+'/Input'):
+            names.extend(sorted('Input/'+x for x in os.listdir(self.path+'/Input') if not x.endswith('.list')))
+        for name in names:
+            if not os.path.isfile(self.path+'/'+name):
+                continue
+            hasher.update(name.encode('utf-8'))
+            with open(self.path+'/'+name,'rb') as stream:
+                hasher.update(stream.read())
+        hasher.update((self.main.archi_info.ma5_version+';'+self.main.archi_info.ma5_date+';'+\
+                       str(self.output)).encode('utf-8'))
+        return hasher.hexdigest()
+
+
+    def DatasetHash(self,dataset):
+        """ Hash of the inputs of a SampleAnalyzer run over a dataset (names, sizes and times of the files) """
+        hasher = hashlib.sha1()
+        for filename in dataset.filenames:
+            try:
+                info  = os.stat(filename)
+                stamp = str(info.st_ino)+';'+str(info.st_size)+';'+repr(info.st_mtime)
+            except OSError:
+                stamp = 'missing'
+            hasher.update((filename+';'+stamp+'\n').encode('utf-8'))
+        hasher.update(str(dataset.weighted_events).encode('utf-8'))
+        return hasher.hexdigest()
+
+
+    def ReadSubmitState(self):
+        """ Hashes saved by the last submission ({} if not available) """
+        try:
+            with open(self.path+'/Build/submit_state.json','r') as stream:
+                state = json.load(stream)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(state,dict) or not isinstance(state.get('datasets'),dict):
+            return {}
+        return state
+
+
+    def WriteSubmitState(self,state):
+        try:
+            with open(self.path+'/Build/submit_state.json','w') as stream:
+                json.dump(state,stream,indent=1,sort_keys=True)
+        except (IOError, OSError) as err:
+            logging.getLogger('MA5').debug('Cannot save the submission state: '+str(err))
+            return False
+        return True
+
+
+    def IsBuilt(self,state):
+        """ True if the executable exists and was built from the current sources """
+        return os.path.isfile(self.path+'/Build/MadAnalysis5job') and \
+               state.get('build')==self.BuildHash()
+
+
+    def IsAnalyzed(self,state,dataset):
+        """ True if the SAF output of the dataset was produced from the current inputs """
+        name = InstanceName.Get(dataset.name)
+        return os.path.isfile(self.path+'/Output/SAF/'+name+'/'+name+'.saf') and \
+               state.get('datasets',{}).get(name)==self.DatasetHash(dataset)
+
+
     def WriteHistory(self,history,firstdir):
         file = open(self.path+"/history.ma5","w")
         file.write('set main.currentdir = '+firstdir+'\n') 
@@ -922,6 +1000,54 @@ class JobWriter(object):
         if not os.path.isdir(self.path+"/Output/SAF/"+name):
             os.mkdir(self.path+"/Output/SAF/"+name)
 
+        # Sharding the dataset (not possible when events are written)
+        nshards = min(self.main.nshards, len(dataset.filenames))
+        if nshards>1 and self.output=="":
+            return self.RunShardedJob(dataset,nshards)
+
+        # Running SampleAnalyzer
+        return self.RunSampleAnalyzer(dataset,name)
+
+
+    def RunShardedJob(self,dataset,nshards):
+        from madanalysis.IOinterface.saf_merger import SAFMerger
+        from madanalysis.system.process_pool    import ProcessPool
+
+        # Splitting the list of files into contiguous shards
+        name       = InstanceName.Get(dataset.name)
+        filenames  = list(dataset.filenames)
+        shardnames = [name+'_shard'+str(i) for i in range(nshards)]
+        shards     = [self.path+"/Output/SAF/"+x for x in shardnames]
+        try:
+            for i in range(nshards):
+                if os.path.isdir(shards[i]):
+                    FolderWriter.RemoveDirectory(shards[i])
+                os.mkdir(shards[i])
+                first = (i*len(filenames))//nshards
+                last  = ((i+1)*len(filenames))//nshards
+                with open(self.path+"/Input/"+shardnames[i]+".list","w") as output:
+                    for item in filenames[first:last]:
+                        output.write(item+"\n")
+
+            # Running the shards concurrently
+            logging.getLogger('MA5').info('   Running SampleAnalyzer over '+str(nshards)+' shards of the dataset...')
+            results = ProcessPool.Map(lambda x : self.RunSampleAnalyzer(dataset,x), shardnames, nshards)
+            if not all(results):
+                return False
+
+            # Merging the outputs
+            return SAFMerger.Merge(shards, shardnames, self.path+"/Output/SAF/"+name, name)
+
+        # Removing the shards, whatever the result
+        finally:
+            for i in range(nshards):
+                FolderWriter.RemoveDirectory(shards[i])
+                if os.path.isfile(self.path+"/Input/"+shardnames[i]+".list"):
+                    os.remove(self.path+"/Input/"+shardnames[i]+".list")
+
+
+    def RunSampleAnalyzer(self,dataset,listname):
+
         # folder where the program is launched
         folder = self.path+'/Build/'
 
@@ -938,7 +1064,7 @@ class JobWriter(object):
                         self.main.archi_info.ma5_date+'"')
 
         # Inputs
-        commands.append('../Input/'+name+'.list')
+        commands.append('../Input/'+listname+'.list')
 
         # Running SampleAnalyzer
         if self.main.redirectSAlogger:
@@ -0,0 +1,185 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Binary index of the SAF outputs of a job.
+
+The content extracted from the SAF files is saved next to the SAF tree:
+a JSON manifest (SAF_index.json) with, for each file, its modification
+time, size and SHA-1 hash and the decoded information; and a NumPy file
+(SAF_index.npy) with the bin contents of all the histograms, which is
+memory-mapped when the index is loaded. An entry is used only if its SAF
+file is unchanged (same size, and same time or same hash).
+"""
+
+from __future__ import absolute_import
+from madanalysis.layout.histogram           import Histogram
+from madanalysis.layout.histogram_logx      import HistogramLogX
+from madanalysis.layout.histogram_frequency import HistogramFrequency
+import hashlib
+import json
+import logging
+import numpy
+import os
+
+
+class SafIndex(object):
+
+    version = 1
+    kinds   = {'Histogram': Histogram, 'HistogramLogX': HistogramLogX,
+               'HistogramFrequency': HistogramFrequency}
+
+    def __init__(self, path):
+        self.path     = os.path.normpath(path)
+        self.manifest = os.path.join(self.path, 'SAF_index.json')
+        self.datafile = os.path.join(self.path, 'SAF_index.npy')
+        self.entries  = {}
+        self.data     = numpy.zeros(0)
+        self.changed  = False
+        self.logger   = logging.getLogger('MA5')
+        self.Load()
+
+    def Load(self):
+        if not os.path.isfile(self.manifest) or not os.path.isfile(self.datafile):
+            return
+        try:
+            with open(self.manifest, 'r') as stream:
+                manifest = json.load(stream)
+            if manifest.get('version')!=SafIndex.version:
+                return
+            try:
+                self.data = numpy.load(self.datafile, mmap_mode='r')
+            except ValueError:
+                self.data = numpy.load(self.datafile)
+            self.entries = manifest['entries']
+        except (IOError, OSError, ValueError, KeyError) as err:
+            self.logger.debug('Cannot read the SAF index '+self.manifest+': '+str(err))
+            self.entries = {}
+
+    @staticmethod
+    def Hash(filename):
+        hasher = hashlib.sha1()
+        with open(filename, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(1 << 20), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def Key(self, filename):
+        return os.path.relpath(os.path.normpath(filename), self.path)
+
+    def Get(self, filename):
+        """ Content indexed for a SAF file, or None if missing or out of date """
+        entry = self.entries.get(self.Key(filename))
+        if entry is None or not os.path.isfile(filename):
+            return None
+        info = os.stat(filename)
+        if info.st_size!=entry['size']:
+            return None
+        if info.st_mtime!=entry['mtime']:
+            if SafIndex.Hash(filename)!=entry['sha1']:
+                return None
+            entry['mtime'] = info.st_mtime
+            self.changed   = True
+        return entry['content']
+
+    def Set(self, filename, content):
+        info = os.stat(filename)
+        self.entries[self.Key(filename)] = {'mtime'  : info.st_mtime,
+                                            'size'   : info.st_size,
+                                            'sha1'   : SafIndex.Hash(filename),
+                                            'content': content}
+        self.changed = True
+
+    def GetHistos(self, filename):
+        records = self.Get(filename)
+        if records is None:
+            return None
+        histos = []
+        for record in records:
+            histo = SafIndex.kinds[record['kind']]()
+            for key, value in record['info'].items():
+                setattr(histo, key, value)
+            for core in ['positive', 'negative']:
+                for key, value in record[core].items():
+                    setattr(getattr(histo, core), key, value)
+            if 'arrays' in record:
+                histo.positive.array, histo.negative.array = [x.copy() for x in record['arrays']]
+            else:
+                begin, size = record['offset'], record['nbins']
+                histo.positive.array = numpy.array(self.data[begin:begin+size])
+                histo.negative.array = numpy.array(self.data[begin+size:begin+2*size])
+            histos.append(histo)
+        return histos
+
+    def SetHistos(self, filename, histos):
+        records = []
+        for histo in histos:
+            record = {'kind': histo.__class__.__name__,
+                      'info': {'name': histo.name, 'nbins': histo.nbins, 'xmin': histo.xmin,
+                               'xmax': histo.xmax, 'regions': list(histo.regions)},
+                      'nbins': len(histo.positive.array)}
+            if hasattr(histo, 'labels'):
+                record['info']['labels'] = list(histo.labels)
+            for core in ['positive', 'negative']:
+                record[core] = dict((key, value) for key, value in vars(getattr(histo, core)).items() \
+                                    if key!='array')
+            record['arrays'] = (numpy.array(histo.positive.array, dtype=float),
+                                numpy.array(histo.negative.array, dtype=float))
+            records.append(record)
+        self.Set(filename, records)
+
+    def Save(self):
+        """ Writing the index (entries of the removed SAF files are dropped) """
+        if not self.changed:
+            return True
+        arrays = []
+        offset = 0
+        for key in list(self.entries.keys()):
+            if not os.path.isfile(os.path.join(self.path, key)):
+                del self.entries[key]
+                continue
+            content = self.entries[key]['content']
+            if not isinstance(content, list):
+                continue
+            for record in content:
+                if 'arrays' in record:
+                    arrays.extend(record.pop('arrays'))
+                else:
+                    arrays.append(self.data[record['offset']:record['offset']+2*record['nbins']])
+                record['offset'] = offset
+                offset += 2*record['nbins']
+        try:
+            with open(self.datafile+'.tmp', 'wb') as stream:
+                numpy.save(stream, numpy.concatenate(arrays) if len(arrays)!=0 else numpy.zeros(0))
+            with open(self.manifest+'.tmp', 'w') as stream:
+                json.dump({'version': SafIndex.version, 'entries': self.entries}, stream)
+            os.rename(self.datafile+'.tmp', self.datafile)
+            os.rename(self.manifest+'.tmp', self.manifest)
+        except (IOError, OSError, TypeError, ValueError) as err:
+            self.logger.warning('Cannot write the SAF index '+self.manifest+': '+str(err))
+            self.entries = {}
+            return False
+        self.data    = numpy.load(self.datafile, mmap_mode='r') if offset!=0 else numpy.zeros(0)
+        self.changed = False
+        return True
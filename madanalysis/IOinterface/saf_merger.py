@@ -0,0 +1,271 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+from __future__ import absolute_import
+import filecmp
+import logging
+import math
+import os
+import re
+import shutil
+
+
+class SAFMerger():
+    """
+    Merging the SAF outputs of several SampleAnalyzer runs over disjoint
+    subsets of the files of a dataset (shards). The merged files have the
+    layout of the ones SampleAnalyzer writes for a single run.
+    """
+
+    # Blocks whose numbers are summed over the shards
+    summed_blocks = ['<statistics>', '<data>', '<initialcounter>', '<counter>']
+
+    token = re.compile(r'(\S+)(\s*)')
+
+
+    @staticmethod
+    def SplitComment(line):
+        index = line.find('#')
+        if index==-1:
+            return line.rstrip('\n'), ''
+        return line[:index], line[index:].rstrip('\n')
+
+
+    @staticmethod
+    def Format(value, model):
+        if re.match(r'^[+-]?\d+$', model):
+            return str(int(round(value)))
+        return '%e' % value
+
+
+    @staticmethod
+    def SumLine(lines):
+        """ Summing the numbers of a line over the shards, keeping the columns """
+        body, comment = SAFMerger.SplitComment(lines[0])
+        tokens = SAFMerger.token.findall(body.lstrip())
+        values = []
+        for line in lines:
+            words = SAFMerger.SplitComment(line)[0].split()
+            if len(words)!=len(tokens):
+                return None
+            try:
+                values.append([float(x) for x in words])
+            except ValueError:
+                return None
+        result = body[:len(body)-len(body.lstrip())]
+        for i, (word, space) in enumerate(tokens):
+            new = SAFMerger.Format(sum(x[i] for x in values), word)
+            if space!='':
+                space = ' '*max(len(word)+len(space)-len(new), 1)
+            result += new+space
+        return result+comment+'\n'
+
+
+    @staticmethod
+    def FrequencyData(shards):
+        """ Data of an HistoFrequency: union of the labels (sorted as by std::map) """
+        stack = {}
+        for lines in shards:
+            for line in lines:
+                words = SAFMerger.SplitComment(line)[0].split()
+                if len(words)!=3:
+                    continue
+                label = int(words[0])
+                pos, neg = stack.get(label, (0., 0.))
+                stack[label] = (pos+float(words[1]), neg+float(words[2]))
+        result = []
+        labels = sorted(stack.keys())
+        for i, label in enumerate(labels):
+            line = '      '+str(label).ljust(15)+('%e' % stack[label][0]).ljust(15)+\
+                   ('%e' % stack[label][1]).ljust(15)
+            if i<2 or i>=len(labels)-2:
+                line += ' # bin '+str(i+1)+' / '+str(len(labels))
+            result.append(line+'\n')
+        return result
+
+
+    @staticmethod
+    def Tag(line):
+        words = line.split()
+        if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
+            return words[0].lower()
+        return ''
+
+
+    @staticmethod
+    def Segments(lines):
+        """
+        Lines of a SAF file, the data of each HistoFrequency being gathered
+        into a single item (its number of lines depends on the shard).
+        Each item is given with the list of the blocks it belongs to.
+        """
+        result = []
+        blocks = []
+        for line in lines:
+            tag = SAFMerger.Tag(line)
+            if blocks[-2:]==['<histofrequency>','<data>'] and tag!='</data>':
+                result[-1][1].append(line)
+                continue
+            if tag.startswith('</'):
+                if len(blocks)>0:
+                    blocks.pop()
+            result.append((list(blocks), line))
+            if tag!='' and not tag.startswith('</'):
+                blocks.append(tag)
+                if blocks[-2:]==['<histofrequency>','<data>']:
+                    result.append((list(blocks), []))
+        return result
+
+
+    @staticmethod
+    def MergeFile(filenames, output):
+        """ Generic merging: the numbers of the summed blocks are added """
+        contents = []
+        for filename in filenames:
+            with open(filename, 'r') as stream:
+                contents.append(SAFMerger.Segments(stream.readlines()))
+        if any(len(x)!=len(contents[0]) for x in contents):
+            return False
+
+        merged = []
+        for items in zip(*contents):
+            blocks, line = items[0]
+            if isinstance(line, list):
+                merged.extend(SAFMerger.FrequencyData([x[1] for x in items]))
+            elif len(blocks)>0 and blocks[-1] in SAFMerger.summed_blocks and \
+                 SAFMerger.Tag(line)=='' and '"' not in line and \
+                 len(SAFMerger.SplitComment(line)[0].split())>0:
+                summed = SAFMerger.SumLine([x[1] for x in items])
+                if summed is None:
+                    return False
+                merged.append(summed)
+            else:
+                merged.append(line)
+
+        with open(output, 'w') as stream:
+            stream.writelines(merged)
+        return True
+
+
+    @staticmethod
+    def MergeSampleFile(filenames, output):
+        """ Merging the general SAF file of the dataset (sample and file info) """
+        header = []
+        files, details = [], []
+        block = ''
+        for filename in filenames:
+            with open(filename, 'r') as stream:
+                for line in stream:
+                    words = line.split()
+                    if len(words)==1 and words[0][0]=='<' and words[0][-1]=='>':
+                        block = '' if words[0].startswith('</') else words[0].lower()
+                        continue
+                    if block=='<fileinfo>' and len(words)>0:
+                        files.append(SAFMerger.SplitComment(line)[0].strip())
+                    elif block=='<sampledetailedinfo>' and len(words)>0 and not line.lstrip().startswith('#'):
+                        details.append(SAFMerger.SplitComment(line)[0].split())
+                    elif block=='<sampleglobalinfo>' and line.lstrip().startswith('#') and len(header)==0:
+                        header.append(line)
+        if len(header)==0 or any(len(x)!=5 for x in details):
+            return False
+
+        # Global info, as computed by SampleAnalyzer::FillSummary
+        nevents = sum(int(float(x[2])) for x in details)
+        xsec, xerr = 0., 0.
+        if nevents!=0:
+            xsec = sum(float(x[0])*float(x[2]) for x in details)/nevents
+            xerr = math.sqrt(sum((float(x[1])*float(x[2]))**2 for x in details))/nevents
+        summary = [('%e' % xsec), ('%e' % xerr), str(nevents),
+                   ('%e' % sum(float(x[3]) for x in details)),
+                   ('%e' % sum(float(x[4]) for x in details))]
+
+        def comment(i):
+            if i<2 or i>=len(files)-2:
+                return ' # file '+str(i+1)+' / '+str(len(files))
+            return ''
+
+        with open(output, 'w') as stream:
+            stream.write('<SAFheader>\n</SAFheader>\n\n')
+            stream.write('<SampleGlobalInfo>\n')
+            stream.write(header[0])
+            stream.write(''.join(x.ljust(15) for x in summary)+'\n')
+            stream.write('</SampleGlobalInfo>\n\n')
+            stream.write('<FileInfo>\n')
+            for i, name in enumerate(files):
+                stream.write(name.ljust(40)+comment(i)+'\n')
+            stream.write('</FileInfo>\n\n')
+            stream.write('<SampleDetailedInfo>\n')
+            stream.write(header[0])
+            for i, words in enumerate(details):
+                stream.write(''.join(x.ljust(15) for x in words)+comment(i)+'\n')
+            stream.write('</SampleDetailedInfo>\n\n')
+            stream.write('<SAFfooter>\n</SAFfooter>\n')
+        return True
+
+
+    @staticmethod
+    def Merge(shards, shardnames, target, name):
+        """
+        Merging the output directories of the shards (Output/SAF/<shardname>)
+        into the output directory of the dataset (Output/SAF/<name>).
+        """
+        logger = logging.getLogger('MA5')
+        if not os.path.isdir(target):
+            os.mkdir(target)
+
+        # Sample information
+        if not SAFMerger.MergeSampleFile([os.path.join(x, y+'.saf') for x, y in zip(shards, shardnames)],
+                                         os.path.join(target, name+'.saf')):
+            logger.error('Impossible to merge the sample information of the dataset '+name)
+            return False
+
+        # Analysis outputs: <analysis>_0 in each shard -> <analysis>_<n> in the dataset folder
+        for folder in sorted(os.listdir(shards[0])):
+            if not os.path.isdir(os.path.join(shards[0], folder)):
+                continue
+            base = folder.rsplit('_', 1)[0]
+            index = 0
+            while os.path.isdir(os.path.join(target, base+'_'+str(index))):
+                index += 1
+            outdir = os.path.join(target, base+'_'+str(index))
+            for root, dirs, files in os.walk(os.path.join(shards[0], folder)):
+                relative = os.path.relpath(root, os.path.join(shards[0], folder))
+                os.makedirs(os.path.normpath(os.path.join(outdir, relative)))
+                for filename in sorted(files):
+                    inputs = [os.path.join(x, folder, relative, filename) for x in shards]
+                    output = os.path.normpath(os.path.join(outdir, relative, filename))
+                    if any(not os.path.isfile(x) for x in inputs):
+                        logger.error('The file '+os.path.join(folder, relative, filename)+\
+                                     ' is missing in some shards of the dataset '+name)
+                        return False
+                    if filename.endswith('.saf'):
+                        if not SAFMerger.MergeFile(inputs, output):
+                            logger.error('Impossible to merge the file '+output)
+                            return False
+                    else:
+                        if not all(filecmp.cmp(inputs[0], x, shallow=False) for x in inputs[1:]):
+                            logger.warning('The file '+output+' depends on the shard: '+\
+                                           'only the one of the first shard is kept.')
+                        shutil.copy(inputs[0], output)
+        return True
@@ -0,0 +1,190 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+from __future__ import absolute_import
+from madanalysis.layout.histogram           import Histogram
+from madanalysis.layout.histogram_logx      import HistogramLogX
+from madanalysis.layout.histogram_frequency import HistogramFrequency
+import logging
+import numpy
+import re
+
+
+class SafReader():
+    """
+    Block-wise reading of the SAF files: the content of a block is
+    extracted at once and its numbers are converted in one go into a
+    NumPy array.
+    """
+
+    comment = re.compile(r'#[^\n]*')
+
+    @staticmethod
+    def Read(filename):
+        try:
+            with open(filename, 'r') as stream:
+                return stream.read()
+        except (IOError, OSError):
+            logging.getLogger('MA5').error("File called '"+filename+"' is not found")
+            return None
+
+    @staticmethod
+    def Blocks(text, tag):
+        """ Contents of the blocks <tag>...</tag> of a text """
+        return re.findall(r'<'+tag+r'>[^\n]*\n(.*?)</'+tag+r'>', text, re.S | re.I)
+
+    @staticmethod
+    def HasBlock(text, tag):
+        begin = re.search(r'<'+tag+r'>', text, re.I)
+        return begin is not None and re.compile(r'</'+tag+r'>', re.I).search(text, begin.end()) is not None
+
+    @staticmethod
+    def Lines(text):
+        """ Non-empty lines of a block, without comments """
+        lines = [x.strip() for x in SafReader.comment.sub('', text).split('\n')]
+        return [x for x in lines if x!='']
+
+    @staticmethod
+    def Numbers(text, ncolumns):
+        """ Numbers of the lines with ncolumns words, as a (nlines, ncolumns) array """
+        words = SafReader.comment.sub('', text).split()
+        if len(words)%ncolumns!=0:
+            words = []
+            for line in SafReader.Lines(text):
+                items = line.split()
+                if len(items)==ncolumns:
+                    words.extend(items)
+        return numpy.array(words, dtype=float).reshape(-1, ncolumns)
+
+
+class SafHistoFile():
+    """
+    Histograms of a histos.saf file. The file is scanned once to locate
+    the histogram blocks; each histogram is decoded when it is requested,
+    its bin contents being stored as NumPy arrays.
+    """
+
+    kinds = {'histo': Histogram, 'histologx': HistogramLogX, 'histofrequency': HistogramFrequency}
+    tag   = re.compile(r'<(/?)([A-Za-z]+)>')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.text     = SafReader.Read(filename)
+        self.blocks   = []
+        if self.text is None:
+            self.text = ''
+            return
+
+        # Single scan of the tags: kind of each histogram and positions of its sub-blocks
+        histo, opened = None, None
+        for match in SafHistoFile.tag.finditer(self.text):
+            tag = match.group(2).lower()
+            if tag in SafHistoFile.kinds:
+                if match.group(1)=='':
+                    histo = (tag, {})
+                elif histo is not None and histo[0]==tag:
+                    self.blocks.append(histo)
+                    histo = None
+            elif histo is not None and tag in ['description', 'statistics', 'data']:
+                if match.group(1)=='':
+                    opened = (tag, match.end())
+                elif opened is not None and opened[0]==tag:
+                    histo[1][tag] = self.text[opened[1]:match.start()]
+                    opened = None
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        for index in range(len(self.blocks)):
+            yield self.Get(index)
+
+    def Names(self):
+        names = []
+        for kind, blocks in self.blocks:
+            lines = SafReader.Lines(blocks.get('description', ''))
+            names.append(lines[0][1:-1] if len(lines)!=0 else '')
+        return names
+
+    def Get(self, index):
+        """ Decoding the index-th histogram of the file """
+        kind, blocks = self.blocks[index]
+        histo = SafHistoFile.kinds[kind]()
+        frequency = (kind=='histofrequency')
+
+        # Description: name, binning (except for HistoFrequency) and regions
+        lines = SafReader.Lines(blocks.get('description', ''))
+        if len(lines)!=0 and len(lines[0])>1 and lines[0][0]=='"' and lines[0][-1]=='"':
+            histo.name = lines[0][1:-1]
+        else:
+            logging.getLogger('MA5').error('invalid name for the histogram number '+str(index+1)+\
+                                           ' @ "'+self.filename+'"')
+        lines = lines[1:]
+        if not frequency and len(lines)!=0 and len(lines[0].split())==3:
+            try:
+                words = lines[0].split()
+                histo.nbins, histo.xmin, histo.xmax = int(words[0]), float(words[1]), float(words[2])
+            except ValueError:
+                logging.getLogger('MA5').error('invalid histogram description for '+histo.name+\
+                                               ' @ "'+self.filename+'"')
+            lines = lines[1:]
+        histo.regions = [x for x in lines if len(x.split())==1]
+
+        # Statistics
+        try:
+            statistics = SafReader.Numbers(blocks.get('statistics', ''), 2)
+        except ValueError:
+            logging.getLogger('MA5').error('invalid statistics for the histogram '+histo.name+\
+                                           ' @ "'+self.filename+'"')
+            statistics = numpy.zeros((0,2))
+        fields = [('nevents',int), ('sumwentries',float), ('nentries',int), ('sumw',float)]
+        if not frequency:
+            fields += [('sumw2',float), ('sumwx',float), ('sumw2x',float)]
+        for row, (field, kind) in zip(statistics, fields):
+            setattr(histo.positive, field, kind(row[0]))
+            setattr(histo.negative, field, kind(row[1]))
+
+        # Data
+        try:
+            data = SafReader.Numbers(blocks.get('data', ''), 3 if frequency else 2)
+        except ValueError:
+            logging.getLogger('MA5').error('invalid data for the histogram '+histo.name+\
+                                           ' @ "'+self.filename+'"')
+            data = numpy.zeros((0, 3 if frequency else 2))
+        if frequency:
+            histo.labels         = [int(x) for x in data[:,0]]
+            histo.positive.array = data[:,1].copy()
+            histo.negative.array = data[:,2].copy()
+        else:
+            if len(data)!=histo.nbins+2:
+                logging.getLogger('MA5').warning('the histogram '+histo.name+' has '+str(len(data))+\
+                                                 ' data lines instead of '+str(histo.nbins+2))
+            if len(data)>0:
+                histo.positive.underflow, histo.negative.underflow = float(data[0,0]), float(data[0,1])
+            if len(data)>histo.nbins+1:
+                histo.positive.overflow, histo.negative.overflow = float(data[histo.nbins+1,0]), \
+                                                                   float(data[histo.nbins+1,1])
+            histo.positive.array = data[1:histo.nbins+1,0].copy()
+            histo.negative.array = data[1:histo.nbins+1,1].copy()
+        return histo
@@ -0,0 +1,336 @@
+################################################################################
+#  
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#  
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#  
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#  
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#  
+################################################################################
+
+
+"""
+Parallel and incremental building of the SampleAnalyzer libraries.
+
+The components (libraries and test programs) are built on a thread pool as
+soon as the components they depend on are built: the interfaces only
+depend on the commons, the core on the commons and the interfaces, and a
+test program on its library. The object files are kept between builds.
+
+For each component, two fingerprints are saved in build_state.json:
+- setup: Makefile, architecture (compiler, external package) and headers
+  of the components it depends on;
+- sources: content of its source and header files.
+A component is skipped if both are unchanged, compiled incrementally (make
+rebuilds the modified files only) if only its sources changed, and rebuilt
+from scratch otherwise. The test programs are always run.
+"""
+
+from __future__ import absolute_import
+from madanalysis.system.detect_manager import DetectLogBuffer
+import concurrent.futures
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+
+class LibraryScheduler():
+
+    # Architecture items used by all the components
+    architecture = ['ma5_version', 'platform', 'release', 'isMac', 'gcc_version', 'make_version',
+                    'cpp11', 'cpp14', 'cpp17', 'cpp20', 'compilation_severity']
+    interfaces   = ['zlib', 'fastjet', 'delphes', 'delphesMA5tune', 'root']
+    headers      = ['.h', '.hh', '.hpp', '.tpp']
+    sources      = ['.cpp', '.cc', '.C']
+
+    def __init__(self, compiler, archi_info, ncores, forced=False):
+        self.compiler     = compiler
+        self.archi_info   = archi_info
+        self.ncores       = max(1, ncores)
+        self.forced       = forced
+        self.filename     = os.path.join(archi_info.ma5dir, 'tools', 'SampleAnalyzer', 'build_state.json')
+        self.logger       = logging.getLogger('MA5')
+        self.state        = {}
+        self.dependencies = {}
+        self.fingerprints = {}
+
+
+    @staticmethod
+    def Dependencies(package, packages):
+        """ Components to build before a component """
+        if package=='configuration':
+            result = []
+        elif package=='commons':
+            result = ['configuration']
+        elif package.startswith('test_'):
+            result = [package[5:]]
+        elif package=='process':
+            result = ['commons'] + LibraryScheduler.interfaces
+        else:
+            result = ['commons']
+        return [x for x in result if x in packages]
+
+
+    @staticmethod
+    def Makefile(package, folder):
+        if package in ['process', 'commons', 'configuration']:
+            return os.path.join(folder, 'Makefile')
+        elif package.startswith('test_'):
+            return os.path.join(folder, 'Makefile_'+package[5:])
+        return os.path.join(folder, 'Makefile_'+package)
+
+
+    def Architecture(self, package):
+        """ Architecture items relevant for a component """
+        items = dict((key, getattr(self.archi_info, key, None)) for key in LibraryScheduler.architecture)
+        name  = package[5:] if package.startswith('test_') else package
+        if name in LibraryScheduler.interfaces:
+            for key, value in vars(self.archi_info).items():
+                if key.startswith(name+'_') or key=='has_'+name:
+                    items[key] = value
+            for key, value in self.archi_info.libraries.items():
+                if key.lower()==name.lower():
+                    items['library:'+key] = value
+        return json.dumps(items, sort_keys=True, default=str)
+
+
+    @staticmethod
+    def Files(folder, makefile, variable, extensions):
+        """ Files in the folders of the wildcards of a Makefile variable (SRCS or HDRS) """
+        files = set()
+        for pattern in re.findall(r'^'+variable+r'\s*\+?=\s*\$\(wildcard\s+([^)]+)\)', makefile, re.M):
+            for directory in glob.glob(os.path.join(folder, os.path.dirname(pattern.strip()) or '.')):
+                for root, dirs, names in os.walk(directory):
+                    files.update(os.path.join(root, x) for x in names \
+                                 if os.path.splitext(x)[1] in extensions)
+        return sorted(files)
+
+
+    @staticmethod
+    def Hash(items, files=[]):
+        hasher = hashlib.sha1()
+        for item in items:
+            hasher.update(item.encode('utf-8'))
+            hasher.update(b'\0')
+        for filename in files:
+            hasher.update(filename.encode('utf-8'))
+            with open(filename, 'rb') as stream:
+                hasher.update(hashlib.sha1(stream.read()).digest())
+        return hasher.hexdigest()
+
+
+    def Fingerprint(self, library, dependencies):
+        """ Fingerprints of a component: setup, sources and headers (for the dependent components) """
+        package, folder = library[2], library[4]
+        with open(LibraryScheduler.Makefile(package, folder), 'r') as stream:
+            makefile = stream.read()
+        setup   = LibraryScheduler.Hash([makefile, self.Architecture(package)] + \
+                                        [self.fingerprints[x]['headers'] for x in dependencies])
+        headers = LibraryScheduler.Files(folder, makefile, 'HDRS', LibraryScheduler.headers)
+        sources = LibraryScheduler.Files(folder, makefile, 'SRCS', LibraryScheduler.sources+LibraryScheduler.headers)
+        return {'setup'  : setup,
+                'sources': LibraryScheduler.Hash([], sorted(set(sources+headers))),
+                'headers': LibraryScheduler.Hash([setup], headers)}
+
+
+    def ReadState(self):
+        try:
+            with open(self.filename, 'r') as stream:
+                state = json.load(stream)
+        except (IOError, OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+
+    def WriteState(self):
+        try:
+            with open(self.filename+'.tmp', 'w') as stream:
+                json.dump(self.state, stream, indent=1, sort_keys=True)
+            os.rename(self.filename+'.tmp', self.filename)
+        except (IOError, OSError) as err:
+            self.logger.debug('Cannot write the build state '+self.filename+': '+str(err))
+
+
+    def Action(self, library):
+        """ 'skip' (library only), 'run' (test only), 'compile' (incremental) or 'build' (from scratch) """
+        package = library[2]
+        previous, current = self.state.get(package, {}), self.fingerprints[package]
+        if self.forced or previous.get('setup')!=current['setup']:
+            return 'build'
+        if previous.get('sources')!=current['sources'] or not os.path.isfile(library[3]):
+            return 'compile'
+        if library[5]:
+            return 'run'
+        return 'skip'
+
+
+    def BuildOne(self, index, nlibraries, library, action, ncores):
+        """ Building a component (the messages are displayed afterwards) """
+        isLibrary = not library[5]
+        product   = 'library' if isLibrary else 'test program'
+        package, folder = library[2], library[4]
+
+        self.logger.info("   **********************************************************")
+        self.logger.info("   Component "+str(index+1)+"/"+str(nlibraries)+" - "+product+": "+library[1])
+
+        if action=='skip':
+            self.logger.info("     - The library is up to date.")
+            self.logger.info('      => Status: \x1b[32m'+'[OK]'+'\x1b[0m')
+            return True
+
+        if action in ['build', 'compile']:
+            # Cleaning the project
+            if action=='build':
+                self.logger.info("     - Cleaning the project before building the "+product+" ...")
+                if not self.compiler.MrProper(package, folder):
+                    self.logger.error("The "+product+" building aborted.")
+                    return False
+
+            # Compiling
+            if action=='build':
+                self.logger.info("     - Compiling the source files ...")
+            else:
+                self.logger.info("     - Compiling the modified source files ...")
+            if not self.compiler.Compile(ncores, package, folder):
+                self.logger.error("The "+product+" building aborted.")
+                return False
+
+            # Linking
+            self.logger.info("     - Linking the "+product+" ...")
+            if not self.compiler.Link(package, folder):
+                self.logger.error("The "+product+" building aborted.")
+                return False
+
+            # Checking
+            self.logger.info("     - Checking that the "+product+" is properly built ...")
+            if not os.path.isfile(library[3]):
+                self.logger.error("The "+product+" '"+library[3]+"' is not produced.")
+                return False
+
+        if not isLibrary:
+
+            # Running the program test
+            self.logger.info("     - Running the test program ...")
+            program = library[3].split('/')[-1]
+            bindir  = self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/'
+            argv = []
+            if program=='TestSampleAnalyzer':
+                argv = [self.archi_info.ma5dir+'/tools/SampleAnalyzer/Test/Process/dummy_list.txt']
+            if not self.compiler.Run(program, argv, bindir):
+                self.logger.error("the test failed.")
+                return False
+
+            # Checking the program output
+            self.logger.info("     - Checking the program output...")
+            if library[0]=="configuration":
+                if not self.compiler.CheckRunConfiguration(program, bindir):
+                    self.logger.error("the test failed.")
+                    return False
+            else:
+                if not self.compiler.CheckRun(program, bindir):
+                    self.logger.error("the test failed.")
+                    return False
+
+        # Print Ok
+        self.logger.info('      => Status: \x1b[32m'+'[OK]'+'\x1b[0m')
+        return True
+
+
+    def Build(self, libraries):
+        """ Building the components; False at the first failure (after the running builds) """
+        packages = [x[2] for x in libraries]
+        self.dependencies = dict((x, LibraryScheduler.Dependencies(x, packages)) for x in packages)
+        self.fingerprints = {}
+        for library in libraries:
+            self.fingerprints[library[2]] = self.Fingerprint(library, self.dependencies[library[2]])
+        self.state = self.ReadState()
+
+        buffer  = DetectLogBuffer()
+        pending = list(range(len(libraries)))
+        running = {}
+        done    = set()
+        success = True
+
+        def build(index, action, ncores):
+            records = []
+            buffer.records[threading.current_thread().ident] = records
+            try:
+                return self.BuildOne(index, len(libraries), libraries[index], action, ncores)
+            finally:
+                del buffer.records[threading.current_thread().ident]
+                logs[index] = records
+
+        logs     = {}
+        finished = {}
+        flushed  = [0]
+
+        def flush(last=False):
+            # Displaying the messages of the finished components in the order of the list
+            while flushed[0]<len(libraries):
+                index = flushed[0]
+                if index not in finished:
+                    if not last:
+                        break
+                    flushed[0] += 1
+                    continue
+                for record in logs.get(index, []):
+                    self.logger.handle(record)
+                if isinstance(finished[index], Exception):
+                    self.logger.error(str(finished[index]))
+                flushed[0] += 1
+
+        self.logger.addFilter(buffer)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.ncores) as pool:
+                while success and len(pending)!=0 or len(running)!=0:
+                    ready = [x for x in pending if all(y in done for y in self.dependencies[packages[x]])]
+                    if success and len(ready)!=0:
+                        # Sharing the cores between the components running together
+                        ncores = max(1, self.ncores // (len(running)+len(ready)))
+                        for index in ready:
+                            pending.remove(index)
+                            action = self.Action(libraries[index])
+                            if action in ['build', 'compile']:
+                                self.state.pop(packages[index], None)
+                                self.WriteState()
+                            running[pool.submit(build, index, action, ncores)] = (index, action)
+                    if len(running)==0:
+                        break
+                    completed, _ = concurrent.futures.wait(list(running.keys()),
+                                                           return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in completed:
+                        index, action = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as error:
+                            result = error
+                        finished[index] = result
+                        if result is not True:
+                            success = False
+                            continue
+                        done.add(packages[index])
+                        self.state[packages[index]] = self.fingerprints[packages[index]]
+                        self.WriteState()
+                    flush()
+        finally:
+            self.logger.removeFilter(buffer)
+        flush(last=True)
+
+        return success
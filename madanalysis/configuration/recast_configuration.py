@@ -34,6 +34,11 @@ class RecastConfiguration:
     userVariables ={
          "status"                 : ["on","off"],\
          "CLs_numofexps"          : [str(default_CLs_numofexps)],\
+         "CLs_seed"               : ["random"],\
+         "ncores"                 : ["1"],\
+         "events_cache"           : "",\
+         "events_cache_size"      : ["50"],\
+         "pad_cache_size"         : ["10"],\
          "card_path"              : "",\
          "store_root"             : ["True", "False"] , \
          "store_events"           : ["True", "False"] , \
@@ -90,6 +95,11 @@ class RecastConfiguration:
                 dico_file.close()
 
         self.CLs_numofexps= 100000
+        self.CLs_seed     = None
+        self.ncores       = 1
+        self.events_cache = os.path.join(self.ma5dir,'tools','RecoEventsCache')
+        self.events_cache_size = 0.
+        self.pad_cache_size    = 10
         self.card_path= ""
         self.logger = logging.getLogger('MA5')
 
@@ -102,6 +112,10 @@ class RecastConfiguration:
             self.user_DisplayParameter("padtune")
             self.user_DisplayParameter("padsfs")
             self.user_DisplayParameter("CLs_numofexps")
+            self.user_DisplayParameter("CLs_seed")
+            self.user_DisplayParameter("ncores")
+            self.user_DisplayParameter("events_cache")
+            self.user_DisplayParameter("pad_cache_size")
             self.user_DisplayParameter("card_path")
             self.user_DisplayParameter("store_events")
             self.user_DisplayParameter("TACO_output")
@@ -151,6 +165,23 @@ class RecastConfiguration:
         elif parameter=="CLs_numofexps":
             self.logger.info("   * Number of toy experiments for the CLs calculation: "+str(self.CLs_numofexps))
             return
+        elif parameter=="CLs_seed":
+            if self.CLs_seed is not None:
+                self.logger.info("   * Seed of the toy experiments for the CLs calculation: "+str(self.CLs_seed))
+            return
+        elif parameter=="ncores":
+            self.logger.info("   * Number of cores used for the recasting: "+str(self.ncores))
+            return
+        elif parameter=="events_cache" or parameter=="events_cache_size":
+            if self.events_cache_size > 0:
+                self.logger.info("   * Cache of the reconstructed events: "+str(self.events_cache)+\
+                                 " (up to "+str(self.events_cache_size)+" GB)")
+            else:
+                self.logger.info("   * Cache of the reconstructed events: off")
+            return
+        elif parameter=="pad_cache_size":
+            self.logger.info("   * Number of PAD executables kept in <PAD>/Build/Cache: "+str(self.pad_cache_size))
+            return
         elif parameter=="card_path":
             self.logger.info("   * Path to a recasting card: "+str(self.card_path))
             return
@@ -295,6 +326,70 @@ class RecastConfiguration:
                 return
             self.CLs_numofexps = int(value)
 
+        # Seed of the toy experiments
+        elif parameter=="CLs_seed":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            if value.lower() == "random":
+                self.CLs_seed = None
+                return
+            try:
+                self.CLs_seed = int(value)
+            except ValueError:
+                self.logger.error("The seed of the toy experiments must be an integer (or 'random').")
+                return
+
+        # Number of cores
+        elif parameter=="ncores":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            try:
+                ncores = int(value)
+            except ValueError:
+                self.logger.error("The number of cores must be a positive integer.")
+                return
+            if ncores < 1:
+                self.logger.error("The number of cores must be a positive integer.")
+                return
+            self.ncores = ncores
+
+        # Cache of the reconstructed events
+        elif parameter=="events_cache":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            self.events_cache = os.path.normpath(os.path.expanduser(value))
+        elif parameter=="events_cache_size":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            try:
+                size = float(value)
+            except ValueError:
+                self.logger.error("The size of the events cache must be a number of GB (0 to switch it off).")
+                return
+            if size < 0.:
+                self.logger.error("The size of the events cache must be a number of GB (0 to switch it off).")
+                return
+            self.events_cache_size = size
+
+        # Cache of the PAD executables
+        elif parameter=="pad_cache_size":
+            if self.status!="on":
+                self.logger.error("Please first set the recasting mode to 'on'.")
+                return
+            try:
+                size = int(value)
+            except ValueError:
+                self.logger.error("The number of PAD executables kept in the cache must be a positive integer.")
+                return
+            if size < 1:
+                self.logger.error("The number of PAD executables kept in the cache must be a positive integer.")
+                return
+            self.pad_cache_size = size
+
         # path to a recasting card
         elif parameter=="card_path":
             if self.status!="on":
@@ -473,7 +568,8 @@ class RecastConfiguration:
             if var == "add":
                 table = ["extrapolated_luminosity", "systematics"]
             else:
-                table = ["CLs_numofexps", "card_path", "store_events", 'TACO_output', "add",
+                table = ["CLs_numofexps", "CLs_seed", "ncores", "events_cache", "events_cache_size",
+                         "pad_cache_size", "card_path", "store_events", 'TACO_output', "add",
                          "THerror_combination", "error_extrapolation", "global_likelihoods",
                          "CLs_calculator_backend", "expectation_assumption"]#, "simplify_likelihoods"
         else:
@@ -487,6 +583,16 @@ class RecastConfiguration:
                 table.extend(RecastConfiguration.userVariables["status"])
         elif variable =="CLs_numofexps":
                 table.extend(RecastConfiguration.userVariables["CLs_numofexps"])
+        elif variable =="CLs_seed":
+                table.extend(RecastConfiguration.userVariables["CLs_seed"])
+        elif variable =="ncores":
+                table.extend(RecastConfiguration.userVariables["ncores"])
+        elif variable =="events_cache":
+                table.extend(RecastConfiguration.userVariables["events_cache"])
+        elif variable =="events_cache_size":
+                table.extend(RecastConfiguration.userVariables["events_cache_size"])
+        elif variable =="pad_cache_size":
+                table.extend(RecastConfiguration.userVariables["pad_cache_size"])
         elif variable =="card_path":
                 table.extend(RecastConfiguration.userVariables["card_path"])
         elif variable =="store_root":
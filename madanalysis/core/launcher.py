@@ -25,9 +25,9 @@
 # Setting global variables of MadAnalysis main
 from __future__ import absolute_import
 from __future__ import print_function
-from madanalysis.core.script_stack import ScriptStack
-from madanalysis.core.main         import Main
-from string_tools                  import StringTools
+from madanalysis.core.script_stack     import ScriptStack
+from madanalysis.system.startup_profiler import StartupProfiler
+from string_tools                      import StringTools
 
 # Python import
 import os
@@ -47,6 +47,9 @@ class MA5mode():
       self.debug          = False
       self.build          = False
       self.developer_mode = False
+      self.jobs           = 1
+      self.recheck        = False
+      self.profile        = False
 
 
 
@@ -126,10 +129,11 @@ def DecodeArguments(version, date):
     import getopt
     try:
         optlist, arglist = getopt.getopt(sys.argv[1:], \
-                                     "PHReEvhfmsbdqi", \
+                                     "PHReEvhfmsbdqij:", \
                                      ["partonlevel","hadronlevel","recolevel",\
                                       "expert","version","release","help",\
-                                      "forced","script","debug","build","qmode","installcard"])
+                                      "forced","script","debug","build","qmode","installcard",\
+                                      "jobs=","recheck","profile-startup"])
     except getopt.GetoptError as err:
         logging.getLogger('MA5').error(str(err))
         Usage()
@@ -170,6 +174,18 @@ def DecodeArguments(version, date):
         elif o in ["-i","--installcard"]:
             DefaultInstallCard()
             sys.exit()
+        elif o=="--recheck":
+            mode.recheck = True
+        elif o=="--profile-startup":
+            mode.profile = True
+        elif o in ["-j","--jobs"]:
+            try:
+                mode.jobs = int(a)
+            except ValueError:
+                mode.jobs = 0
+            if mode.jobs < 1:
+                logging.getLogger('MA5').error("The number of jobs must be a positive integer.")
+                sys.exit()
         else:
             logging.getLogger('MA5').error("Argument '"+o+"' is not found.")
             Usage()
@@ -203,6 +219,8 @@ def DecodeArguments(version, date):
 def MainSession(mode,arglist,ma5dir,version,date):
 
     # Instantiating  MadAnalysis main class
+    StartupProfiler.Step('main object')
+    from madanalysis.core.main import Main
     main = Main()
     main.archi_info.ma5dir      = ma5dir
     main.archi_info.ma5_version = version
@@ -227,6 +245,7 @@ def MainSession(mode,arglist,ma5dir,version,date):
     Main.forced         = mode.forcedmode
     main.script         = mode.scriptmode
     main.developer_mode = mode.developer_mode
+    main.recasting.ncores = mode.jobs
 
     # Displaying header
     logging.getLogger('MA5').info("")
@@ -263,15 +282,18 @@ def MainSession(mode,arglist,ma5dir,version,date):
         logging.getLogger('MA5').debug("")
 
     # Checking the present configuration
-    if not main.CheckConfig(debug=mode.debug):
+    StartupProfiler.Step('checkup (mandatory and processing)')
+    if not main.CheckConfig(debug=mode.debug,cache=not mode.recheck):
         sys.exit()
 
     # Building (if necesserary) the SampleAnalyzer library
+    StartupProfiler.Step('SampleAnalyzer library')
     if not main.BuildLibrary(forced=mode.build):
         sys.exit()
 
     # Checking the present configuration
-    if not main.CheckConfig2(debug=mode.debug):
+    StartupProfiler.Step('checkup (reinterpretation and graphical)')
+    if not main.CheckConfig2(debug=mode.debug,cache=not mode.recheck):
         sys.exit()
 
     logging.getLogger('MA5').info("*************************************************************")
@@ -279,6 +301,7 @@ def MainSession(mode,arglist,ma5dir,version,date):
 
     # Expert mode
     if mode.expertmode:
+        StartupProfiler.Report()
         from madanalysis.core.expert_mode import ExpertMode
         main.expertmode = True
         expert = ExpertMode(main)
@@ -314,9 +337,11 @@ def MainSession(mode,arglist,ma5dir,version,date):
     else:
 
         # Launching the interpreter
+        StartupProfiler.Step('interpreter')
         from madanalysis.interpreter.interpreter import Interpreter
         interpreter = Interpreter(main)
         interpreter.InitializeHistory()
+        StartupProfiler.Report()
 
         # Executing the ma5 scripts
         if not ScriptStack.IsEmpty() and not ScriptStack.IsFinished():
@@ -368,6 +393,12 @@ def Usage():
     logging.getLogger('MA5').info(" -h or --help        : dump this help")
     logging.getLogger('MA5').info(" -i or --installcard : produce the default installation card in installation_card.dat")
     logging.getLogger('MA5').info(" -d or --debug       : debug mode")
+    logging.getLogger('MA5').info(" -j N or --jobs=N    : number of cores used for the recasting (the histograms "+\
+                                  "are drawn on main.plot_ncores cores, all the available ones by default)")
+    logging.getLogger('MA5').info(" --recheck           : detect again the installed packages instead of "+\
+                                  "using the results saved by the previous sessions")
+    logging.getLogger('MA5').info(" --profile-startup   : display the time spent in the imports and "+\
+                                  "in the initialization phases until the prompt")
     logging.getLogger('MA5').info(" -q or --qmode       : developper mode only for MA5 developpers\n")
     
     logging.getLogger('MA5').info("[scripts]")
@@ -382,16 +413,17 @@ def Usage():
 ################################################################################
 
 def LaunchMA5(version, date, ma5dir):
-    
+
+    # Profiling the startup (before the arguments are decoded, to include all the imports)
+    if '--profile-startup' in sys.argv[1:]:
+        StartupProfiler.Start()
+
     # Configuring the logger
     import colored_log
     colored_log.init()
     log = logging.getLogger()
     log.setLevel(logging.INFO)
 
-    # Setting global variables of MadAnalysis main
-    from madanalysis.core.main import Main
-
     # Configurating tab completion
     try: 
         import readline
@@ -417,6 +449,7 @@ def LaunchMA5(version, date, ma5dir):
             readline.parse_and_bind("tab: complete")
 
     # Read arguments
+    StartupProfiler.Step('arguments')
     mode,arglist = DecodeArguments(version, date)
 
     # Deal with the scripts in normal mode
@@ -48,6 +48,7 @@ from madanalysis.configuration.merging_configuration    import MergingConfigurat
 from string_tools                                       import StringTools
 from madanalysis.system.checkup                         import CheckUp
 import logging
+import multiprocessing
 import os
 import sys
 import platform
@@ -64,6 +65,9 @@ class Main():
         "outputfile": ['"output.lhe.gz"', '"output.lhco.gz"'],
         "recast": ["on", "off"],
         "random_seed": ["47"],
+        "nshards": ["1"],
+        "matplotlib_scripts": ["True", "False"],
+        "plot_ncores": [str(multiprocessing.cpu_count())],
     }
 
     forced = False
@@ -107,6 +111,9 @@ class Main():
         self.stack          = StackingMethodType.STACK
         self.isolation      = IsolationConfiguration()
         self.output         = ""
+        self.nshards        = 1
+        self.matplotlib_scripts = False
+        self.plot_ncores    = multiprocessing.cpu_count()
         self.graphic_render = GraphicRenderType.NONE
         if self.mode==MA5RunningType.RECO:
             self.normalize = NormalizeType.NONE
@@ -215,6 +222,9 @@ class Main():
         self.user_DisplayParameter("normalize")
         self.user_DisplayParameter("lumi")
         self.user_DisplayParameter("outputfile")
+        self.user_DisplayParameter("nshards")
+        self.user_DisplayParameter("matplotlib_scripts")
+        self.user_DisplayParameter("plot_ncores")
         self.fom.Display()
         self.logger.info(" *********************************" )
         allowed, forbidden = self.GetSampleFormat()
@@ -273,6 +283,12 @@ class Main():
             self.logger.info(" integrated luminosity = "+str(self.lumi)+" fb^{-1}" )
         elif parameter=="recast":
             self.logger.info(' Recasting mode = "' + self.recasting.status + '"')
+        elif parameter=="nshards":
+            self.logger.info(" number of SampleAnalyzer processes per dataset = "+str(self.nshards))
+        elif parameter=="matplotlib_scripts":
+            self.logger.info(" exporting the matplotlib scripts of the histograms = "+str(self.matplotlib_scripts))
+        elif parameter=="plot_ncores":
+            self.logger.info(" number of cores used for drawing the histograms = "+str(self.plot_ncores))
         else:
             self.logger.error("'main' has no parameter called '"+parameter+"'")
 
@@ -405,6 +421,40 @@ class Main():
                               ".lhe .lhe.gz .lhco .lhco.gz")
                 return False
 
+        # nshards
+        elif parameter=="nshards":
+            try:
+                tmp = int(value)
+            except ValueError:
+                self.logger.error("'nshards' is a positive integer value")
+                return False
+            if tmp<1:
+                self.logger.error("'nshards' is a positive integer value")
+                return False
+            self.nshards = tmp
+
+        # matplotlib_scripts
+        elif parameter=="matplotlib_scripts":
+            if value == 'True':
+                self.matplotlib_scripts = True
+            elif value == 'False':
+                self.matplotlib_scripts = False
+            else:
+                self.logger.error("Do the matplotlib scripts need to be exported? (True/False)")
+                return False
+
+        # plot_ncores
+        elif parameter=="plot_ncores":
+            try:
+                tmp = int(value)
+            except ValueError:
+                self.logger.error("'plot_ncores' is a positive integer value")
+                return False
+            if tmp<1:
+                self.logger.error("'plot_ncores' is a positive integer value")
+                return False
+            self.plot_ncores = tmp
+
         # other
         else:
             self.logger.error("'main' has no parameter called '"+parameter+"'")
@@ -442,7 +492,7 @@ class Main():
                          '\x1b[0m')
 
 
-    def CheckConfig(self,debug=False):
+    def CheckConfig(self,debug=False,cache=False):
         checkup = CheckUp(self.archi_info, self.session_info, debug, self.script)
 
         if not checkup.CheckArchitecture():
@@ -451,28 +501,24 @@ class Main():
             return False
         if not checkup.CheckSessionInfo():
             return False
-        if not checkup.CheckMandatoryPackages():
-            return False
-        if not checkup.CheckOptionalProcessingPackages():
+        if not checkup.CachedDetection('processing',[checkup.CheckMandatoryPackages,\
+                                       checkup.CheckOptionalProcessingPackages],cache):
             return False
         if not checkup.SetFolder():
             return False
         return True
 
 
-    def CheckConfig2(self,debug=False):
+    def CheckConfig2(self,debug=False,cache=False):
         checkup = CheckUp(self.archi_info, self.session_info, debug, self.script)
 
         # Read user options
         if not checkup.ReadUserOptions():
             return False
 
-        # Reinterpretation packages
-        if not checkup.CheckOptionalReinterpretationPackages():
-            return False
-
-        # Graphical packages
-        if not checkup.CheckOptionalGraphicalPackages():
+        # Reinterpretation and graphical packages
+        if not checkup.CachedDetection('graphical',[checkup.CheckOptionalReinterpretationPackages,\
+                                       checkup.CheckOptionalGraphicalPackages],cache):
             return False
         self.AutoSetGraphicalRenderer()
 
@@ -498,6 +544,7 @@ class Main():
     def BuildLibrary(self,forced=False):
         builder = LibraryBuilder(self.archi_info)
         UpdateNeed=False
+        Broken=False
         FirstUse, Missing = builder.checkMA5()
         if not FirstUse and not Missing:
             UpdateNeed = not builder.compare()
@@ -521,9 +568,11 @@ class Main():
                                    [self.archi_info.ma5dir+'/tools/SampleAnalyzer/Test/Process/dummy_list.txt'],\
                                    self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/',silent=True):
                 UpdateNeed=True
+                Broken=True
 
             if not precompiler.CheckRun('TestSampleAnalyzer',self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/',silent=True):
                 UpdateNeed=True
+                Broken=True
             rebuild = forced or FirstUse or UpdateNeed or Missing
 
         if not rebuild:
@@ -664,74 +713,13 @@ class Main():
             self.logger.error("test program building aborted.")
             sys.exit()
 
-        # Compiling the libraries
-        for ind in range(0,len(libraries)):
-
-            isLibrary=not libraries[ind][5]
-            if isLibrary:
-                product='library'
-            else:
-                product='test program'
-
-            self.logger.info("   **********************************************************")
-            self.logger.info("   Component "+str(ind+1)+"/"+str(len(libraries))+" - "+product+": "+libraries[ind][1])
-
-             # Cleaning the project
-            self.logger.info("     - Cleaning the project before building the "+product+" ...")
-            if not compiler.MrProper(libraries[ind][2],libraries[ind][4]):
-                self.logger.error("The "+product+" building aborted.")
-                sys.exit()
-
-            # Compiling
-            self.logger.info("     - Compiling the source files ...")
-            if not compiler.Compile(ncores,libraries[ind][2],libraries[ind][4]):
-                self.logger.error("The "+product+" building aborted.")
-                sys.exit()
-
-            # Linking
-            self.logger.info("     - Linking the "+product+" ...")
-            if not compiler.Link(libraries[ind][2],libraries[ind][4]):
-                self.logger.error("The "+product+" building aborted.")
-                sys.exit()
-
-            # Checking
-            self.logger.info("     - Checking that the "+product+" is properly built ...")
-            if not os.path.isfile(libraries[ind][3]):
-                self.logger.error("The "+product+" '"+libraries[ind][3]+"' is not produced.")
-                sys.exit()
-
-             # Cleaning the project
-            self.logger.info("     - Cleaning the project after building the "+product+" ...")
-            if not compiler.Clean(libraries[ind][2],libraries[ind][4]):
-                self.logger.error("library building aborted.")
-                sys.exit()
-
-            if not isLibrary:
-
-                # Running the program test
-                self.logger.info("     - Running the test program ...")
-                program=libraries[ind][3].split('/')[-1]
-
-                argv = []
-                if program=='TestSampleAnalyzer':
-                    argv = [self.archi_info.ma5dir+'/tools/SampleAnalyzer/Test/Process/dummy_list.txt']
-                if not compiler.Run(program,argv,self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/'):
-                    self.logger.error("the test failed.")
-                    sys.exit()
-
-                # Checking the program output
-                self.logger.info("     - Checking the program output...")
-                if libraries[ind][0]=="configuration":
-                    if not compiler.CheckRunConfiguration(program,self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/'):
-                        self.logger.error("the test failed.")
-                        sys.exit()
-                else:    
-                    if not compiler.CheckRun(program,self.archi_info.ma5dir+'/tools/SampleAnalyzer/Bin/'):
-                        self.logger.error("the test failed.")
-                        sys.exit()
-
-            # Print Ok
-            self.logger.info('      => Status: \x1b[32m'+'[OK]'+'\x1b[0m')
+        # Compiling the libraries (independent components in parallel, unchanged ones skipped;
+        # the setup fingerprints of the components catch the architecture changes, and
+        # everything is rebuilt only if forced or if the installed test program fails)
+        from madanalysis.build.library_scheduler import LibraryScheduler
+        scheduler = LibraryScheduler(compiler,self.archi_info,ncores,forced or Broken)
+        if not scheduler.Build(libraries):
+            sys.exit()
 
         self.logger.info("   **********************************************************")
 
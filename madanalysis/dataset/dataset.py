@@ -27,7 +27,6 @@ from madanalysis.enumeration.linestyle_type import LineStyleType
 from madanalysis.enumeration.backstyle_type import BackStyleType
 from madanalysis.enumeration.color_type import ColorType
 from madanalysis.dataset.sample_info import SampleInfo
-from madanalysis.layout.layout import Layout
 import logging
 
 class Dataset:
@@ -345,6 +344,7 @@ class Dataset:
         for item in self.filenames:
             logging.getLogger('MA5').info("    - " + item) 
         logging.getLogger('MA5').info("   ******************************************" )
+        from madanalysis.layout.layout import Layout
         msg = "   Cross section = "
         if self.measured_global.xsection==0 or self.measured_global.xerror!=0:
             msg+="("
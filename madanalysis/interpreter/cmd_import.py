@@ -298,6 +298,7 @@ class CmdImport(CmdBase.CmdBase):
                            layout.merging.detail[i],\
                            layout.plotflow.detail[i],\
                            False) #to Fix: False means 'no merging plots'
+        jobber.SaveIndex()
         return True    
            
 
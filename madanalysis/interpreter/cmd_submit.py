@@ -34,6 +34,7 @@ from madanalysis.install.install_manager                        import InstallMa
 from madanalysis.install.detector_manager                       import DetectorManager
 from madanalysis.misc.run_recast                                import RunRecast
 from madanalysis.IOinterface.delphescard_checker                import DelphesCardChecker
+from madanalysis.selection.instance_name                         import InstanceName
 
 
 from chronometer   import Chronometer
@@ -414,13 +415,24 @@ class CmdSubmit(CmdBase):
                 self.logger.error("job submission aborted.")
                 return False
 
-        if self.resubmit and not self.main.recasting.status=='on':
+        if self.main.recasting.status=='on':
+            return True
+
+        # Resubmission: the build and the runs are skipped if their inputs are unchanged
+        state   = jobber.ReadSubmitState() if self.resubmit else {}
+        rebuild = not jobber.IsBuilt(state)
+        if self.resubmit and not rebuild:
+            self.logger.info("   Analysis code unchanged: skipping the compilation of 'SampleAnalyzer'.")
+        else:
+            state = {'datasets': {}}
+
+        if self.resubmit and rebuild:
             self.logger.info("   Cleaning 'SampleAnalyzer'...")
             if not jobber.MrproperJob():
                 self.logger.error("job submission aborted.")
                 return False
 
-        if not self.main.recasting.status=='on':
+        if rebuild:
             self.logger.info("   Compiling 'SampleAnalyzer'...")
             if not jobber.CompileJob():
                 self.logger.error("job submission aborted.")
@@ -430,14 +442,26 @@ class CmdSubmit(CmdBase):
             if not jobber.LinkJob():
                 self.logger.error("job submission aborted.")
                 return False
+            state['build'] = jobber.BuildHash()
 
-            for item in self.main.datasets:
-                self.logger.info("   Running 'SampleAnalyzer' over dataset '"
-                             +item.name+"'...")
-                self.logger.info("    *******************************************************")
-                if not jobber.RunJob(item):
-                    self.logger.error("run over '"+item.name+"' aborted.")
-                self.logger.info("    *******************************************************")
+        reused = []
+        for item in self.main.datasets:
+            name = InstanceName.Get(item.name)
+            if self.resubmit and jobber.IsAnalyzed(state,item):
+                reused.append(item.name)
+                continue
+            state['datasets'].pop(name,None)
+            self.logger.info("   Running 'SampleAnalyzer' over dataset '"
+                         +item.name+"'...")
+            self.logger.info("    *******************************************************")
+            if jobber.RunJob(item):
+                state['datasets'][name] = jobber.DatasetHash(item)
+            else:
+                self.logger.error("run over '"+item.name+"' aborted.")
+            self.logger.info("    *******************************************************")
+        if len(reused)!=0:
+            self.logger.info("   Dataset(s) unchanged, the existing SAF outputs are reused: "+', '.join(reused))
+        jobber.WriteSubmitState(state)
         return True
 
 
@@ -459,11 +483,12 @@ class CmdSubmit(CmdBase):
         if self.main.recasting.status!='on':
             self.logger.info("   Extracting data from the output files...")
             for i in range(0,len(self.main.datasets)):
-                jobber.ExtractGeneral(self.main.datasets[i])
-                jobber.ExtractHistos(self.main.datasets[i],layout.plotflow.detail[i])
-                jobber.ExtractCuts(self.main.datasets[i],layout.cutflow.detail[i])
-                if self.main.merging.enable:
-                    jobber.ExtractHistos(self.main.datasets[i],layout.merging.detail[i],merging=True)
+                jobber.Extract(self.main.datasets[i],\
+                               layout.cutflow.detail[i],\
+                               layout.merging.detail[i],\
+                               layout.plotflow.detail[i],\
+                               self.main.merging.enable)
+            jobber.SaveIndex()
         return True
 
 
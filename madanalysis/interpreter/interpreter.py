@@ -40,25 +40,7 @@ from madanalysis.IOinterface.particle_reader import ParticleReader
 from madanalysis.IOinterface.multiparticle_reader import MultiparticleReader
 from madanalysis.enumeration.cut_type import CutType
 
-# List of command
-from madanalysis.interpreter.cmd_set            import CmdSet
-from madanalysis.interpreter.cmd_define         import CmdDefine
-from madanalysis.interpreter.cmd_define_region  import CmdDefineRegion
-from madanalysis.interpreter.cmd_import         import CmdImport
-from madanalysis.interpreter.cmd_remove         import CmdRemove
-from madanalysis.interpreter.cmd_swap           import CmdSwap
-from madanalysis.interpreter.cmd_display        import CmdDisplay
-from madanalysis.interpreter.cmd_display_particles      import CmdDisplayParticles
-from madanalysis.interpreter.cmd_display_multiparticles import CmdDisplayMultiparticles
-from madanalysis.interpreter.cmd_display_datasets       import CmdDisplayDatasets
-from madanalysis.interpreter.cmd_display_regions        import CmdDisplayRegions
-from madanalysis.interpreter.cmd_plot           import CmdPlot
-from madanalysis.interpreter.cmd_cut            import CmdCut
-from madanalysis.interpreter.cmd_submit         import CmdSubmit
-from madanalysis.interpreter.cmd_open           import CmdOpen
-from madanalysis.interpreter.cmd_reset          import CmdReset
-from madanalysis.interpreter.cmd_install        import CmdInstall
-
+import importlib
 import logging
 import readline
 import os
@@ -71,6 +53,29 @@ from six.moves import input
 class Interpreter(InterpreterBase):
     """Particularisation of the cmd command for MA5"""
 
+    # List of commands: attribute -> (module, class, extra arguments)
+    # The module of a command is imported when the command is used for the first time
+    commands = {
+        'cmd_set'                    : ('cmd_set',                    'CmdSet',                   ()),
+        'cmd_define'                 : ('cmd_define',                 'CmdDefine',                ()),
+        'cmd_define_region'          : ('cmd_define_region',          'CmdDefineRegion',          ()),
+        'cmd_display'                : ('cmd_display',                'CmdDisplay',               ()),
+        'cmd_display_datasets'       : ('cmd_display_datasets',       'CmdDisplayDatasets',       ()),
+        'cmd_display_multiparticles' : ('cmd_display_multiparticles', 'CmdDisplayMultiparticles', ()),
+        'cmd_display_particles'      : ('cmd_display_particles',      'CmdDisplayParticles',      ()),
+        'cmd_display_regions'        : ('cmd_display_regions',        'CmdDisplayRegions',        ()),
+        'cmd_import'                 : ('cmd_import',                 'CmdImport',                ()),
+        'cmd_remove'                 : ('cmd_remove',                 'CmdRemove',                ()),
+        'cmd_swap'                   : ('cmd_swap',                   'CmdSwap',                  ()),
+        'cmd_plot'                   : ('cmd_plot',                   'CmdPlot',                  ()),
+        'cmd_reject'                 : ('cmd_cut',                    'CmdCut',                   (CutType.REJECT,)),
+        'cmd_select'                 : ('cmd_cut',                    'CmdCut',                   (CutType.SELECT,)),
+        'cmd_reset'                  : ('cmd_reset',                  'CmdReset',                 ()),
+        'cmd_open'                   : ('cmd_open',                   'CmdOpen',                  ()),
+        'cmd_submit'                 : ('cmd_submit',                 'CmdSubmit',                ()),
+        'cmd_resubmit'               : ('cmd_submit',                 'CmdSubmit',                (True,)),
+        'cmd_install'                : ('cmd_install',                'CmdInstall',               ()) }
+
     def __init__(self, main,*arg, **opt):
 
         # Calling constructor from InterpreterBase
@@ -79,32 +84,22 @@ class Interpreter(InterpreterBase):
         # Getting back main
         self.main = main
 
-        # Getting back all commands
-        self.cmd_set                    = CmdSet(main)
-        self.cmd_define                 = CmdDefine(main)
-        self.cmd_define_region          = CmdDefineRegion(main)
-        self.cmd_display                = CmdDisplay(main)
-        self.cmd_display_datasets       = CmdDisplayDatasets(main)
-        self.cmd_display_multiparticles = CmdDisplayMultiparticles(main)
-        self.cmd_display_particles      = CmdDisplayParticles(main)
-        self.cmd_display_regions        = CmdDisplayRegions(main)
-        self.cmd_import                 = CmdImport(main)
-        self.cmd_remove                 = CmdRemove(main)
-        self.cmd_swap                   = CmdSwap(main)
-        self.cmd_plot                   = CmdPlot(main)
-        self.cmd_reject                 = CmdCut(main,CutType.REJECT)
-        self.cmd_select                 = CmdCut(main,CutType.SELECT)
-        self.cmd_reset                  = CmdReset(main)
-        self.cmd_open                   = CmdOpen(main)
-        self.cmd_submit                 = CmdSubmit(main)
-        self.cmd_resubmit               = CmdSubmit(main,resubmit=True)
-        self.cmd_install                = CmdInstall(main)
-
         # Initializing multiparticle
         self.InitializeParticle()
         self.InitializeMultiparticle()
 
 
+    def __getattr__(self, name):
+        # Creating a command when it is used for the first time
+        if name not in Interpreter.commands or 'main' not in self.__dict__:
+            raise AttributeError(name)
+        module, classname, arguments = Interpreter.commands[name]
+        module = importlib.import_module('madanalysis.interpreter.'+module)
+        command = getattr(module, classname)(self.main, *arguments)
+        setattr(self, name, command)
+        return command
+
+
     def InitializeHistory(self):
         # Importing history
         self.history_file = os.path.normpath(self.main.archi_info.ma5dir + '/.ma5history')
@@ -136,9 +136,9 @@ class MA5Interpreter(Interpreter):
            self.logger.setLevel(10)
 
         # Checking the configuration
-        if not main.CheckConfig(debug=(LoggerLevel<=logging.DEBUG)):
+        if not main.CheckConfig(debug=(LoggerLevel<=logging.DEBUG),cache=True):
             raise MA5Configuration('Issue with the configuration')
-        if not main.CheckConfig2(debug=(LoggerLevel<=logging.DEBUG)):
+        if not main.CheckConfig2(debug=(LoggerLevel<=logging.DEBUG),cache=True):
             raise MA5Configuration('Issue with the configuration')
 
         self.ma5_environ = dict(os.environ)
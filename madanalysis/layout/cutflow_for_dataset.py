@@ -28,7 +28,8 @@ from madanalysis.enumeration.normalize_type   import NormalizeType
 from madanalysis.IOinterface.job_reader       import JobReader
 from madanalysis.layout.cut_info              import CutInfo
 from madanalysis.layout.measure               import Measure
-from math                                     import sqrt
+import logging
+import numpy
 from six.moves import range
 
 
@@ -124,87 +125,85 @@ class CutFlowForDataset:
         return True
 
 
+    def Matrix(self,measures):
+        """ Means of a region x cut list of measures, as a matrix padded with zeros """
+        matrix = numpy.zeros(self.mask.shape)
+        for reg in range(len(measures)):
+            matrix[reg,:len(measures[reg])] = [x.mean for x in measures[reg]]
+        return matrix
+
+
+    @staticmethod
+    def Previous(initial,matrix):
+        """ Matrix of the numbers before each cut: initial, then the previous cuts """
+        return numpy.hstack([numpy.full((matrix.shape[0],1),float(initial)),matrix])[:,:matrix.shape[1]]
+
+
+    @staticmethod
+    def Fill(measures,means,errors=None):
+        """ Storing the (valid) elements of region x cut matrices in the measures """
+        means = means.tolist()
+        if errors is not None:
+            errors = errors.tolist()
+        for reg in range(len(measures)):
+            for icut in range(len(measures[reg])):
+                measures[reg][icut].mean = means[reg][icut]
+                if errors is not None:
+                    measures[reg][icut].error = errors[reg][icut]
+
+
     def Calculate(self):
-        myregs = self.main.regions.GetNames()
-        if myregs == []:
-            myregs = ['myregion']
+        # Region x cut matrices (regions have different numbers of cuts)
+        ncuts = [len(x) for x in self.Nselected]
+        self.mask = numpy.zeros((len(ncuts),max(ncuts+[0])),dtype=bool)
+        for reg in range(len(ncuts)):
+            self.mask[reg,:ncuts[reg]] = True
 
         # Calculating Nrejected for positive and negative weighted events
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if icut==0:
-                    self.Nrejected_posweight[reg][icut].mean = self.Ntotal_posweight.mean - self.Nselected_posweight[reg][icut].mean
-                    self.Nrejected_negweight[reg][icut].mean = self.Ntotal_negweight.mean - self.Nselected_negweight[reg][icut].mean
-                else:
-                    self.Nrejected_posweight[reg][icut].mean = self.Nselected_posweight[reg][icut-1].mean \
-                                                               - self.Nselected_posweight[reg][icut].mean
-                    self.Nrejected_negweight[reg][icut].mean = self.Nselected_negweight[reg][icut-1].mean \
-                                                               - self.Nselected_negweight[reg][icut].mean
+        sel_pos = self.Matrix(self.Nselected_posweight)
+        sel_neg = self.Matrix(self.Nselected_negweight)
+        rej_pos = CutFlowForDataset.Previous(self.Ntotal_posweight.mean,sel_pos) - sel_pos
+        rej_neg = CutFlowForDataset.Previous(self.Ntotal_negweight.mean,sel_neg) - sel_neg
+        CutFlowForDataset.Fill(self.Nrejected_posweight,rej_pos)
+        CutFlowForDataset.Fill(self.Nrejected_negweight,rej_neg)
 
         # Combining negative & positive weight events for computing Nselected, Nrejected and Ntotal
         self.Ntotal.mean = self.Ntotal_posweight.mean - self.Ntotal_negweight.mean
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                self.Nselected[reg][icut].mean = self.Nselected_posweight[reg][icut].mean - self.Nselected_negweight[reg][icut].mean
-                self.Nrejected[reg][icut].mean = self.Nrejected_posweight[reg][icut].mean - self.Nrejected_negweight[reg][icut].mean
+        selected = sel_pos - sel_neg
+        rejected = rej_pos - rej_neg
 
         # Checking that all numbers are positive : Nselected and Ntotal
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if self.Nselected[reg][icut].mean<0:
-                    self.warnings[reg][icut].append('The number of selected events is negative: '+\
-                                               str(self.Nselected[reg][icut].mean)+'. Set to 0.')
-                    self.Nselected[reg][icut].mean=0
-                if self.Nrejected[reg][icut].mean<0:
-                    self.warnings[reg][icut].append('The number of rejected events is negative: '+\
-                                               str(self.Nrejected[reg][icut].mean)+'. Set to 0.')
-                    self.Nrejected[reg][icut].mean=0
+        for reg, icut in zip(*numpy.nonzero(self.mask & (selected<0))):
+            self.warnings[reg][icut].append('The number of selected events is negative: '+\
+                                            str(float(selected[reg,icut]))+'. Set to 0.')
+        for reg, icut in zip(*numpy.nonzero(self.mask & (rejected<0))):
+            self.warnings[reg][icut].append('The number of rejected events is negative: '+\
+                                            str(float(rejected[reg,icut]))+'. Set to 0.')
+        selected[selected<0] = 0.
+        rejected[rejected<0] = 0.
 
         # Checking that a N cut i > N cut i+1 : Nselected and Nrejected
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if icut==0:
-                    if self.Nselected[reg][icut].mean > self.Ntotal.mean:
-                        self.warnings[reg][icut].append('The number of selected events > the initial number of events: '+\
-                          str(self.Nselected[reg][icut].mean)+' > '+str(self.Ntotal.mean)+'. Set the number of selected events to 0.')
-                        self.Nselected[reg][icut].mean=0
-                else:
-                    if self.Nselected[reg][icut].mean > self.Nselected[reg][icut-1].mean:
-                        self.warnings[reg][icut].append('The number of selected events > the initial number of events: '+\
-                          str(self.Nselected[reg][icut].mean)+' > '+str(self.Nselected[reg][icut-1].mean)+\
-                                                        '. Set the number of selected events to 0.')
-                        self.Nselected[reg][icut].mean=0
-
-        # Calculating errors on Naccepted and Nrejected
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                self.Nselected[reg][icut].error = Measure.binomialNEventError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
-                self.Nrejected[reg][icut].error = Measure.binomialNEventError(self.Nrejected[reg][icut].mean,self.Ntotal.mean)
-
-        # efficiency calculation and its error
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if icut==0:
-                    if self.Ntotal.mean==0:
-                        self.eff[reg][icut].mean = 0
-                    else:
-                        self.eff[reg][icut].mean = float(self.Nselected[reg][icut].mean) / \
-                                                    float(self.Ntotal.mean)
-                    self.eff[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
-                else:
-                    if self.Nselected[reg][icut-1].mean==0:
-                        self.eff[reg][icut].mean = 0
-                    else:
-                        self.eff[reg][icut].mean = float(self.Nselected[reg][icut].mean) / \
-                                                    float(self.Nselected[reg][icut-1].mean)
-                    self.eff[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Nselected[reg][icut-1].mean)
-
-                if self.Ntotal.mean==0:
-                    self.effcumu[reg][icut].mean=0
-                else:
-                    self.effcumu[reg][icut].mean = float(self.Nselected[reg][icut].mean) / \
-                                                    float(self.Ntotal.mean)
-                self.effcumu[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
+        # (once a cut is set to 0, the following non-empty cuts are also set to 0)
+        previous  = CutFlowForDataset.Previous(self.Ntotal.mean,selected)
+        violation = self.mask & (selected>previous)
+        reset     = (numpy.cumsum(violation,axis=1)>0) & (violation | (selected>0)) & self.mask
+        previous[:,1:][reset[:,:-1]] = 0.
+        for reg, icut in zip(*numpy.nonzero(reset)):
+            self.warnings[reg][icut].append('The number of selected events > the initial number of events: '+\
+              str(float(selected[reg,icut]))+' > '+str(float(previous[reg,icut]))+'. Set the number of selected events to 0.')
+        selected[reset] = 0.
+        nwarnings = sum(len(x) for y in self.warnings for x in y)
+        if nwarnings!=0:
+            logging.getLogger('MA5').debug(str(nwarnings)+' corrections applied to the cut-flow of the dataset '+\
+                                           self.dataset.name)
+
+        # efficiency calculation
+        previous  = CutFlowForDataset.Previous(self.Ntotal.mean,selected)
+        efficiency = numpy.zeros(selected.shape)
+        numpy.divide(selected,previous,out=efficiency,where=(previous!=0))
+        cumulative = numpy.zeros(selected.shape)
+        if self.Ntotal.mean!=0:
+            cumulative = selected/float(self.Ntotal.mean)
 
         # Getting xsection
         xsection = self.dataset.measured_global.xsection
@@ -216,89 +215,33 @@ class CutFlowForDataset:
         # Saving ntotal
         ntot = 0.+self.Ntotal.mean
 
-        # Scaling Ntotal
-        if self.main.normalize == NormalizeType.LUMI:
-            self.Ntotal.error = xerror * self.main.lumi * 1000
-            self.Ntotal.mean = xsection * self.main.lumi * 1000
-        elif self.main.normalize == NormalizeType.LUMI_WEIGHT:
-            self.Ntotal.error = xerror * self.main.lumi * 1000 * \
-                                      self.dataset.weight
-            self.Ntotal.mean = xsection * self.main.lumi * 1000 * \
-                                      self.dataset.weight
-
-        # Scaling Nselected
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if self.main.normalize == NormalizeType.LUMI:
-                    # error due to xsec 
-                    if ntot!=0:
-                        errXsec = xerror * self.main.lumi * 1000 * self.Nselected[reg][icut].mean / ntot
-                    else:
-                        errXsec=0
-                    # scale factor
-                    if ntot!=0:
-                        factor = xsection * self.main.lumi * 1000 / ntot
-                    else:
-                        factor = 0
-                    self.Nselected[reg][icut].mean  *= factor
-                    self.Nselected[reg][icut].error = Measure.binomialNEventError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
-                    # compute final error
-                    self.Nselected[reg][icut].error = sqrt(self.Nselected[reg][icut].error**2 + errXsec**2)
-                elif self.main.normalize == NormalizeType.LUMI_WEIGHT:
-                    # error due to xsec 
-                    if ntot!=0:
-                        errXsec = xerror * self.main.lumi * 1000 * self.dataset.weight * self.Nselected[reg][icut].mean / ntot
-                    else:
-                        errXsec=0
-                    # scale factor
-                    if ntot!=0:
-                        factor = xsection * self.main.lumi * self.dataset.weight * 1000 / ntot
-                    else:
-                        factor = 0
-                    self.Nselected[reg][icut].mean  *= factor
-                    self.Nselected[reg][icut].error = Measure.binomialNEventError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
-                    # compute final error
-                    self.Nselected[reg][icut].error = sqrt(self.Nselected[reg][icut].error**2 + errXsec**2)
-
-        # Scaling Nrejected
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nrejected[reg])):
-                if self.main.normalize == NormalizeType.LUMI:
-                    # error due to xsec 
-                    if ntot!=0:
-                        errXsec = xerror * self.main.lumi * 1000 * self.Nrejected[reg][icut].mean / ntot
-                    else:
-                        errXsec=0
-                    # scale factor
-                    if ntot!=0:
-                        factor = xsection * self.main.lumi * 1000 / ntot
-                    else:
-                        factor = 0 
-                    self.Nrejected[reg][icut].mean  *= factor
-                    self.Nrejected[reg][icut].error = Measure.binomialNEventError(self.Nrejected[reg][icut].mean,self.Ntotal.mean)
-                    # compute final error
-                    self.Nrejected[reg][icut].error = sqrt(self.Nrejected[reg][icut].error**2 + errXsec**2)
-                elif self.main.normalize == NormalizeType.LUMI_WEIGHT:
-                    # error due to xsec 
-                    if ntot!=0:
-                        errXsec = xerror * self.main.lumi * 1000 * self.dataset.weight * self.Nrejected[reg][icut].mean / ntot
-                    else:
-                        errXsec=0
-                    # scale factor
-                    if ntot!=0:
-                        factor = xsection * self.main.lumi * self.dataset.weight * 1000 / ntot
-                    else:
-                        factor = 0 
-                    self.Nrejected[reg][icut].mean  *= factor
-                    self.Nrejected[reg][icut].error = Measure.binomialNEventError(self.Nrejected[reg][icut].mean,self.Ntotal.mean)
-                    # compute final error
-                    self.Nrejected[reg][icut].error = sqrt(self.Nrejected[reg][icut].error**2 + errXsec**2)
-
-        # recompute error to efficiency
-        for reg in range(len(myregs)):
-            for icut in range(0,len(self.Nselected[reg])):
-                if icut==0:
-                    self.eff[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
-                else:
-                    self.eff[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Nselected[reg][icut-1].mean)
-                self.effcumu[reg][icut].error = Measure.binomialError(self.Nselected[reg][icut].mean,self.Ntotal.mean)
+        # Scaling Ntotal, Nselected and Nrejected
+        scaled = self.main.normalize in [NormalizeType.LUMI, NormalizeType.LUMI_WEIGHT]
+        if scaled:
+            scale = self.main.lumi * 1000
+            if self.main.normalize == NormalizeType.LUMI_WEIGHT:
+                scale *= self.dataset.weight
+            self.Ntotal.error = xerror * scale
+            self.Ntotal.mean  = xsection * scale
+            if ntot!=0:
+                factor, errfactor = xsection * scale / ntot, xerror * scale / ntot
+            else:
+                factor, errfactor = 0., 0.
+            errXsec_selected = errfactor * selected
+            errXsec_rejected = errfactor * rejected
+            selected = selected * factor
+            rejected = rejected * factor
+
+        # Calculating errors on Naccepted and Nrejected
+        error_selected = Measure.binomialNEventErrors(selected,self.Ntotal.mean)
+        error_rejected = Measure.binomialNEventErrors(rejected,self.Ntotal.mean)
+        if scaled:
+            error_selected = numpy.sqrt(error_selected**2 + errXsec_selected**2)
+            error_rejected = numpy.sqrt(error_rejected**2 + errXsec_rejected**2)
+        CutFlowForDataset.Fill(self.Nselected,selected,error_selected)
+        CutFlowForDataset.Fill(self.Nrejected,rejected,error_rejected)
+
+        # error to efficiency
+        previous  = CutFlowForDataset.Previous(self.Ntotal.mean,selected)
+        CutFlowForDataset.Fill(self.eff,efficiency,Measure.binomialErrors(selected,previous))
+        CutFlowForDataset.Fill(self.effcumu,cumulative,Measure.binomialErrors(selected,self.Ntotal.mean))
@@ -25,7 +25,7 @@
 from __future__ import absolute_import
 import logging
 from math import sqrt
-from six.moves import range
+import numpy
 
 
 class HistogramCore:
@@ -53,11 +53,30 @@ class HistogramCore:
 
 
     def ComputeIntegral(self):
-        self.integral = 0
-        for i in range(0,len(self.array)):
-            self.integral+=self.array[i]
-        self.integral += self.overflow
-        self.integral += self.underflow
+        self.integral = float(numpy.sum(self.array)) + self.overflow + self.underflow
+
+
+    @staticmethod
+    def Difference(positive,negative,dataset,warnings):
+        """
+        Bin contents positive-negative as an array. The negative bins are
+        set to zero and reported by a single warning added to warnings.
+        """
+        data = numpy.asarray(positive,dtype=float) - numpy.asarray(negative,dtype=float)
+        bins = numpy.flatnonzero(data<0)
+        if len(bins)==1:
+            warnings.append('dataset='+dataset.name+' -> bin '+str(bins[0])+\
+                            ' has a negative content : '+str(float(data[bins[0]]))+\
+                            '. This value is set to zero')
+        elif len(bins)>1:
+            shown = ', '.join(str(x) for x in bins[:10])
+            if len(bins)>10:
+                shown += ', ...'
+            warnings.append('dataset='+dataset.name+' -> '+str(len(bins))+\
+                            ' bins have a negative content (bins '+shown+'; minimum : '+\
+                            str(float(data[bins].min()))+'). These values are set to zero')
+        data[bins] = 0.
+        return data
         
 
     def Print(self):
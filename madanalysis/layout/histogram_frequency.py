@@ -23,6 +23,7 @@
 
 
 from __future__ import absolute_import
+from madanalysis.layout.histogram_core           import HistogramCore
 from madanalysis.layout.histogram_frequency_core import HistogramFrequencyCore
 import logging
 from six.moves import range
@@ -51,17 +52,8 @@ class HistogramFrequency:
         self.summary.entries = self.positive.entries + self.negative.entries
 
         # Data
-        data = []
-        for i in range(0,len(self.positive.array)):
-            data.append(self.positive.array[i]-self.negative.array[i])
-            if data[-1]<0:
-                self.warnings.append(\
-                    'dataset='+dataset.name+\
-                    ' -> bin '+str(i)+\
-                    ' has a negative content : '+\
-                    str(data[-1])+'. This value is set to zero')
-                data[-1]=0
-        self.summary.array = data[:] # [:] -> clone of data
+        self.summary.array = HistogramCore.Difference(self.positive.array,self.negative.array,\
+                                                      dataset,self.warnings)
 
         # Integral
         self.positive.ComputeIntegral()
@@ -24,6 +24,7 @@
 
 from __future__ import absolute_import
 import logging
+import numpy
 class HistogramFrequencyCore:
 
     def __init__(self):
@@ -37,9 +38,7 @@ class HistogramFrequencyCore:
         self.array     = []
 
     def ComputeIntegral(self):
-        self.integral = 0
-        for value in self.array:
-            self.integral+=value
+        self.integral = float(numpy.sum(self.array))
 
     def Print(self):
 
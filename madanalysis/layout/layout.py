@@ -41,6 +41,7 @@ from madanalysis.IOinterface.histo_matplotlib_producer import HistoMatplotlibPro
 from madanalysis.layout.cutflow                        import CutFlow
 from madanalysis.layout.plotflow                       import PlotFlow
 from madanalysis.layout.merging_plots                  import MergingPlots
+from madanalysis.layout.matplotlib_engine              import MatplotlibEngine
 from madanalysis.selection.instance_name               import InstanceName
 from math                                              import log10, floor, ceil, isnan, isinf
 import os
@@ -165,28 +166,43 @@ class Layout:
     def DoPlots(self,histo_path,modes,output_paths):
 
         ListPlots = []
-        
+
+        # Matplotlib plots: drawn in-process (and exported as scripts if requested)
+        MatplotlibPlots = None
+        if self.main.graphic_render==GraphicRenderType.MATPLOTLIB or \
+           self.main.matplotlib_scripts:
+            MatplotlibPlots = []
+
         # Header plots
         self.logger.debug('Producing scripts for header plots ...')
         if self.main.merging.enable:
-            self.merging.DrawAll(histo_path,modes,output_paths,ListPlots)
+            self.merging.DrawAll(histo_path,modes,output_paths,ListPlots,MatplotlibPlots)
 
         # Selection plots
         self.logger.debug('Producing scripts for selection plots ...')
         if self.main.selection.Nhistos!=0:
-            self.plotflow.DrawAll(histo_path,modes,output_paths,ListPlots)
+            self.plotflow.DrawAll(histo_path,modes,output_paths,ListPlots,MatplotlibPlots)
 
         # Foot plots
         self.logger.debug('Producing scripts for foot plots ...')
         # to do
 
-        # Launching ROOT
+        # Exporting the matplotlib scripts
+        if self.main.matplotlib_scripts:
+            self.logger.debug('Exporting matplotlib scripts ...')
+            for plot in MatplotlibPlots:
+                MatplotlibEngine.WriteScript(plot,histo_path+'/'+plot.name+'.py')
+            producer=HistoMatplotlibProducer(histo_path,[histo_path+'/'+plot.name for plot in MatplotlibPlots])
+            producer.WriteMainFile()
+
+        # Launching ROOT (on main.plot_ncores cores, all the available ones by default)
         if self.main.graphic_render==GraphicRenderType.ROOT:
-            producer=HistoRootProducer(histo_path,ListPlots)
-            producer.Execute()
+            producer=HistoRootProducer(histo_path,ListPlots,self.main.plot_ncores)
+            if not producer.Execute():
+                return False
         elif self.main.graphic_render==GraphicRenderType.MATPLOTLIB:
-            producer=HistoMatplotlibProducer(histo_path,ListPlots)
-            producer.Execute()
+            if not MatplotlibEngine.DrawAll(MatplotlibPlots,self.main.plot_ncores):
+                return False
 
         # Ok
         return True
@@ -0,0 +1,216 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Direct matplotlib rendering of the histograms.
+
+A MatplotlibPlot holds everything needed to draw one figure (binning,
+weights as NumPy arrays, styles, axes and output files). It is filled by
+PlotFlow and MergingPlots from the Histogram objects and drawn in-process
+with the object API of matplotlib (Figure + Agg canvas, no pyplot state).
+The plots can also be exported as standalone Python scripts.
+"""
+
+from __future__ import absolute_import
+from madanalysis.system.process_pool import ProcessPool
+import logging
+import numpy
+import time
+import traceback
+
+
+class MatplotlibPlot(object):
+
+    def __init__(self, name, outputs, xbinning, xdata, legend=False, width=700):
+        self.name     = name
+        self.outputs  = list(outputs)
+        self.xbinning = numpy.asarray(xbinning, dtype=float)
+        self.xdata    = numpy.asarray(xdata, dtype=float)
+        self.legend   = legend
+        self.dpi      = 80
+        self.figsize  = (width/float(self.dpi), 500/float(self.dpi))
+        self.curves   = []
+        self.xlabel   = ''
+        self.ylabel   = ''
+        self.ymin     = None
+        self.ymax     = None
+        self.logx     = False
+        self.logy     = False
+        self.xlabels  = None
+
+    def __str__(self):
+        return self.name
+
+    def AddCurve(self, weights, label, **options):
+        """ options: keyword arguments of Axes.hist (histtype, color, ...) """
+        self.curves.append({'weights' : numpy.asarray(weights, dtype=float),
+                            'label'   : label,
+                            'options' : options})
+
+
+class MatplotlibEngine():
+
+    # Order of the Axes.hist options in the exported scripts
+    hist_options = ['histtype', 'rwidth', 'color', 'edgecolor', 'linewidth', 'linestyle']
+
+    @staticmethod
+    def Draw(plot):
+        """ Drawing a plot; returns the status ('ok' or the error) and the time """
+        start = time.time()
+        try:
+            import matplotlib
+            from matplotlib.figure               import Figure
+            from matplotlib.gridspec             import GridSpec
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            with matplotlib.rc_context({'text.usetex': False}):
+                fig = Figure(figsize=plot.figsize, dpi=plot.dpi)
+                FigureCanvasAgg(fig)
+                if plot.legend:
+                    frame = GridSpec(1, 1, right=0.7)
+                else:
+                    frame = GridSpec(1, 1)
+                pad = fig.add_subplot(frame[0])
+
+                for curve in plot.curves:
+                    pad.hist(x=plot.xdata, bins=plot.xbinning, weights=curve['weights'],
+                             label=curve['label'], bottom=None, cumulative=False,
+                             density=False, align='mid', orientation='vertical',
+                             **curve['options'])
+
+                pad.set_xlabel(plot.xlabel, fontsize=16, color='black')
+                pad.set_ylabel(plot.ylabel, fontsize=16, color='black')
+                pad.set_ylim(plot.ymin, plot.ymax)
+                if plot.logx:
+                    pad.set_xscale('log', nonpositive='clip')
+                if plot.logy:
+                    pad.set_yscale('log', nonpositive='clip')
+                if plot.xlabels is not None:
+                    pad.set_xticks(plot.xdata)
+                    pad.set_xticklabels(plot.xlabels, rotation='vertical')
+                if plot.legend:
+                    pad.legend(bbox_to_anchor=(1.05,1), loc=2, borderaxespad=0.)
+
+                for output in plot.outputs:
+                    fig.savefig(output)
+            status = 'ok'
+        except Exception:
+            status = traceback.format_exc().strip().split('\n')[-1]
+        return status, time.time()-start
+
+
+    @staticmethod
+    def DrawAll(plots, ncores):
+        """ Drawing the plots in a pool of processes; True if any plot is produced """
+        logger = logging.getLogger('MA5')
+        start  = time.time()
+        results = ProcessPool.Map(MatplotlibEngine.Draw, plots, ncores)
+        nfailures = 0
+        for plot, result in zip(plots, results):
+            if result is None:
+                nfailures += 1
+                continue
+            status, duration = result
+            logger.debug('histogram '+plot.name+' rendered in {:.3f} s'.format(duration))
+            if status!='ok':
+                nfailures += 1
+                logger.warning('the histogram '+plot.name+' cannot be produced: '+status)
+        logger.debug(str(len(plots))+' histograms rendered in {:.2f} s'.format(time.time()-start))
+        if len(plots)!=0 and nfailures==len(plots):
+            logger.error('impossible to execute matplotlib: no histogram has been produced.')
+            return False
+        return True
+
+
+    @staticmethod
+    def Array(values):
+        return 'numpy.array(['+','.join(repr(float(x)) for x in values)+'])'
+
+
+    @staticmethod
+    def WriteScript(plot, filename):
+        """ Exporting a plot as a standalone script defining the function <name>() """
+        try:
+            output = open(filename, 'w')
+        except:
+            logging.getLogger('MA5').error('Impossible to write the file: '+filename)
+            return False
+
+        output.write('def '+plot.name+'():\n\n')
+        output.write('    # Library import\n')
+        output.write('    import numpy\n')
+        output.write('    import matplotlib\n')
+        output.write('    import matplotlib.pyplot   as plt\n')
+        output.write('    import matplotlib.gridspec as gridspec\n\n')
+
+        output.write('    # Histo binning\n')
+        output.write('    xBinning = '+MatplotlibEngine.Array(plot.xbinning)+'\n\n')
+        output.write('    # Creating data sequence: middle of each bin\n')
+        output.write('    xData = '+MatplotlibEngine.Array(plot.xdata)+'\n\n')
+        for ind, curve in enumerate(plot.curves):
+            output.write('    # Creating weights for curve '+str(ind)+'\n')
+            output.write('    y'+str(ind)+'_weights = '+MatplotlibEngine.Array(curve['weights'])+'\n\n')
+
+        output.write('    # Creating a new Canvas\n')
+        output.write('    fig   = plt.figure(figsize='+repr(plot.figsize)+',dpi='+str(plot.dpi)+')\n')
+        if plot.legend:
+            output.write('    frame = gridspec.GridSpec(1,1,right=0.7)\n')
+        else:
+            output.write('    frame = gridspec.GridSpec(1,1)\n')
+        output.write('    pad   = fig.add_subplot(frame[0])\n\n')
+
+        output.write('    # Creating the curves\n')
+        for ind, curve in enumerate(plot.curves):
+            options = ''.join(', '+key+'='+repr(curve['options'][key]) \
+                              for key in MatplotlibEngine.hist_options if key in curve['options'])
+            output.write('    pad.hist(x=xData, bins=xBinning, weights=y'+str(ind)+'_weights,\\\n'+\
+                         '             label='+repr(curve['label'])+options+',\\\n'+\
+                         '             bottom=None, cumulative=False, density=False, '+\
+                         'align="mid", orientation="vertical")\n')
+        output.write('\n')
+
+        output.write('    # Axis\n')
+        output.write("    plt.rc('text',usetex=False)\n")
+        output.write('    plt.xlabel('+repr(plot.xlabel)+',fontsize=16,color="black")\n')
+        output.write('    plt.ylabel('+repr(plot.ylabel)+',fontsize=16,color="black")\n')
+        output.write('    plt.gca().set_ylim('+repr(plot.ymin)+','+repr(plot.ymax)+')\n')
+        if plot.logx:
+            output.write('    plt.gca().set_xscale("log",nonpositive="clip")\n')
+        if plot.logy:
+            output.write('    plt.gca().set_yscale("log",nonpositive="clip")\n')
+        if plot.xlabels is not None:
+            output.write('    plt.xticks(xData, '+repr(list(plot.xlabels))+', rotation="vertical")\n')
+        if plot.legend:
+            output.write('    plt.legend(bbox_to_anchor=(1.05,1), loc=2, borderaxespad=0.)\n')
+        output.write('\n')
+
+        output.write('    # Saving the image\n')
+        for outputname in plot.outputs:
+            output.write('    plt.savefig('+repr(outputname)+')\n')
+        output.write('\n')
+
+        output.write('# Running!\n')
+        output.write("if __name__ == '__main__':\n")
+        output.write('    '+plot.name+'()\n')
+        output.close()
+        return True
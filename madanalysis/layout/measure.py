@@ -24,6 +24,7 @@
 
 from __future__ import absolute_import
 from math import sqrt
+import numpy
 class Measure:
 
     def __init__(self):
@@ -44,4 +45,20 @@ class Measure:
         else:
             return sqrt( float(k*abs(N-k)) / float(N*N*N) )
 
+    @staticmethod
+    def binomialNEventErrors(k,N):
+        """ binomialNEventError for arrays of k and N """
+        k, N = numpy.broadcast_arrays(numpy.asarray(k,dtype=float),numpy.asarray(N,dtype=float))
+        result = numpy.zeros(k.shape)
+        nonzero = (N!=0)
+        result[nonzero] = numpy.sqrt(k[nonzero]*numpy.abs(N[nonzero]-k[nonzero])/N[nonzero])
+        return result
 
+    @staticmethod
+    def binomialErrors(k,N):
+        """ binomialError for arrays of k and N """
+        k, N = numpy.broadcast_arrays(numpy.asarray(k,dtype=float),numpy.asarray(N,dtype=float))
+        result = numpy.zeros(k.shape)
+        nonzero = (N!=0)
+        result[nonzero] = numpy.sqrt(k[nonzero]*numpy.abs(N[nonzero]-k[nonzero])/N[nonzero]**3)
+        return result
@@ -0,0 +1,155 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Metadata of the PAD analyses used by the CLs calculation.
+
+The info file of an analysis is parsed once per recasting run into an
+AnalysisInfo object holding the numbers of the file at its own
+luminosity. The rescaling to an extrapolated luminosity is a transform
+returning new objects, the AnalysisInfo being never modified. The cutflow
+SAF files of an analysis are read once per dataset into a CutflowTable
+indexed by the region names.
+"""
+
+from __future__ import absolute_import
+from madanalysis.IOinterface.saf_reader import SafReader
+import copy
+import math
+import numpy as np
+import os
+
+
+class AnalysisInfo(object):
+
+    def __init__(self, filename, lumi, regions, regiondata, cov_config, pyhf_config):
+        self.filename    = filename
+        self.mtime       = AnalysisInfo.Time(filename)
+        self.lumi        = lumi          # None if not given in the info file
+        self.regions     = tuple(regions)
+        self.regiondata  = regiondata    # region -> nobs, nb, deltanb, deltanb_syst, deltanb_stat
+        self.cov_config  = cov_config    # covariances at the luminosity of the info file
+        self.pyhf_config = pyhf_config
+
+    @staticmethod
+    def Time(filename):
+        try:
+            return os.stat(filename).st_mtime
+        except OSError:
+            return None
+
+    def IsUpToDate(self):
+        return self.mtime is not None and AnalysisInfo.Time(self.filename) == self.mtime
+
+    def extrapolate(self, extrapolated_lumi, error_extrapolation):
+        """ lumi, regions, regiondata, cov_config and pyhf_config at a given luminosity """
+        lumi         = 0 if self.lumi is None else self.lumi
+        lumi_scaling = 1.
+        if self.lumi is not None and extrapolated_lumi != 'default':
+            lumi_scaling = round(extrapolated_lumi/lumi, 8)
+            lumi = lumi*lumi_scaling
+
+        regiondata = {}
+        for reg in self.regions:
+            nobs, nb, deltanb, syst, stat = [self.regiondata[reg][x] for x in \
+                ['nobs', 'nb', 'deltanb', 'deltanb_syst', 'deltanb_stat']]
+            if syst == -1 and stat == -1:
+                if error_extrapolation == 'sqrt':
+                    deltanb = round(deltanb * math.sqrt(lumi_scaling), 8)
+                elif error_extrapolation == 'linear':
+                    deltanb = round(deltanb * lumi_scaling, 8)
+                else:
+                    nb_new = nb*lumi_scaling
+                    deltanb = round(math.sqrt(error_extrapolation[0]**2*nb_new**2 \
+                                              + error_extrapolation[1]**2*nb_new), 8)
+            else:
+                if syst == -1:
+                    syst = 0.
+                if stat == -1:
+                    stat = 0.
+                deltanb = round(math.sqrt((syst/nb)**2 + (stat/(nb*math.sqrt(lumi_scaling)))**2)*nb*lumi_scaling, 8)
+            regiondata[reg] = {"nobs": nobs*lumi_scaling, "nb": nb*lumi_scaling, "deltanb": deltanb}
+
+        cov_config = {}
+        for cov_subset, subset in self.cov_config.items():
+            if subset["covariance"] == []:
+                continue
+            cov      = np.array(subset["covariance"])
+            sigma    = np.sqrt(np.diag(cov))
+            invsigma = np.linalg.inv(np.diag(sigma))
+            corr     = invsigma @ cov @ invsigma
+
+            if error_extrapolation == 'sqrt':
+                new_sigma = round(math.sqrt(sigma)*lumi_scaling, 8)
+            elif error_extrapolation == 'linear':
+                new_sigma = sigma * lumi_scaling**2
+            else:
+                new_sigma = sigma * lumi_scaling**2 * error_extrapolation[0]**2 + \
+                    np.sqrt(sigma) * lumi_scaling * error_extrapolation[1]**2
+
+            new_sigma_matrix = np.diag(new_sigma)
+            cov_config[cov_subset] = {"cov_regions": list(subset["cov_regions"]),
+                                      "covariance" : (new_sigma_matrix @ corr @ new_sigma_matrix).tolist()}
+
+        return lumi, list(self.regions), regiondata, cov_config, copy.deepcopy(self.pyhf_config)
+
+
+class CutflowTable(object):
+
+    def __init__(self, path):
+        self.path    = path
+        self.entries = {}    # region -> (N0, Nf), None if the cutflow is invalid
+        if not os.path.isdir(path):
+            return
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.saf'):
+                self.entries[name[:-4]] = CutflowTable.read(os.path.join(path, name))
+
+    @staticmethod
+    def SumOfWeights(blocks):
+        """ Sum of weights of the last counter of the blocks, -1 if none """
+        result = -1
+        for block in blocks:
+            for line in block.split('\n'):
+                if "sum of weights" in line and not '^2' in line:
+                    words  = line.split()
+                    result = float(words[0])+float(words[1])
+        return result
+
+    @staticmethod
+    def read(filename):
+        text = SafReader.Read(filename)
+        if text is None:
+            return None
+        N0 = CutflowTable.SumOfWeights(SafReader.Blocks(text, 'InitialCounter'))
+        Nf = CutflowTable.SumOfWeights(SafReader.Blocks(text, 'Counter'))
+        if N0 == -1 or Nf == -1:
+            return None
+        return N0, Nf
+
+    def has(self, region):
+        return region in self.entries
+
+    def get(self, region):
+        return self.entries[region]
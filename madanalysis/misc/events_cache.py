@@ -0,0 +1,165 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+On-disk cache of the events reconstructed by the detector simulation.
+
+An entry is addressed by a hash of the input event files, of the detector
+card, of the detector version and of the pileup file. The event files are
+identified by the SHA-1 hash of their full content, so that a renamed or
+aliased dataset hits the same entry. The hashes are memoized in the cache
+folder (hashes.json) per path, inode, size and modification time, so that
+an unchanged file is not read again. Files are placed with hard links
+whenever possible, and the cache is bounded by its total size, the least
+recently used entries being evicted first. The cache is off by default.
+"""
+
+from __future__ import absolute_import
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+
+class EventsCache(object):
+
+    chunk = 1 << 20
+
+    def __init__(self, path, max_size):
+        self.path     = os.path.normpath(path)
+        self.max_size = max_size
+        self.hashes   = None     # path -> inode, size, time and hash of the file
+        self.stored   = False
+        self.logger   = logging.getLogger('MA5')
+
+    def isActive(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def Hash(filename):
+        hasher = hashlib.sha1()
+        with open(filename, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(EventsCache.chunk), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def fingerprint(self, filename):
+        """ SHA-1 hash of the content of a file, memoized while the file is unchanged """
+        filename = os.path.abspath(filename)
+        info     = os.stat(filename)
+        stamp    = [info.st_ino, info.st_size, info.st_mtime]
+        if self.hashes is None:
+            try:
+                with open(os.path.join(self.path, 'hashes.json'), 'r') as stream:
+                    self.hashes = json.load(stream)
+            except (IOError, OSError, ValueError):
+                self.hashes = {}
+        entry = self.hashes.get(filename)
+        if entry is not None and entry[:3] == stamp:
+            return entry[3]
+        self.logger.debug('Hashing '+filename+' for the events cache')
+        digest = EventsCache.Hash(filename)
+        self.hashes[filename] = stamp + [digest]
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            output = os.path.join(self.path, 'hashes.json.'+str(os.getpid()))
+            with open(output, 'w') as stream:
+                json.dump(self.hashes, stream)
+            os.rename(output, os.path.join(self.path, 'hashes.json'))
+        except (IOError, OSError) as err:
+            self.logger.debug('Cannot save the hashes of the events cache: '+str(err))
+        return digest
+
+    def key(self, filenames, card, version, pileups=()):
+        hasher = hashlib.sha1()
+        hasher.update((version+'\n').encode('utf-8'))
+        for filename in filenames:
+            hasher.update((self.fingerprint(filename)+'\n').encode('utf-8'))
+        with open(card, 'rb') as stream:
+            hasher.update(stream.read())
+        for pileup in sorted(pileups):
+            hasher.update((os.path.basename(pileup)+'\n').encode('utf-8'))
+            if os.path.isfile(pileup):
+                hasher.update((self.fingerprint(pileup)+'\n').encode('utf-8'))
+        return hasher.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, key+'.root')
+
+    @staticmethod
+    def place(source, destination):
+        """ Hard link if possible (same file system), copy otherwise """
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination+'.tmp')
+            os.rename(destination+'.tmp', destination)
+
+    def fetch(self, key, destination):
+        entry = self.entry(key)
+        if not os.path.isfile(entry):
+            return False
+        try:
+            EventsCache.place(entry, destination)
+            os.utime(entry, None)
+        except (IOError, OSError) as err:
+            self.logger.debug('Cannot retrieve '+entry+': '+str(err))
+            return False
+        self.logger.info('   Reusing the reconstructed events cached in '+entry)
+        return True
+
+    def store(self, key, source):
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            EventsCache.place(source, self.entry(key))
+        except (IOError, OSError) as err:
+            self.logger.warning('Cannot store the reconstructed events in the cache: '+str(err))
+            return False
+        if not self.stored:
+            self.logger.info('   Reconstructed events stored in the cache '+self.path+\
+                             ' (up to {:g} GB, main.recast.events_cache_size = 0 to switch it off)'.format(self.max_size/1e9))
+            self.stored = True
+        self.evict()
+        return True
+
+    def evict(self):
+        """ Removing the least recently used entries until the cache fits """
+        entries = []
+        for name in os.listdir(self.path):
+            filename = os.path.join(self.path, name)
+            if name.endswith('.root') and os.path.isfile(filename):
+                info = os.stat(filename)
+                entries.append((info.st_mtime, info.st_size, filename))
+        total = sum(x[1] for x in entries)
+        for mtime, size, filename in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.logger.debug('Removing '+filename+' from the events cache')
+            os.remove(filename)
+            total -= size
@@ -24,9 +24,147 @@
 
 from __future__ import absolute_import
 import json, os, copy, math, logging
+import numpy as np
+from collections import OrderedDict
 from six.moves import range
 
 
+class HF_Cache(object):
+    """
+        Process-wide LRU cache of the parsed HistFactory JSON files. Entries
+        are keyed by (path, modification time), so that an edited file is
+        parsed again, and the cache is bounded by the total size of the
+        cached files. Each entry also stores the objects derived from the
+        file (expected observations, signal patch templates).
+
+        The cached specifications are shared: they must not be modified.
+    """
+    max_size = 512 * 1024**2
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size    = 0
+        self.logger  = logging.getLogger('MA5')
+
+    def entry(self, filename):
+        filename = os.path.abspath(filename)
+        stat     = os.stat(filename)
+        key      = (filename, stat.st_mtime)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        # Removing outdated versions of the file
+        for old in [x for x in self.entries.keys() if x[0] == filename]:
+            self.size -= self.entries.pop(old)['size']
+
+        self.logger.debug('Parsing : '+filename)
+        with open(filename, 'r') as json_file:
+            spec = json.load(json_file)
+        self.entries[key] = {'spec': spec, 'size': stat.st_size, 'derived': {}}
+        self.size += stat.st_size
+
+        # Eviction of the least recently used files
+        while self.size > self.max_size and len(self.entries) > 1:
+            _, removed = self.entries.popitem(last=False)
+            self.size -= removed['size']
+        return self.entries[key]
+
+    def load(self, filename):
+        """ Parsed content of a JSON file """
+        return self.entry(filename)['spec']
+
+    def derived(self, filename, key, builder):
+        """ Object derived from a JSON file, built once with builder(spec) """
+        entry = self.entry(filename)
+        if key not in entry['derived']:
+            entry['derived'][key] = builder(entry['spec'])
+        return entry['derived'][key]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+HF_cache = HF_Cache()
+
+
+class HF_Arrays(object):
+    """
+        Array-backed form of the yields of a background HistFactory file.
+        The numbers rescaled by a luminosity extrapolation are gathered in
+        two NumPy arrays: the sample data, shapesys and histosys data scale
+        linearly with the luminosity, the staterror data as its square
+        root. For each channel, the slots locate the arrays in the JSON
+        structure as (sample, modifier, field, begin, end), the modifier
+        being None for the sample data and the field None for the modifier
+        data themselves.
+    """
+    def __init__(self, spec):
+        linear, stat  = [], []
+        self.channels = []
+        for channel in spec.get('channels', []):
+            slots = {'samples': [], 'linear': [], 'stat': []}
+            for isample, sample in enumerate(channel['samples']):
+                slots['samples'].append(HF_Arrays.append(linear, sample['data']))
+                for imod, modifier in enumerate(sample.get('modifiers', [])):
+                    if modifier['type'] == 'shapesys':
+                        slots['linear'].append((isample, imod, None) + \
+                                               HF_Arrays.append(linear, modifier['data']))
+                    elif modifier['type'] == 'histosys':
+                        for field in ['hi_data', 'lo_data']:
+                            slots['linear'].append((isample, imod, field) + \
+                                                   HF_Arrays.append(linear, modifier['data'][field]))
+                    elif modifier['type'] == 'staterror':
+                        slots['stat'].append((isample, imod, None) + \
+                                             HF_Arrays.append(stat, modifier['data']))
+            self.channels.append(slots)
+        self.linear = np.array(linear, dtype=float)
+        self.stat   = np.array(stat,   dtype=float)
+
+    @staticmethod
+    def append(values, data):
+        begin = len(values)
+        values.extend(data)
+        return begin, len(values)
+
+    def extrapolate(self, spec, lumi_scale, included):
+        """ Copy of spec with the channels of included rescaled; the other parts are shared """
+        arrays = {'linear': self.linear * lumi_scale, 'stat': self.stat * math.sqrt(lumi_scale)}
+        HF = dict(spec)
+        HF['channels'] = list(spec['channels'])
+        total_expected = {}
+        for ich, channel in enumerate(spec['channels']):
+            if channel['name'] not in included:
+                continue
+            channel = dict(channel)
+            channel['samples'] = [dict(x, modifiers=[dict(y) for y in x.get('modifiers', [])]) \
+                                  for x in channel['samples']]
+            slots = self.channels[ich]
+            for sample, (begin, end) in zip(channel['samples'], slots['samples']):
+                sample['data'] = arrays['linear'][begin:end].tolist()
+            for kind in ['linear', 'stat']:
+                for isample, imod, field, begin, end in slots[kind]:
+                    modifier = channel['samples'][isample]['modifiers'][imod]
+                    if field is None:
+                        modifier['data'] = arrays[kind][begin:end].tolist()
+                    else:
+                        modifier['data'] = dict(modifier['data'])
+                        modifier['data'][field] = arrays[kind][begin:end].tolist()
+
+            # Summing the samples one after the other, as the yields of the file
+            total = np.zeros(included[channel['name']])
+            for begin, end in slots['samples']:
+                total += arrays['linear'][begin:end]
+            total_expected[channel['name']] = total.tolist()
+            HF['channels'][ich] = channel
+
+        # replace the observed bkg with total expected bkg
+        HF['observations'] = [dict(x, data=total_expected[x['name']]) if x['name'] in total_expected \
+                              else x for x in spec.get('observations', [])]
+        return HF
+
+
 class HistFactory(object):
     def __init__(self,pyhf_config):
         self.pyhf_config = pyhf_config.get('SR'  , {})
@@ -48,105 +186,51 @@ class HistFactory(object):
             observables will be extrapolated and summed, summation is superseeded
             to the observed values since there is no observation in HL. 
             
-            Modifiers are extrapolated with respect to their nature."""
+            Modifiers are extrapolated with respect to their nature. The
+            extrapolated specifications are memoized and must not be modified."""
         lumi = float(lumi)
         if lumi == self.lumi or self.hf in [{},[]]:
             return self.hf
-        HF = copy.deepcopy(self.hf)
-        lumi_scale = round(lumi/self.lumi, 6)
-
-        if isinstance(self, HF_Background):
-            # Background extrapolation
-            total_expected = {}
-            for SR, item in self.pyhf_config.items():
-                if SR != 'lumi':
-                    total_expected[SR] = [0.0]*len(item['data'])
-
-            for iSR in range(len(HF['channels'])):
-                self.logger.debug('  * Extrapolating channel '+ str(HF['channels'][iSR]['name']))
-                if len(total_expected[HF['channels'][iSR]['name']]) == 0:
-                    continue
-
-                # modify the expected data of the sample
-                for sample in range(len(HF['channels'][iSR]['samples'])):
-                    self.logger.debug('    * Extrapolating '+str(HF['channels'][iSR]['samples'][sample]['name'])+ ' sample')
-                    for i in range(len(HF['channels'][iSR]['samples'][sample]['data'])):
-                        HF['channels'][iSR]['samples'][sample]['data'][i] *= lumi_scale
-                        total_expected[HF['channels'][iSR]['name']][i] += HF['channels'][iSR]['samples'][sample]['data'][i]
-
-                    for imod in range(len(HF['channels'][iSR]['samples'][sample]['modifiers'])):
-                        mod_type = HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['type']
-                        if mod_type in ['normsys', 'normfactor', 'shapefactor', 'lumi']:
-                            continue
-
-                        # extrapolate shape variables
-                        elif mod_type == 'shapesys':
-                            for i in range(len(HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data'])):
-                                HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data'][i] *= lumi_scale
-
-                        # extrapolate histo variables
-                        elif mod_type == 'histosys':
-                            for i in range(len(HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data']['hi_data'])):
-                                HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data']['hi_data'][i] *= lumi_scale
-                            for i in range(len(HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data']['lo_data'])):
-                                HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data']['lo_data'][i] *= lumi_scale
-
-                        # extrapolate stat variables
-                        elif mod_type == 'staterror':
-                            for i in range(len(HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data'])):
-                                HF['channels'][iSR]['samples'][sample]['modifiers'][imod]['data'][i] *= math.sqrt(lumi_scale)
-
-            # replace the observed bkg with total expected bkg
-            for key, item in total_expected.items():
-                for iobs in range(len(HF['observations'])):
-                    if key == HF['observations'][iobs]['name']:
-                        if item != []:
-                            HF['observations'][iobs]['data'] = item
-
-        elif isinstance(self, HF_Signal):#type(self) == HF_Signal:
-            # Signal extrapolation
-            for i in range(len(HF)):
-                if HF[i]['op'] == 'remove':
-                    continue
-                HF[i]['value']['data'] = [round(x*lumi_scale,6) for x in HF[i]['value']['data']]
-                # Extrapolate modifiers
-                for imod in range(len(HF[i]['value']['modifiers'])):
-                    mod_type = HF[i]['value']['modifiers'][imod]['type']
-                    if mod_type in ['normsys', 'normfactor', 'shapefactor', 'lumi']:
-                        continue
-
-                    # extrapolate shape variables
-                    elif mod_type == 'shapesys':
-                        for i in range(len(HF[i]['value']['modifiers'][imod]['data'])):
-                            HF[i]['value']['modifiers'][imod]['data'][i] *= lumi_scale
-
-                    # extrapolate histo variables
-                    elif mod_type == 'histosys':
-                        for i in range(len(HF[i]['value']['modifiers'][imod]['data']['hi_data'])):
-                            HF[i]['value']['modifiers'][imod]['data']['hi_data'][i] *= lumi_scale
-                        for i in range(len(HF[i]['value']['modifiers'][imod]['data']['lo_data'])):
-                            HF[i]['value']['modifiers'][imod]['data']['lo_data'][i] *= lumi_scale
-
-                    # extrapolate statistical variables
-                    elif mod_type == 'staterror':
-                        for i in range(len(HF[i]['value']['modifiers'][imod]['data'])):
-                            HF[i]['value']['modifiers'][imod]['data'][i] *= math.sqrt(lumi_scale)
-
-        return HF
+        return self.extrapolate_spec(round(lumi/self.lumi, 6))
+
+    @staticmethod
+    def scale_modifier(modifier, lumi_scale):
+        """ Copy of a modifier extrapolated with respect to its nature """
+        mod_type = modifier['type']
+        if mod_type in ['shapesys', 'staterror']:
+            scale = lumi_scale if mod_type == 'shapesys' else math.sqrt(lumi_scale)
+            return dict(modifier, data=[x*scale for x in modifier['data']])
+        elif mod_type == 'histosys':
+            return dict(modifier, data=dict(modifier['data'],
+                                            hi_data=[x*lumi_scale for x in modifier['data']['hi_data']],
+                                            lo_data=[x*lumi_scale for x in modifier['data']['lo_data']]))
+        return modifier
 
 
 class HF_Background(HistFactory):
     def __init__(self, pyhf_config, expected=False):
         super(HF_Background, self).__init__(pyhf_config)
         self.logger.debug('Reading : '+os.path.join(self.path,self.name))
-        if os.path.isfile(os.path.join(self.path,self.name)):
-            with open(os.path.join(self.path,self.name),'r') as json_file:
-                self.hf = json.load(json_file)
+        filename = os.path.join(self.path,self.name)
+        self.filename = filename
+        self.expected = expected
+        if os.path.isfile(filename):
+            self.hf = HF_cache.load(filename)
+            if expected:
+                self.hf = HF_cache.derived(filename, 'expected', lambda spec : self.impose_expected())
         else:
-            self.logger.warning('Can not find file : '+ os.path.join(self.path,self.name))
-
-        if expected:
-            self.hf = self.impose_expected()
+            self.logger.warning('Can not find file : '+ filename)
+
+    def extrapolate_spec(self, lumi_scale):
+        """ Extrapolated background, built once per file, profile and luminosity """
+        # Channels extrapolated: the profile channels with signal regions
+        included = tuple((SR, len(item['data'])) for SR, item in self.pyhf_config.items() \
+                         if SR != 'lumi' and len(item['data']) != 0)
+        def build(spec):
+            self.logger.debug('  * Extrapolating '+self.filename+' by a factor '+str(lumi_scale))
+            arrays = HF_cache.derived(self.filename, 'arrays', HF_Arrays)
+            return arrays.extrapolate(self.hf, lumi_scale, dict(included))
+        return HF_cache.derived(self.filename, ('extrapolated', self.expected, lumi_scale, included), build)
 
     def size(self):
         # The number of SRs in the likelihood profile
@@ -211,27 +295,18 @@ class HF_Signal(HistFactory):
     """
     def __init__(self,pyhf_config, regiondata, xsection=-1, **kwargs):
         super(HF_Signal, self).__init__(pyhf_config)
-        self.signal_config = {}
-
-        with open(os.path.join(self.path, self.name), 'r') as json_file:
-            tmp_bkg = json.load(json_file)
-
-        bin_sizes = [len(x.get('data', [])) for x in tmp_bkg.get('observations',[])]
+        # The structure of the patch only depends on the background file
+        # and on the channels of the profile: it is built once and cached.
+        template_key = ('signal',) + tuple(
+            (key, str(item['channels']), bool(item['is_included']))
+            for key, item in self.pyhf_config.items() if key != 'lumi'
+        )
+        self.signal_config = copy.deepcopy(HF_cache.derived(
+            os.path.join(self.path, self.name), template_key, self.build_template
+        ))
 
         for key, item in self.pyhf_config.items():
             if key != 'lumi':
-                self.signal_config[key] = {}
-                if not item['is_included']:
-                    self.signal_config[key]['op'] = 'remove'
-                    self.signal_config[key]["path"] = '/channels/' + str(item['channels'])
-                else:
-                    self.signal_config[key]['op'] = 'add'
-                    self.signal_config[key]["path"] = \
-                        '/channels/' + str(item['channels']) + '/samples/' + \
-                        str(len(tmp_bkg["channels"][int(item['channels'])]["samples"])-1)
-                    self.signal_config[key]["bin_size"] = \
-                        bin_sizes[int(self.signal_config[key]["path"].split('/')[2])]
-
                 self.signal_config[key]['data'] = []
                 for SRname in item['data']:
                     if kwargs.get('validate',False):
@@ -243,10 +318,51 @@ class HF_Signal(HistFactory):
                             regiondata[SRname]['Nf']/regiondata[SRname]['N0']
                         )
 
+        self.extrapolated = {}
         self.hf = self.set_HF(xsection, background   = kwargs.get('background',  {}),
                                         add_normsys  = kwargs.get('add_normsys', []),
                                         add_histosys = kwargs.get('add_histosys',[]),)
 
+    def build_template(self, tmp_bkg):
+        """ Operation, path and bin size of the patch for each channel """
+        template  = {}
+        bin_sizes = [len(x.get('data', [])) for x in tmp_bkg.get('observations',[])]
+        for key, item in self.pyhf_config.items():
+            if key != 'lumi':
+                template[key] = {}
+                if not item['is_included']:
+                    template[key]['op'] = 'remove'
+                    template[key]["path"] = '/channels/' + str(item['channels'])
+                else:
+                    template[key]['op'] = 'add'
+                    template[key]["path"] = \
+                        '/channels/' + str(item['channels']) + '/samples/' + \
+                        str(len(tmp_bkg["channels"][int(item['channels'])]["samples"])-1)
+                    template[key]["bin_size"] = \
+                        bin_sizes[int(template[key]["path"].split('/')[2])]
+        return template
+
+    def rescale(self, xsection):
+        """ Rebuilding the patch for a new cross section, the efficiencies being kept """
+        self.hf = self.set_HF(xsection)
+        self.extrapolated = {}
+        return self
+
+    def extrapolate_spec(self, lumi_scale):
+        """ Extrapolated patch, built once per luminosity for the current cross section """
+        if lumi_scale not in self.extrapolated:
+            HF = []
+            for patch in self.hf:
+                if patch['op'] == 'remove':
+                    HF.append(patch)
+                    continue
+                value = dict(patch['value'])
+                value['data']      = [round(x*lumi_scale,6) for x in value['data']]
+                value['modifiers'] = [self.scale_modifier(x, lumi_scale) for x in value['modifiers']]
+                HF.append(dict(patch, value=value))
+            self.extrapolated[lumi_scale] = HF
+        return self.extrapolated[lumi_scale]
+
     def set_HF(self, xsection, **kwargs):
         HF = []
         if xsection<=0.:
@@ -356,6 +472,7 @@ class HF_Signal(HistFactory):
         return HF
 
     def clear_modifiers(self):
+        self.extrapolated = {}
         for i in range(len(self.hf)):
             self.hf[i]['value']['modifiers'] = [
                                                  {'data': None, 
@@ -375,8 +492,7 @@ def get_HFID(file,SRname):
         Extract the location of the profiles within the JSON file.
     """
     if os.path.isfile(file):
-        with open(file, 'r') as json_file:
-            HF = json.load(json_file)
+        HF = HF_cache.load(file)
     else:
         return 'Can not find background file: '+file
     for ch in HF['channels']:
@@ -0,0 +1,103 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Tables of the limits on the number of signal events of the PAD analyses.
+
+The 95% CL limit on the number of signal events of a signal region only
+depends on the observed and expected numbers of background events and on
+the background uncertainty; the signal efficiency only converts it into a
+cross section. The limits are thus computed once and saved in the file
+<analysis>.limits next to <analysis>.info, with one table per calculator
+configuration (backend, number of toys, seed, ...). An entry is addressed
+by the region, the kind of limit (exp or obs) and the region inputs, so
+that the rescaled inputs of extrapolated luminosities get their own
+entries. The file is updated under a lock (<analysis>.limits.lock), the
+datasets of a run being possibly processed concurrently.
+"""
+
+from __future__ import absolute_import
+import fcntl
+import json
+import logging
+import os
+
+
+class LimitTable(object):
+
+    version = 1
+
+    def __init__(self, infofile, calculator):
+        self.filename   = os.path.splitext(infofile)[0]+'.limits'
+        self.calculator = calculator
+        self.new        = {}
+        self.logger     = logging.getLogger('MA5')
+        self.entries    = self.read().get(calculator, {})
+
+    def read(self):
+        """ All the tables of the file """
+        if not os.path.isfile(self.filename):
+            return {}
+        try:
+            with open(self.filename, 'r') as stream:
+                content = json.load(stream)
+        except (IOError, OSError, ValueError) as err:
+            self.logger.debug('Cannot read the limit table '+self.filename+': '+str(err))
+            return {}
+        if not isinstance(content, dict) or content.get('version') != LimitTable.version:
+            return {}
+        return content.get('tables', {})
+
+    @staticmethod
+    def key(region, tag, nobs, nb, deltanb):
+        return '|'.join([region, tag] + [repr(float(x)) for x in [nobs, nb, deltanb]])
+
+    def get(self, region, tag, nobs, nb, deltanb):
+        """ Limit in number of events, None if not tabulated """
+        return self.entries.get(LimitTable.key(region, tag, nobs, nb, deltanb))
+
+    def set(self, region, tag, nobs, nb, deltanb, limit):
+        key = LimitTable.key(region, tag, nobs, nb, deltanb)
+        self.entries[key] = float(limit)
+        self.new[key]     = float(limit)
+
+    def save(self):
+        """ Adding the new entries to the file (merged with the entries saved meanwhile) """
+        if len(self.new) == 0:
+            return True
+        temporary = self.filename+'.'+str(os.getpid())+'.tmp'
+        try:
+            with open(self.filename+'.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                tables = self.read()
+                tables.setdefault(self.calculator, {}).update(self.new)
+                with open(temporary, 'w') as stream:
+                    json.dump({'version': LimitTable.version, 'tables': tables}, stream, indent=0, sort_keys=True)
+                os.rename(temporary, self.filename)
+        except (IOError, OSError) as err:
+            self.logger.debug('Cannot write the limit table '+self.filename+': '+str(err))
+            return False
+        self.logger.debug(str(len(self.new))+' limits added to '+self.filename)
+        self.new = {}
+        return True
@@ -25,13 +25,13 @@
 from __future__ import absolute_import
 
 import copy
+import hashlib
 import json
 import logging
 import math
 import os
 import shutil
 import sys
-import time
 from collections import OrderedDict
 import numpy as np
 
@@ -47,9 +47,15 @@ from madanalysis.install.detector_manager import DetectorManager
 from madanalysis.IOinterface.folder_writer import FolderWriter
 from madanalysis.IOinterface.job_writer import JobWriter
 from madanalysis.IOinterface.library_writer import LibraryWriter
+from madanalysis.misc.analysis_info import AnalysisInfo, CutflowTable
+from madanalysis.misc.events_cache import EventsCache
+from madanalysis.misc.limit_table import LimitTable
 from madanalysis.misc.histfactory_reader import (
     HF_Background, HF_Signal,get_HFID
 )
+from madanalysis.misc.toy_cls import ToyCLsEngine
+from madanalysis.misc.toy_limits import upper_limits
+from madanalysis.system.process_pool import ProcessPool
 
 
 class RunRecast():
@@ -67,10 +73,20 @@ class RunRecast():
         self.ntoys            = self.main.recasting.CLs_numofexps
         self.pyhf_config      = {} # initialize and configure histfactory
         self.cov_config       = {}
+        self.sl_computer      = None
+        self.limit_table      = None
+        self.info_cache       = {} # analysis -> AnalysisInfo, parsed once per run
+        self.cutflows         = {} # analysis -> CutflowTable of the current dataset
         self.logger           = logging.getLogger('MA5')
         self.is_apriori       = True
-        self.cls_calculator   = cls
+        self.cls_calculator   = ToyCLsEngine(self.ntoys, seed=self.main.recasting.CLs_seed)
         self.TACO_output      = self.main.recasting.TACO_output
+        self.ncores           = self.main.recasting.ncores
+        self.workdir          = self.dirname+'_RecastRun'
+        self.sfsdir           = self.dirname+'_SFSRun'
+        self.pad_executable   = None
+        self.events_cache     = EventsCache(self.main.recasting.events_cache,
+                                            self.main.recasting.events_cache_size*1e9)
 
     def init(self):
         ### First, the analyses to take care off
@@ -112,7 +128,7 @@ class RunRecast():
     ## Running the machinery
     def execute(self):
         self.main.forced=True
-        for delphescard in list(set(sorted(self.delphes_runcard))):
+        for delphescard in sorted(set(self.delphes_runcard)):
             ## Extracting run infos and checks
             version = delphescard[:4]
             card    = delphescard[5:]
@@ -120,25 +136,63 @@ class RunRecast():
                 self.main.forced=self.forced
                 return False
 
-            ## Running the fastsim
+            ## Running the fastsim and the analyses, one dataset per process
             if not self.fastsim_single(version, card):
                 self.main.forced=self.forced
                 return False
             self.main.fastsim.package = self.detector
-
-            ## Running the analyses
             if not self.analysis_single(version, card):
                 self.main.forced=self.forced
                 return False
 
-            ## Cleaning
-            if not FolderWriter.RemoveDirectory(os.path.normpath(self.dirname+'_RecastRun')):
-                return False
-
         # exit
         self.main.forced=self.forced
         return True
 
+    ## Running the fastsim, the analyses and the CLs calculation for one dataset,
+    ## in a work directory of its own
+    def run_dataset(self, version, card, analyses, myset, index=None):
+        if index is not None:
+            self.workdir = self.dirname+'_RecastRun_'+str(index)
+            self.sfsdir  = self.dirname+'_SFSRun_'+str(index)
+        try:
+            if version in ['v1.1', 'v1.2']:
+                ## Detector simulation, if the events have not been generated yet
+                evtfile = os.path.normpath(self.dirname + '/Output/SAF/' + myset.name + '/RecoEvents/RecoEvents_' +\
+                       version.replace('.','x')+'_' + card.replace('.tcl','')+'.root')
+                self.logger.debug('- applying fastsim and producing '+evtfile+'...')
+                if not os.path.isfile(evtfile):
+                    cachekey = self.events_cache_key(version, card, myset)
+                    if cachekey is None or not self.events_cache.fetch(cachekey, evtfile):
+                        if not self.generate_events(myset,card):
+                            return False
+                        if cachekey is not None:
+                            self.events_cache.store(cachekey, evtfile)
+                    self.main.fastsim.package = self.detector
+                ## Running the PAD
+                if not self.analysis_dataset(version, card, analyses, myset):
+                    return False
+            else:
+                # Run SFS
+                if not self.run_SimplifiedFastSim(myset,self.main.archi_info.ma5dir+\
+                                                  '/tools/PADForSFS/Input/Cards/'+\
+                                                  card,analyses):
+                    return False
+                if self.main.recasting.store_root:
+                    self.logger.warning("Simplified-FastSim does not use root, hence file will not be stored.")
+
+            ## Running the CLs exclusion script (if available)
+            self.logger.debug('Compute CLs exclusion for '+myset.name)
+            if self.ntoys>0 and not self.compute_cls(analyses,myset):
+                return False
+        finally:
+            ## Cleaning
+            if os.path.isdir(self.workdir):
+                FolderWriter.RemoveDirectory(os.path.normpath(self.workdir))
+            if index is not None:
+                self.workdir = self.dirname+'_RecastRun'
+                self.sfsdir  = self.dirname+'_SFSRun'
+        return True
 
     ## Prompt to edit the recasting card
     def edit_recasting_card(self):
@@ -214,22 +268,7 @@ class RunRecast():
                 self.logger.error('Problem with the activation of delphesMA5tune')
                 return False
 
-        # Checking whether events have already been generated and if not, event generation
-        self.logger.debug('Loop over the datasets...')
-        for item in self.main.datasets:
-            if self.detector=="delphesMA5tune":
-                evtfile = self.dirname+'/Output/SAF/'+item.name+'/RecoEvents/RecoEvents_v1x1_'+delphescard.replace('.tcl','')+'.root'
-            elif self.detector=="delphes":
-                evtfile = self.dirname+'/Output/SAF/'+item.name+'/RecoEvents/RecoEvents_v1x2_'+delphescard.replace('.tcl','')+'.root'
-            elif self.detector=="fastjet":
-                return True
-
-            self.logger.debug('- applying fastsim and producing '+evtfile+'...')
-            if not os.path.isfile(os.path.normpath(evtfile)):
-                if not self.generate_events(item,delphescard):
-                    return False
-
-        # Exit
+        # Exit (the events are generated dataset by dataset, see run_dataset)
         return True
 
     def fastsim_header(self, version):
@@ -249,34 +288,41 @@ class RunRecast():
             self.logger.info("   "+StringTools.Center(tag+' detector simulations',57))
             self.logger.info("   **********************************************************")
 
-    def run_delphes(self,dataset,card):
+    def prepare_workdir(self,card):
         # Initializing the JobWriter
-        if os.path.isdir(self.dirname+'_RecastRun'):
-            if not FolderWriter.RemoveDirectory(os.path.normpath(self.dirname+'_RecastRun')):
-                return False
-        jobber = JobWriter(self.main,self.dirname+'_RecastRun')
+        if os.path.isdir(self.workdir):
+            if not FolderWriter.RemoveDirectory(os.path.normpath(self.workdir)):
+                return None
+        jobber = JobWriter(self.main,self.workdir)
 
         # Writing process
-        self.logger.info("   Creating folder '"+self.dirname.split('/')[-1]  + "_RecastRun'...")
+        self.logger.info("   Creating folder '"+self.workdir.split('/')[-1]+"'...")
         if not jobber.Open():
-            return False
+            return None
         self.logger.info("   Copying 'SampleAnalyzer' source files...")
         if not jobber.CopyLHEAnalysis():
-            return False
+            return None
         if not jobber.CreateBldDir():
-            return False
+            return None
         self.logger.info("   Inserting your selection into 'SampleAnalyzer'...")
         if not jobber.WriteSelectionHeader(self.main):
-            return False
+            return None
         if not jobber.WriteSelectionSource(self.main):
-            return False
-        self.logger.info("   Writing the list of datasets...")
-        jobber.WriteDatasetList(dataset)
+            return None
         self.logger.info("   Creating Makefiles...")
         if not jobber.WriteMakefiles():
-            return False
+            return None
         self.logger.debug("   Fixing the pileup path...")
-        self.fix_pileup(self.dirname+'_RecastRun/Input/'+card)
+        self.fix_pileup(self.workdir+'/Input/'+card)
+        return jobber
+
+    def run_delphes(self,dataset,card):
+        # Preparing the work directory
+        jobber = self.prepare_workdir(card)
+        if jobber is None:
+            return False
+        self.logger.info("   Writing the list of datasets...")
+        jobber.WriteDatasetList(dataset)
 
         # Creating executable
         self.logger.info("   Compiling 'SampleAnalyzer'...")
@@ -338,7 +384,7 @@ class RunRecast():
             self.logger.debug("   Setting the output LHE file :"+output_name)
 
         # Initializing the JobWriter
-        jobber = JobWriter(self.main,self.dirname+'_SFSRun')
+        jobber = JobWriter(self.main,self.sfsdir)
 
         # Writing process
         self.logger.info("   Creating folder '"+self.dirname.split('/')[-1]  + "'...")
@@ -351,10 +397,10 @@ class RunRecast():
             return False
         if not jobber.WriteSelectionHeader(self.main):
             return False
-        os.remove(self.dirname+'_SFSRun/Build/SampleAnalyzer/User/Analyzer/user.h')
+        os.remove(self.sfsdir+'/Build/SampleAnalyzer/User/Analyzer/user.h')
         if not jobber.WriteSelectionSource(self.main):
             return False
-        os.remove(self.dirname+'_SFSRun/Build/SampleAnalyzer/User/Analyzer/user.cpp')
+        os.remove(self.sfsdir+'/Build/SampleAnalyzer/User/Analyzer/user.cpp')
         #######
         self.logger.info("   Writing the list of datasets...")
         jobber.WriteDatasetList(dataset)
@@ -362,7 +408,7 @@ class RunRecast():
         if not jobber.WriteMakefiles():
             return False
         # Copying the analysis files
-        analysisList = open(self.dirname+'_SFSRun/Build/SampleAnalyzer/User/Analyzer/analysisList.h','w')
+        analysisList = open(self.sfsdir+'/Build/SampleAnalyzer/User/Analyzer/analysisList.h','w')
         for ana in analysislist:
             analysisList.write('#include "SampleAnalyzer/User/Analyzer/'+ana+'.h"\n')
         analysisList.write('#include "SampleAnalyzer/Process/Analyzer/AnalyzerManager.h"\n')
@@ -377,10 +423,10 @@ class RunRecast():
             for ana in analysislist:
                 shutil.copyfile\
                     (self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+ana+'.cpp',\
-                     self.dirname+'_SFSRun/Build/SampleAnalyzer/User/Analyzer/'+ana+'.cpp')
+                     self.sfsdir+'/Build/SampleAnalyzer/User/Analyzer/'+ana+'.cpp')
                 shutil.copyfile\
                     (self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+ana+'.h',\
-                     self.dirname+'_SFSRun/Build/SampleAnalyzer/User/Analyzer/'+ana+'.h')
+                     self.sfsdir+'/Build/SampleAnalyzer/User/Analyzer/'+ana+'.h')
                 analysisList.write('  manager.Add("'+ana+'", new '+ana+');\n')
         except Exception as err:
             self.logger.debug(str(err))
@@ -392,10 +438,10 @@ class RunRecast():
 
         # Update Main
         self.logger.info("   Updating the main executable")
-        shutil.move(self.dirname+'_SFSRun/Build/Main/main.cpp',\
-                    self.dirname+'_SFSRun/Build/Main/main.bak')
-        mainfile = open(self.dirname+"_SFSRun/Build/Main/main.bak",'r')
-        newfile  = open(self.dirname+"_SFSRun/Build/Main/main.cpp",'w')
+        shutil.move(self.sfsdir+'/Build/Main/main.cpp',\
+                    self.sfsdir+'/Build/Main/main.bak')
+        mainfile = open(self.sfsdir+"/Build/Main/main.bak",'r')
+        newfile  = open(self.sfsdir+"/Build/Main/main.cpp",'w')
         ignore = False
         for line in mainfile:
             if '// Getting pointer to the analyzer' in line:
@@ -468,46 +514,45 @@ class RunRecast():
             if not os.path.isdir(self.dirname+'/Output/SAF/'+dataset.name+'/'+analysis+'/RecoEvents') and \
                self.main.recasting.store_events :
                 os.mkdir(self.dirname+'/Output/SAF/'+dataset.name+'/'+analysis+'/RecoEvents')
-            cutflow_list   = os.listdir(self.dirname+'_SFSRun/Output/SAF/_'+ dataset.name+'/'+analysis+'_0/Cutflows')
-            histogram_list = os.listdir(self.dirname+'_SFSRun/Output/SAF/_'+ dataset.name+'/'+analysis+'_0/Histograms')
+            cutflow_list   = os.listdir(self.sfsdir+'/Output/SAF/_'+ dataset.name+'/'+analysis+'_0/Cutflows')
+            histogram_list = os.listdir(self.sfsdir+'/Output/SAF/_'+ dataset.name+'/'+analysis+'_0/Histograms')
             # Copy dataset info file
-            if os.path.isfile(self.dirname+'_SFSRun/Output/SAF/_'+ dataset.name+'/_'+ dataset.name+'.saf'):
-                shutil.move(self.dirname+'_SFSRun/Output/SAF/_'+ dataset.name+'/_'+ dataset.name+'.saf',\
+            if os.path.isfile(self.sfsdir+'/Output/SAF/_'+ dataset.name+'/_'+ dataset.name+'.saf'):
+                shutil.move(self.sfsdir+'/Output/SAF/_'+ dataset.name+'/_'+ dataset.name+'.saf',\
                             self.dirname+'/Output/SAF/'+dataset.name+'/'+ dataset.name+'.saf')
             for cutflow in cutflow_list:
-                shutil.move(self.dirname+'_SFSRun/Output/SAF/_'+\
+                shutil.move(self.sfsdir+'/Output/SAF/_'+\
                                       dataset.name+'/'+analysis+'_0/Cutflows/'+cutflow,\
                                       self.dirname+'/Output/SAF/'+dataset.name+'/'+\
                                       analysis+'/Cutflows/'+cutflow)
             for histos in histogram_list:
-                shutil.move(self.dirname+'_SFSRun/Output/SAF/_'+\
+                shutil.move(self.sfsdir+'/Output/SAF/_'+\
                                       dataset.name+'/'+analysis+'_0/Histograms/'+histos,\
                                       self.dirname+'/Output/SAF/'+dataset.name+'/'+\
                                       analysis+'/Histograms/'+histos)
             if self.main.recasting.store_events:
-                event_list     = os.listdir(self.dirname+'_SFSRun/Output/SAF/_'+ dataset.name+'/lheEvents0_0/')
+                event_list     = os.listdir(self.sfsdir+'/Output/SAF/_'+ dataset.name+'/lheEvents0_0/')
                 if len(event_list) > 0:
-                    shutil.move(self.dirname+'_SFSRun/Output/SAF/_'+dataset.name+\
+                    shutil.move(self.sfsdir+'/Output/SAF/_'+dataset.name+\
                                 '/lheEvents0_0/'+event_list[0], self.dirname+\
                                 '/Output/SAF/'+dataset.name+'/'+analysis+'/RecoEvents/'+\
                                 event_list[0])
             if self.TACO_output!='':
                 filename  = '.'.join(self.TACO_output.split('.')[:-1]) + '_' + \
                     card.split('/')[-1].replace('ma5','') + self.TACO_output.split('.')[-1]
-                shutil.move(self.dirname+'_SFSRun/Output/'+self.TACO_output,self.dirname+'/Output/SAF/'+dataset.name+'/'+filename)
+                shutil.move(self.sfsdir+'/Output/'+self.TACO_output,self.dirname+'/Output/SAF/'+dataset.name+'/'+filename)
 
         if not self.main.developer_mode:
             # Remove the analysis folder
-            if not FolderWriter.RemoveDirectory(os.path.normpath(self.dirname+'_SFSRun')):
-                self.logger.error("Cannot remove directory: "+self.dirname+'_SFSRun')
+            if not FolderWriter.RemoveDirectory(os.path.normpath(self.sfsdir)):
+                self.logger.error("Cannot remove directory: "+self.sfsdir)
         else:
-            self.logger.debug("Analysis kept in "+self.dirname+'_SFSRun folder.')
+            self.logger.debug("Analysis kept in "+self.sfsdir+' folder.')
 
         return True
 
 
-    def generate_events(self,dataset,card):
-        # Preparing the run
+    def set_fastsim(self,card):
         self.main.recasting.status="off"
         self.main.fastsim.package=self.detector
         self.main.fastsim.clustering=0
@@ -519,23 +564,52 @@ class RunRecast():
             self.main.fastsim.delphesMA5tune = 0
             self.main.fastsim.delphes        = DelphesConfiguration()
             self.main.fastsim.delphes.card   = os.path.normpath("../../../../tools/PAD/Input/Cards/"+card)
+
+    def unset_fastsim(self):
+        self.main.recasting.status="on"
+        self.main.fastsim.package="none"
+
+    def events_cache_key(self, version, card, dataset):
+        ## Key of the reconstructed events in the cache (None if the cache is off)
+        if not self.events_cache.isActive():
+            return None
+        cardfile = os.path.join(self.pad,'Input','Cards',card)
+        pileups  = []
+        with open(cardfile,'r') as cardstream:
+            for line in cardstream:
+                words = line.split()
+                if len(words)>=3 and words[0]=='set' and words[1]=='PileUpFile':
+                    pileups.append(os.path.join(self.pad,'Input','Pileup',words[2].split('/')[-1]))
+        try:
+            key = self.events_cache.key(dataset.filenames, cardfile, version+' '+self.detector, pileups)
+        except (IOError, OSError) as err:
+            self.logger.debug('No cache for the reconstructed events: '+str(err))
+            return None
+        ## Making sure the output directory exists
+        outdir = os.path.join(self.dirname,'Output','SAF',dataset.name,'RecoEvents')
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        return key
+
+    def generate_events(self,dataset,card):
+        # Preparing the run
+        self.set_fastsim(card)
         # Execution
         if not self.run_delphes(dataset,card):
             self.logger.error('The '+self.detector+' problem with the running of the fastsim')
             return False
         # Restoring the run
-        self.main.recasting.status="on"
-        self.main.fastsim.package="none"
+        self.unset_fastsim()
         ## Saving the output
         if not os.path.isdir(self.dirname+'/Output/SAF/'+dataset.name):
             os.mkdir(self.dirname+'/Output/SAF/'+dataset.name)
         if not os.path.isdir(self.dirname+'/Output/SAF/'+dataset.name+'/RecoEvents'):
             os.mkdir(self.dirname+'/Output/SAF/'+dataset.name+'/RecoEvents')
         if self.detector=="delphesMA5tune":
-            shutil.move(self.dirname+'_RecastRun/Output/SAF/_'+dataset.name+'/RecoEvents0_0/DelphesMA5tuneEvents.root',\
+            shutil.move(self.workdir+'/Output/SAF/_'+dataset.name+'/RecoEvents0_0/DelphesMA5tuneEvents.root',\
                 self.dirname+'/Output/SAF/'+dataset.name+'/RecoEvents/RecoEvents_v1x1_'+card.replace('.tcl','')+'.root')
         elif self.detector=="delphes":
-            shutil.move(self.dirname+'_RecastRun/Output/SAF/_'+dataset.name+'/RecoEvents0_0/DelphesEvents.root',\
+            shutil.move(self.workdir+'/Output/SAF/_'+dataset.name+'/RecoEvents0_0/DelphesEvents.root',\
                 self.dirname+'/Output/SAF/'+dataset.name+'/RecoEvents/RecoEvents_v1x2_'+card.replace('.tcl','')+'.root')
         ## Exit
         return True
@@ -560,50 +634,136 @@ class RunRecast():
                 analyses = [ x for x in analyses if x in ana_list]
                 break
 
-        # Executing the PAD
-        for myset in self.main.datasets:
-            if version in ['v1.1', 'v1.2']:
-                ## Preparing the PAD
-                self.update_pad_main(analyses)
-                if not self.make_pad():
-                    self.main.forced=self.forced
-                    return False
-                ## Getting the file name corresponding to the events
-                eventfile = os.path.normpath(self.dirname + '/Output/SAF/' + myset.name + '/RecoEvents/RecoEvents_' +\
-                       version.replace('.','x')+'_' + card.replace('.tcl','')+'.root')
-                if not os.path.isfile(eventfile):
-                    self.logger.error('The file called '+eventfile+' is not found...')
-                    return False
-                ## Running the PAD
-                if not self.run_pad(eventfile):
-                    self.main.forced=self.forced
-                    return False
-                ## Saving the output and cleaning
-                if not self.save_output('\"'+eventfile+'\"', myset.name, analyses, card):
-                    self.main.forced=self.forced
-                    return False
-                if not self.main.recasting.store_root:
-                    os.remove(eventfile)
-                else:
-                    time.sleep(1.);
-            else:
-                # Run SFS
-                if not self.run_SimplifiedFastSim(myset,self.main.archi_info.ma5dir+\
-                                                  '/tools/PADForSFS/Input/Cards/'+\
-                                                  card,analyses):
-                    return False
-                if self.main.recasting.store_root:
-                    self.logger.warning("Simplified-FastSim does not use root, hence file will not be stored.")
+        # Compiling the PAD once for all datasets
+        if version in ['v1.1', 'v1.2'] and not self.build_pad(version, card, analyses):
+            self.main.forced=self.forced
+            return False
 
-            ## Running the CLs exclusion script (if available)
-            self.logger.debug('Compute CLs exclusion for '+myset.name)
-            if self.ntoys>0 and not self.compute_cls(analyses,myset):
-                self.main.forced=self.forced
-                return False
+        # Executing the PAD, the datasets being processed in parallel if requested.
+        # Each dataset has its own output directory, so that no merging is needed.
+        if self.ncores > 1 and len(self.main.datasets) > 1:
+            self.logger.info("   Processing "+str(len(self.main.datasets))+" datasets on "+\
+                             str(min(self.ncores, len(self.main.datasets)))+" cores...")
+            results = ProcessPool.Map(
+                lambda i : self.run_dataset(version, card, analyses, self.main.datasets[i], index=i),
+                range(len(self.main.datasets)), self.ncores
+            )
+        else:
+            results = []
+            for myset in self.main.datasets:
+                results.append(self.run_dataset(version, card, analyses, myset))
+                if not results[-1]:
+                    break
+        if not all(results):
+            self.main.forced=self.forced
+            return False
 
         # Exit
         return True
 
+    def analysis_dataset(self, version, card, analyses, myset):
+        ## Preparing the PAD
+        if not os.path.isdir(self.workdir):
+            self.set_fastsim(card)
+            jobber = self.prepare_workdir(card)
+            self.unset_fastsim()
+            self.main.fastsim.package=self.detector
+            if jobber is None:
+                return False
+        shutil.copy(self.pad_executable, os.path.join(self.workdir,'Build','MadAnalysis5job'))
+        ## Getting the file name corresponding to the events
+        eventfile = os.path.normpath(self.dirname + '/Output/SAF/' + myset.name + '/RecoEvents/RecoEvents_' +\
+               version.replace('.','x')+'_' + card.replace('.tcl','')+'.root')
+        if not os.path.isfile(eventfile):
+            self.logger.error('The file called '+eventfile+' is not found...')
+            return False
+        ## Running the PAD
+        if not self.run_pad(eventfile):
+            return False
+        ## Saving the output and cleaning
+        if not self.save_output('\"'+eventfile+'\"', myset.name, analyses, card):
+            return False
+        if not self.main.recasting.store_root:
+            os.remove(eventfile)
+        return True
+
+    def pad_build_key(self, version, card, analyses):
+        ## Hash of everything the PAD executable depends on: the analysis list,
+        ## the detector card, the PAD sources and the SampleAnalyzer libraries
+        key = hashlib.sha1()
+        for item in [version, card, self.detector, self.TACO_output] + sorted(analyses):
+            key.update((item+'\n').encode('utf-8'))
+        sources = [self.pad+'/Build/Main/main.bak']
+        for analysis in sorted(analyses):
+            sources.append(self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.cpp')
+            sources.append(self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.h')
+        for source in sources:
+            with open(source,'rb') as source_file:
+                key.update(source_file.read())
+        libdir = os.path.join(self.main.archi_info.ma5dir,'tools','SampleAnalyzer','Lib')
+        if os.path.isdir(libdir):
+            for lib in sorted(os.listdir(libdir)):
+                info = os.stat(os.path.join(libdir,lib))
+                key.update((lib+' '+str(info.st_size)+' '+str(info.st_mtime)+'\n').encode('utf-8'))
+        return key.hexdigest()
+
+    def build_pad(self, version, card, analyses):
+        ## Safety (for backwards compatibility)
+        if not os.path.isfile(self.pad+'/Build/Main/main.bak'):
+            shutil.copy(self.pad+'/Build/Main/main.cpp',self.pad+'/Build/Main/main.bak')
+
+        ## Looking for an existing build
+        cachedir = os.path.join(self.pad,'Build','Cache',self.pad_build_key(version, card, analyses))
+        self.pad_executable = os.path.join(cachedir,'MadAnalysis5job')
+        if os.path.isfile(self.pad_executable):
+            self.logger.info('   Reusing the PAD executable compiled in '+cachedir)
+            os.utime(cachedir, None)
+            return True
+
+        ## Compiling the PAD in a dedicated work directory
+        self.workdir = self.dirname+'_RecastBuild'
+        try:
+            self.set_fastsim(card)
+            jobber = self.prepare_workdir(card)
+            self.unset_fastsim()
+            self.main.fastsim.package=self.detector
+            if jobber is None:
+                return False
+            if not self.update_pad_main(analyses):
+                return False
+            if not self.make_pad():
+                return False
+            ## Storing the executable (the renaming is atomic)
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+            shutil.copy(os.path.join(self.workdir,'Build','MadAnalysis5job'), self.pad_executable+'.tmp')
+            os.rename(self.pad_executable+'.tmp', self.pad_executable)
+            os.utime(cachedir, None)
+        finally:
+            if os.path.isdir(self.workdir):
+                FolderWriter.RemoveDirectory(os.path.normpath(self.workdir))
+            self.workdir = self.dirname+'_RecastRun'
+        self.logger.info('   PAD executable stored in '+cachedir+' (the '+\
+                         str(self.main.recasting.pad_cache_size)+' most recently used ones are kept, '+\
+                         'main.recast.pad_cache_size; remove '+os.path.dirname(cachedir)+' to clear them)')
+        self.evict_pad_builds(cachedir)
+        return True
+
+    def evict_pad_builds(self, current):
+        ## Removing the least recently used PAD executables beyond main.recast.pad_cache_size
+        ## (a build is copied into the run directory, so removing it does not affect a running job).
+        ## The whole cache can be cleared by removing the folder <PAD>/Build/Cache.
+        cache  = os.path.dirname(current)
+        builds = []
+        for name in os.listdir(cache):
+            path = os.path.join(cache, name)
+            if os.path.isdir(path) and path!=current:
+                builds.append((os.path.getmtime(path), path))
+        nremoved = len(builds)+1-self.main.recasting.pad_cache_size
+        for mtime, path in sorted(builds)[:max(0, nremoved)]:
+            self.logger.debug('Removing the PAD executable compiled in '+path)
+            FolderWriter.RemoveDirectory(path)
+
     def analysis_header(self, version, card):
         ## Printing
         self.logger.info("   **********************************************************")
@@ -619,13 +779,13 @@ class RunRecast():
         if not os.path.isfile(self.pad+'/Build/Main/main.bak'):
             shutil.copy(self.pad+'/Build/Main/main.cpp',self.pad+'/Build/Main/main.bak')
         mainfile     = open(self.pad+"/Build/Main/main.bak",'r')
-        newfile      = open(self.dirname+"_RecastRun/Build/Main/main.cpp",'w')
+        newfile      = open(self.workdir+"/Build/Main/main.cpp",'w')
         # Clean the analyzer folder
-        if not FolderWriter.RemoveDirectory(os.path.normpath(self.dirname+'_RecastRun/Build/SampleAnalyzer/User/Analyzer')):
+        if not FolderWriter.RemoveDirectory(os.path.normpath(self.workdir+'/Build/SampleAnalyzer/User/Analyzer')):
             return False
-        os.mkdir(os.path.normpath(self.dirname+'_RecastRun/Build/SampleAnalyzer/User/Analyzer'))
+        os.mkdir(os.path.normpath(self.workdir+'/Build/SampleAnalyzer/User/Analyzer'))
         # Including the necessary analyses
-        analysisList = open(self.dirname+"_RecastRun/Build/SampleAnalyzer/User/Analyzer/analysisList.h",'w')
+        analysisList = open(self.workdir+"/Build/SampleAnalyzer/User/Analyzer/analysisList.h",'w')
         analysisList_header  = '#include "SampleAnalyzer/Process/Analyzer/AnalyzerManager.h"\n'+\
                                '#include "SampleAnalyzer/Commons/Service/LogStream.h"\n'
         analysisList_body    = '\n// -----------------------------------------------------------------------------\n'+\
@@ -636,9 +796,9 @@ class RunRecast():
             analysisList_header  += '#include "SampleAnalyzer/User/Analyzer/'+analysis+'.h"\n'
             analysisList_body    += '    manager.Add("'+analysis+'",new '+analysis+');\n'
             shutil.copy(self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.cpp',
-                        self.dirname+"_RecastRun/Build/SampleAnalyzer/User/Analyzer/"+analysis+".cpp")
+                        self.workdir+"/Build/SampleAnalyzer/User/Analyzer/"+analysis+".cpp")
             shutil.copy(self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.h',
-                        self.dirname+"_RecastRun/Build/SampleAnalyzer/User/Analyzer/"+analysis+".h")
+                        self.workdir+"/Build/SampleAnalyzer/User/Analyzer/"+analysis+".h")
         # Finalisation
         analysisList_body += '}\n'
         analysisList.write(analysisList_header)
@@ -680,12 +840,11 @@ class RunRecast():
         ## exit
         mainfile.close()
         newfile.close()
-        time.sleep(1.);
         return True
 
     def make_pad(self):
         # Initializing the compiler
-        self.logger.info('   Compiling the PAD located in '  +self.dirname+'_RecastRun');
+        self.logger.info('   Compiling the PAD located in '  +self.workdir);
         compiler = LibraryWriter('lib',self.main)
         ncores = compiler.get_ncores2()
         # compiling
@@ -694,9 +853,8 @@ class RunRecast():
         if ncores>1:
             strcores='-j'+str(ncores)
             command.append(strcores)
-        logfile = self.dirname+'_RecastRun/Build/Log/PADcompilation.log'
-        result, out = ShellCommand.ExecuteWithLog(command,logfile,self.dirname+'_RecastRun/Build')
-        time.sleep(1.);
+        logfile = self.workdir+'/Build/Log/PADcompilation.log'
+        result, out = ShellCommand.ExecuteWithLog(command,logfile,self.workdir+'/Build')
         # Checks and exit
         if not result:
             self.logger.error('Impossible to compile the PAD. For more details, see the log file:')
@@ -706,31 +864,30 @@ class RunRecast():
 
     def run_pad(self,eventfile):
         ## input file
-        if os.path.isfile(self.dirname+'_RecastRun/Input/PADevents.list'):
-            os.remove(self.dirname+'_RecastRun/Input/PADevents.list')
-        infile = open(self.dirname+'_RecastRun/Input/PADevents.list','w')
+        if os.path.isfile(self.workdir+'/Input/PADevents.list'):
+            os.remove(self.workdir+'/Input/PADevents.list')
+        infile = open(self.workdir+'/Input/PADevents.list','w')
         infile.write(eventfile)
         infile.close()
         ## cleaning the output directory
-        if os.path.isdir(os.path.normpath(self.dirname+'_RecastRun/Output/SAF/PADevents')):
-            if not FolderWriter.RemoveDirectory(os.path.normpath(self.dirname+'_RecastRun/Output/SAF/PADevents')):
+        if os.path.isdir(os.path.normpath(self.workdir+'/Output/SAF/PADevents')):
+            if not FolderWriter.RemoveDirectory(os.path.normpath(self.workdir+'/Output/SAF/PADevents')):
                 return False
         ## running
         command = ['./MadAnalysis5job', '../Input/PADevents.list']
-        ok = ShellCommand.Execute(command,self.dirname+'_RecastRun/Build')
+        ok = ShellCommand.Execute(command,self.workdir+'/Build')
         ## checks
         if not ok:
             self.logger.error('Problem with the run of the PAD on the file: '+ eventfile)
             return False
-        os.remove(self.dirname+'_RecastRun/Input/PADevents.list')
+        os.remove(self.workdir+'/Input/PADevents.list')
         ## exit
-        time.sleep(1.);
         return True
 
     def save_output(self, eventfile, setname, analyses, card):
         outfile = self.dirname+'/Output/SAF/'+setname+'/'+setname+'.saf'
         if not os.path.isfile(outfile):
-            shutil.move(self.dirname+'_RecastRun/Output/SAF/PADevents/PADevents.saf',outfile)
+            shutil.move(self.workdir+'/Output/SAF/PADevents/PADevents.saf',outfile)
         else:
             inp = open(outfile, 'r')
             out = open(outfile+'.2', 'w')
@@ -756,10 +913,10 @@ class RunRecast():
             out.close()
             shutil.move(outfile+'.2', outfile)
         for analysis in analyses:
-            shutil.move(self.dirname+'_RecastRun/Output/SAF/PADevents/'+analysis+'_0',self.dirname+'/Output/SAF/'+setname+'/'+analysis)
+            shutil.move(self.workdir+'/Output/SAF/PADevents/'+analysis+'_0',self.dirname+'/Output/SAF/'+setname+'/'+analysis)
         if self.TACO_output!='':
             filename  = '.'.join(self.TACO_output.split('.')[:-1]) + '_' + card.replace('tcl','') + self.TACO_output.split('.')[-1]
-            shutil.move(self.dirname+'_RecastRun/Output/'+self.TACO_output,self.dirname+'/Output/SAF/'+setname+'/'+filename)
+            shutil.move(self.workdir+'/Output/'+self.TACO_output,self.dirname+'/Output/SAF/'+setname+'/'+filename)
         return True
 
     ################################################
@@ -780,6 +937,8 @@ class RunRecast():
             self.logger.info("\033[1m   * Using Uncertainties and Higher-Luminosity Estimates\033[0m")
             self.logger.info("\033[1m     Please cite arXiv:1910.11418 [hep-ph]\033[0m")
 
+        ## Parsing the info files and the cutflows once for all the luminosities
+        self.load_analyses(ET, analyses, dataset)
 
         ## Running over all luminosities to extrapolate
         for extrapolated_lumi in ['default']+self.main.recasting.extrapolated_luminosities:
@@ -796,24 +955,24 @@ class RunRecast():
                 mysummary=open(outfile,'w')
                 self.write_cls_header(dataset.xsection, mysummary)
 
-            ## running over all analysis
-            for analysis in analyses:
-                self.logger.debug('Running CLs exclusion calculation for '+analysis)
-                # Getting the info file information (possibly rescaled)
-                lumi, regions, regiondata = self.parse_info_file(ET,analysis,extrapolated_lumi)
-                self.logger.debug('lumi = ' + str(lumi));
-                self.logger.debug('regions = ' + str(regions));
-                self.logger.debug('regiondata = ' + str(regiondata));
-                if lumi==-1 or regions==-1 or regiondata==-1:
-                    self.logger.warning('Info file for '+analysis+' missing or corrupted. Skipping the CLs calculation.')
+            ## running over all analysis, possibly in parallel; the outputs are
+            ## written in the order of the analyses
+            results = ProcessPool.Map(
+                lambda analysis : self.analysis_cls(ET, analysis, dataset, extrapolated_lumi),
+                analyses, self.ncores
+            )
+            for analysis, result in zip(analyses, results):
+                if result is None:
+                    mysummary.close()
                     return False
+                regions, regiondata, regiondata_errors, xsflag, lumi, has_cov, has_pyhf = result
 
                 # Citation notifications for Global Likelihoods
-                if (self.cov_config != {} or self.pyhf_config!={}) and print_gl_citation:
+                if (has_cov or has_pyhf) and print_gl_citation:
                     print_gl_citation = False
                     self.logger.info("\033[1m   * Using global likelihoods to improve CLs calculations\033[0m")
                     self.logger.info("\033[1m     Please cite arXiv:2206.14870 [hep-ph]\033[0m")
-                    if self.pyhf_config!={}:
+                    if has_pyhf:
                         self.logger.info("\033[1m                 pyhf DOI:10.5281/zenodo.1169739\033[0m")
                         self.logger.info("\033[1m                 For more details see https://scikit-hep.org/pyhf/\033[0m")
                         if sys.version_info[0]==2:
@@ -822,7 +981,7 @@ class RunRecast():
                         if self.main.recasting.simplify_likelihoods and self.main.session_info.has_simplify:
                             self.logger.info("\033[1m                 using simplify: ATL-PHYS-PUB-2021-038\033[0m")
                             self.logger.info("\033[1m                 For more details see https://github.com/eschanet/simplify\033[0m")
-                    elif self.cov_config != {}:
+                    elif has_cov:
                         self.logger.info("\033[1m                 CMS-NOTE-2017-001\033[0m")
                 elif print_gl_citation and self.main.recasting.CLs_calculator_backend == "pyhf":
                     print_gl_citation = False
@@ -831,74 +990,6 @@ class RunRecast():
                     self.logger.info("\033[1m     For more details see https://scikit-hep.org/pyhf/\033[0m")
                     self.logger.info("\033[1m     Please cite arXiv:2206.14870 [hep-ph]\033[0m")
 
-
-            ## Reading the cutflow information
-                regiondata=self.read_cutflows(
-                    self.dirname+'/Output/SAF/'+dataset.name+'/'+analysis+'/Cutflows',
-                    regions, regiondata
-                )
-                if regiondata==-1:
-                    self.logger.warning('Info file for '+analysis+' corrupted. Skipping the CLs calculation.')
-                    return False
-
-                ## Performing the CLS calculation
-                regiondata=self.extract_sig_cls(regiondata,regions,lumi,"exp")
-                if self.cov_config != {}:
-                    regiondata=self.extract_sig_lhcls(regiondata,lumi,"exp")
-                # CLs calculation for pyhf
-                regiondata = self.pyhf_sig95Wrapper(lumi, regiondata, "exp")
-
-                if extrapolated_lumi=='default':
-                    if self.cov_config != {}:
-                        regiondata=self.extract_sig_lhcls(regiondata,lumi,"obs")
-                    regiondata = self.extract_sig_cls(regiondata,regions,lumi,"obs")
-                    regiondata = self.pyhf_sig95Wrapper(lumi,regiondata,'obs')
-                else:
-                    for reg in regions:
-                        regiondata[reg]["nobs"]=regiondata[reg]["nb"]
-                xsflag=True
-                if dataset.xsection > 0:
-                    xsflag=False
-                    regiondata=self.extract_cls(regiondata,regions,dataset.xsection,lumi)
-
-                ## Uncertainties on the rates
-                Error_dict = {}
-                if dataset.scaleup != None:
-                    Error_dict['scale_up'] =  round(dataset.scaleup,8)
-                    Error_dict['scale_dn'] = -round(dataset.scaledn,8)
-                else:
-                    Error_dict['scale_up'], Error_dict['scale_dn'] = 0., 0.
-                if dataset.pdfup != None:
-                    Error_dict['pdf_up'] =  round(dataset.pdfup,8)
-                    Error_dict['pdf_dn'] = -round(dataset.pdfdn,8)
-                else:
-                    Error_dict['pdf_up'], Error_dict['pdf_dn'] = 0., 0.
-                if self.main.recasting.THerror_combination == 'linear':
-                    Error_dict['TH_up'] = round(Error_dict['scale_up'] + Error_dict['pdf_up'],8)
-                    Error_dict['TH_dn'] = round(Error_dict['scale_dn'] + Error_dict['pdf_dn'],8)
-                else:
-                    Error_dict['TH_up'] =  round(math.sqrt(Error_dict['pdf_up']**2 + Error_dict['scale_up']**2),8)
-                    Error_dict['TH_dn'] = -round(math.sqrt(Error_dict['pdf_dn']**2 + Error_dict['scale_dn']**2),8)
-                for i in range(0,len(self.main.recasting.systematics)):
-                    for unc in self.main.recasting.systematics:
-                        Error_dict['sys'+str(i)+'_up'] =\
-                            round(math.sqrt(Error_dict['TH_up']**2+self.main.recasting.systematics[i][0]**2),8)
-                        Error_dict['sys'+str(i)+'_dn'] =\
-                           -round(math.sqrt(Error_dict['TH_dn']**2+self.main.recasting.systematics[i][1]**2),8)
-
-                ## Computation of the uncertainties on the limits
-                regiondata_errors = {}
-                if dataset.xsection > 0. and any([x!=0 for x in Error_dict.values()]):
-                    for error_key, error_value in Error_dict.items():
-                        varied_xsec = max(round(dataset.xsection*(1.0+error_value),10),0.0)
-                        if varied_xsec > 0:
-                            xsflag=False
-                            regiondata_errors[error_key] = copy.deepcopy(regiondata)
-                            if error_value!=0.0:
-                                regiondata_errors[error_key] = self.extract_cls(
-                                    regiondata_errors[error_key], regions, varied_xsec, lumi
-                                )
-
                 ## writing the output file
                 self.write_cls_output(
                     analysis, regions, regiondata, regiondata_errors, mysummary, xsflag, lumi
@@ -909,6 +1000,98 @@ class RunRecast():
             mysummary.close()
         return True
 
+    def analysis_cls(self, ET, analysis, dataset, extrapolated_lumi):
+        self.logger.debug('Running CLs exclusion calculation for '+analysis)
+        # Getting the info file information (possibly rescaled)
+        lumi, regions, regiondata = self.extrapolate_info(analysis,extrapolated_lumi)
+        self.logger.debug('lumi = ' + str(lumi));
+        self.logger.debug('regions = ' + str(regions));
+        self.logger.debug('regiondata = ' + str(regiondata));
+        if lumi==-1 or regions==-1 or regiondata==-1:
+            self.logger.warning('Info file for '+analysis+' missing or corrupted. Skipping the CLs calculation.')
+            return None
+
+        # Limits on the number of signal events computed by the previous runs
+        self.limit_table = LimitTable(self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.info',
+                                      self.limit_calculator())
+
+        # Simplified-likelihood fits, shared by the limit and CLs calculations
+        if self.cov_config != {}:
+            from madanalysis.misc.simplified_likelihood import CLsComputer
+            self.sl_computer = CLsComputer(ntoys = self.ntoys, cl = .95)
+
+        ## Reading the cutflow information
+        regiondata=self.read_cutflows(self.cutflows.get(analysis), regions, regiondata)
+        if regiondata==-1:
+            self.logger.warning('Info file for '+analysis+' corrupted. Skipping the CLs calculation.')
+            return None
+
+        ## Performing the CLS calculation
+        regiondata=self.extract_sig_cls(regiondata,regions,lumi,"exp")
+        if self.cov_config != {}:
+            regiondata=self.extract_sig_lhcls(regiondata,lumi,"exp")
+        # CLs calculation for pyhf
+        regiondata = self.pyhf_sig95Wrapper(lumi, regiondata, "exp")
+
+        if extrapolated_lumi=='default':
+            if self.cov_config != {}:
+                regiondata=self.extract_sig_lhcls(regiondata,lumi,"obs")
+            regiondata = self.extract_sig_cls(regiondata,regions,lumi,"obs")
+            regiondata = self.pyhf_sig95Wrapper(lumi,regiondata,'obs')
+        else:
+            for reg in regions:
+                regiondata[reg]["nobs"]=regiondata[reg]["nb"]
+        self.limit_table.save()
+        xsflag=True
+        if dataset.xsection > 0:
+            xsflag=False
+            regiondata=self.extract_cls(regiondata,regions,dataset.xsection,lumi)
+
+        ## Uncertainties on the rates
+        Error_dict = {}
+        if dataset.scaleup != None:
+            Error_dict['scale_up'] =  round(dataset.scaleup,8)
+            Error_dict['scale_dn'] = -round(dataset.scaledn,8)
+        else:
+            Error_dict['scale_up'], Error_dict['scale_dn'] = 0., 0.
+        if dataset.pdfup != None:
+            Error_dict['pdf_up'] =  round(dataset.pdfup,8)
+            Error_dict['pdf_dn'] = -round(dataset.pdfdn,8)
+        else:
+            Error_dict['pdf_up'], Error_dict['pdf_dn'] = 0., 0.
+        if self.main.recasting.THerror_combination == 'linear':
+            Error_dict['TH_up'] = round(Error_dict['scale_up'] + Error_dict['pdf_up'],8)
+            Error_dict['TH_dn'] = round(Error_dict['scale_dn'] + Error_dict['pdf_dn'],8)
+        else:
+            Error_dict['TH_up'] =  round(math.sqrt(Error_dict['pdf_up']**2 + Error_dict['scale_up']**2),8)
+            Error_dict['TH_dn'] = -round(math.sqrt(Error_dict['pdf_dn']**2 + Error_dict['scale_dn']**2),8)
+        for i in range(0,len(self.main.recasting.systematics)):
+            for unc in self.main.recasting.systematics:
+                Error_dict['sys'+str(i)+'_up'] =\
+                    round(math.sqrt(Error_dict['TH_up']**2+self.main.recasting.systematics[i][0]**2),8)
+                Error_dict['sys'+str(i)+'_dn'] =\
+                   -round(math.sqrt(Error_dict['TH_dn']**2+self.main.recasting.systematics[i][1]**2),8)
+
+        ## Computation of the uncertainties on the limits; the unvaried
+        ## entries share the nominal results
+        regiondata_errors = {}
+        if dataset.xsection > 0. and any([x!=0 for x in Error_dict.values()]):
+            varied_xsecs = {}
+            for error_key, error_value in Error_dict.items():
+                varied_xsec = max(round(dataset.xsection*(1.0+error_value),10),0.0)
+                if varied_xsec > 0:
+                    xsflag=False
+                    if error_value!=0.0:
+                        varied_xsecs[error_key] = varied_xsec
+                    else:
+                        regiondata_errors[error_key] = regiondata
+            regiondata_errors.update(self.extract_cls_variations(
+                regiondata, regions, dataset.xsection, varied_xsecs, lumi
+            ))
+
+        return regions, regiondata, regiondata_errors, xsflag, lumi, \
+            self.cov_config != {}, self.pyhf_config != {}
+
     def check_xml_scipy_methods(self):
         ## Checking whether scipy is installed
         if not self.main.session_info.has_scipy:
@@ -931,12 +1114,31 @@ class RunRecast():
         # exit
         return ET
 
-    def parse_info_file(self, etree, analysis, extrapolated_lumi):
+    def load_analyses(self, etree, analyses, dataset):
+        """ Parsing the info files (once per run) and the cutflows (once per dataset) """
+        def load(analysis):
+            info = self.info_cache.get(analysis)
+            if info is None or not info.IsUpToDate():
+                info = self.parse_info_file(etree, analysis)
+            cutflows = CutflowTable(self.dirname+'/Output/SAF/'+dataset.name+'/'+analysis+'/Cutflows')
+            return info, cutflows
+
+        self.cutflows = {}
+        results = ProcessPool.Map(load, analyses, self.ncores)
+        for analysis, result in zip(analyses, results):
+            info, cutflows = (None, None) if result is None else result
+            if info is None:
+                self.info_cache.pop(analysis, None)
+            else:
+                self.info_cache[analysis] = info
+            self.cutflows[analysis] = cutflows
+
+    def parse_info_file(self, etree, analysis):
         ## Is file existing?
         filename=self.pad+'/Build/SampleAnalyzer/User/Analyzer/'+analysis+'.info'   #ERIC
         if not os.path.isfile(filename):
             self.logger.warning('Info '+filename+' does not exist...')
-            return -1,-1, -1
+            return None
         ## Getting the XML information
         try:
             with open(filename, "r") as info_input:
@@ -944,15 +1146,29 @@ class RunRecast():
         except Exception as err:
             self.logger.warning("Error during XML parsing: "+str(err))
             self.logger.warning('Cannot parse the info file')
-            return -1,-1, -1
+            return None
 
         try:
-            results = self.header_info_file(info_tree,analysis,extrapolated_lumi)
-            return results
+            return self.header_info_file(info_tree,analysis,filename)
         except Exception as err:
             self.logger.warning("Error during extracting header info file: "+str(err))
             self.logger.warning('Cannot parse the info file')
-            return -1,-1, -1
+            return None
+
+    def extrapolate_info(self, analysis, extrapolated_lumi):
+        """ Info file of an analysis rescaled to a luminosity; sets cov_config and pyhf_config """
+        info = self.info_cache.get(analysis)
+        if info is None:
+            return -1,-1,-1
+        try:
+            lumi, regions, regiondata, self.cov_config, self.pyhf_config = \
+                info.extrapolate(extrapolated_lumi, self.main.recasting.error_extrapolation)
+        except Exception as err:
+            self.logger.warning("Error during the luminosity extrapolation: "+str(err))
+            self.logger.warning('Cannot parse the info file')
+            return -1,-1,-1
+        self.logger.debug('The luminosity of ' + analysis + ' is ' + str(lumi) + ' fb-1.')
+        return lumi, regions, regiondata
 
     def fix_pileup(self,filename):
         #x 
@@ -1004,36 +1220,35 @@ class RunRecast():
         return True
 
 
-    def header_info_file(self, etree, analysis, extrapolated_lumi):
+    def header_info_file(self, etree, analysis, filename):
         self.logger.debug('Reading info from the file related to '+analysis + '...')
         ## checking the header of the file
         info_root = etree.getroot()
         if info_root.tag != "analysis":
             self.logger.warning('Invalid info file (' + analysis+ '): <analysis> tag.')
-            return -1,-1,-1
+            return None
         if info_root.attrib["id"].lower() != analysis.lower():
             self.logger.warning('Invalid info file (' + analysis+ '): <analysis id> tag.')
-            return -1,-1,-1
+            return None
         ## extracting the information
-        lumi         = 0
-        lumi_scaling = 1.
+        lumi         = None
         regions      = []
-        self.cov_config  = {}
-        self.pyhf_config = {}
+        cov_config   = {}
+        pyhf_config  = {}
         regiondata   = {}
         # Getting the description of the subset of SRs having covariances
         # Now the cov_switch is activated here
         if "cov_subset" in info_root.attrib and self.main.recasting.global_likelihoods_switch:
-            self.cov_config[info_root.attrib["cov_subset"]] = dict(cov_regions = [],
-                                                                   covariance = [])
+            cov_config[info_root.attrib["cov_subset"]] = dict(cov_regions = [],
+                                                              covariance = [])
         # activate pyhf
-        if self.main.recasting.global_likelihoods_switch and self.main.session_info.has_pyhf and self.cov_config == {}:
+        if self.main.recasting.global_likelihoods_switch and self.main.session_info.has_pyhf and cov_config == {}:
             try:
-                self.pyhf_config = self.pyhf_info_file(info_root)
-                self.logger.debug(str(self.pyhf_config))
+                pyhf_config = self.pyhf_info_file(info_root)
+                self.logger.debug(str(pyhf_config))
             except Exception as err:
                 self.logger.debug('Check pyhf_info_file function!\n' + str(err))
-                self.pyhf_config = {}
+                pyhf_config = {}
 
 
         ## first we need to get the number of regions
@@ -1042,121 +1257,70 @@ class RunRecast():
             if child.tag == "lumi":
                 try:
                     lumi = float(child.text)
-                    if extrapolated_lumi!='default':
-                        lumi_scaling = round(extrapolated_lumi/lumi,8)
-                        lumi=lumi*lumi_scaling
                 except Exception as err:
                     self.logger.warning('Invalid info file (' + analysis+ '): ill-defined lumi')
                     self.logger.debug(str(err))
-                    return -1, -1, -1
-                self.logger.debug('The luminosity of ' + analysis + ' is ' + str(lumi) + ' fb-1.')
+                    return None
             # regions
             if child.tag == "region" and ("type" not in child.attrib or child.attrib["type"] == "signal"):
                 if "id" not in child.attrib:
                     self.logger.warning('Invalid info file (' + analysis+ '): <region id> tag.')
-                    return -1, -1, -1
+                    return None
                 if child.attrib["id"] in regions:
                     self.logger.warning('Invalid info file (' + analysis+ '): doubly-defined region.')
-                    return -1, -1, -1
+                    return None
                 regions.append(child.attrib["id"])
                 # If one covariance entry is found, the covariance switch is turned on
                 if self.main.recasting.global_likelihoods_switch:
                     for grand_child in child.findall("covariance"):
                         if "cov_subset" in info_root.attrib:
                             if grand_child.attrib.get("cov_subset", "default") in [info_root.attrib["cov_subset"], "default"]:
-                                if child.attrib["id"] not in self.cov_config[info_root.attrib["cov_subset"]]["cov_regions"]:
-                                    self.cov_config[info_root.attrib["cov_subset"]]["cov_regions"].append(child.attrib["id"])
+                                if child.attrib["id"] not in cov_config[info_root.attrib["cov_subset"]]["cov_regions"]:
+                                    cov_config[info_root.attrib["cov_subset"]]["cov_regions"].append(child.attrib["id"])
                         else:
                             if grand_child.attrib.get("cov_subset", False):
                                 subsetID = grand_child.attrib["cov_subset"]
-                                if subsetID not in self.cov_config.keys():
-                                    self.cov_config[subsetID] = dict(cov_regions = [],
-                                                                     covariance  = [] )
-                                if child.attrib["id"] not in self.cov_config[subsetID]["cov_regions"]:
-                                    self.cov_config[subsetID]["cov_regions"].append(child.attrib["id"])
-
-        if self.cov_config:
-            for cov_subset, subset in self.cov_config.items():
+                                if subsetID not in cov_config.keys():
+                                    cov_config[subsetID] = dict(cov_regions = [],
+                                                                covariance  = [] )
+                                if child.attrib["id"] not in cov_config[subsetID]["cov_regions"]:
+                                    cov_config[subsetID]["cov_regions"].append(child.attrib["id"])
+
+        if cov_config:
+            for cov_subset, subset in cov_config.items():
                 length = len(subset["cov_regions"])
-                self.cov_config[cov_subset]["covariance"] = [
+                cov_config[cov_subset]["covariance"] = [
                     [0. for i in range(length)] for j in range(length)
                 ]
 
-        ## getting the region information
+        ## getting the region information (at the luminosity of the info file)
         for child in info_root:
             if child.tag == "region" and ("type" not in child.attrib or child.attrib["type"] == "signal"):
-                nobs, nb, deltanb, syst, stat = [-1]*5
+                data = {"nobs": -1, "nb": -1, "deltanb": -1, "deltanb_syst": -1, "deltanb_stat": -1}
                 for rchild in child:
-                    # self.logger.debug(rchild.tag)
-                    # self.logger.debug(str(lumi)+' '+str(regions)+ ' '+str(regiondata))
                     try:
                         myval=float(rchild.text)
                     except ValueError as err:
                         self.logger.warning('Invalid info file (' + analysis+ '): region data ill-defined.')
                         self.logger.debug(str(err))
-                        return -1,-1,-1
-                    if rchild.tag=="nobs":
-                        nobs = myval
-                    elif rchild.tag=="nb":
-                        nb = myval
-                    elif rchild.tag=="deltanb":
-                        deltanb = myval
-                    elif rchild.tag=="deltanb_syst":
-                        syst = myval
-                    elif rchild.tag=="deltanb_stat":
-                        stat = myval
+                        return None
+                    if rchild.tag in data:
+                        data[rchild.tag] = myval
                     elif rchild.tag=="covariance":
-                        if self.cov_config:
-                            for cov_subset, item in self.cov_config.items():
+                        if cov_config:
+                            for cov_subset, item in cov_config.items():
                                 if child.attrib["id"] not in item["cov_regions"] or \
                                         rchild.attrib["region"] not in item["cov_regions"]:
                                     continue
                                 i = item["cov_regions"].index(child.attrib["id"])
                                 j = item["cov_regions"].index(rchild.attrib["region"])
-                                self.cov_config[cov_subset]["covariance"][i][j] = myval
+                                cov_config[cov_subset]["covariance"][i][j] = myval
                     else:
                         self.logger.warning('Invalid info file (' + analysis+ '): unknown region subtag.')
-                        return -1,-1,-1
-                if syst == -1 and stat == -1:
-                    if self.main.recasting.error_extrapolation=='sqrt':
-                        deltanb = round(deltanb * math.sqrt(lumi_scaling),8)
-                    elif self.main.recasting.error_extrapolation=='linear':
-                        deltanb = round(deltanb * lumi_scaling,8)
-                    else:
-                        nb_new = nb*lumi_scaling
-                        deltanb = round(math.sqrt(self.main.recasting.error_extrapolation[0]**2*nb_new**2 \
-                                                  + self.main.recasting.error_extrapolation[1]**2*nb_new), 8);
-                else:
-                    if syst==-1:
-                        syst=0.
-                    if stat==-1:
-                        stat=0.
-                    deltanb = round(math.sqrt( (syst/nb)**2 + (stat/(nb*math.sqrt(lumi_scaling)))**2 )*nb*lumi_scaling,8)
-                regiondata[child.attrib["id"]] = { "nobs":nobs*lumi_scaling, "nb":nb*lumi_scaling, "deltanb":deltanb}
-
-        tmp = {}
-        for cov_subset, item in self.cov_config.items():
-            if item["covariance"] != []:
-                cov = np.array(item["covariance"])
-                sigma = np.sqrt(np.diag(cov))
-                invsigma = np.linalg.inv(np.diag(sigma))
-                corr = invsigma @ cov @ invsigma
-                
-                if self.main.recasting.error_extrapolation=='sqrt':
-                    new_sigma = round(math.sqrt(sigma)*lumi_scaling,8)
-                elif self.main.recasting.error_extrapolation=='linear':
-                    new_sigma = sigma * lumi_scaling**2
-                else:
-                    new_sigma = sigma * lumi_scaling**2 * self.main.recasting.error_extrapolation[0]**2 + \
-                        np.sqrt(sigma) * lumi_scaling * self.main.recasting.error_extrapolation[1]**2
-
-                new_sigma_matrix = np.diag(new_sigma)
-                new_cov = new_sigma_matrix @ corr @ new_sigma_matrix
-                item["covariance"] = new_cov.tolist()
-                tmp[cov_subset] = item
-        self.cov_config = tmp
+                        return None
+                regiondata[child.attrib["id"]] = data
 
-        return lumi, regions, regiondata
+        return AnalysisInfo(filename, lumi, regions, regiondata, cov_config, pyhf_config)
 
 
     def pyhf_info_file(self,info_root):
@@ -1166,7 +1330,6 @@ class RunRecast():
             provided. One can process multiple likelihood profiles dedicated to different sets
             of SRs.
         """
-        self.pyhf_config = {} # reset
         if any([x.tag=='pyhf' for x in info_root]): 
             # pyhf_path = os.path.join(self.main.archi_info.ma5dir, 'tools/pyhf/pyhf-master/src')
             try:
@@ -1340,53 +1503,33 @@ class RunRecast():
             out.write('\n');
 
 
-    def read_cutflows(self, path, regions, regiondata):
-        self.logger.debug('Read the cutflow from the files:')
+    def read_cutflows(self, cutflows, regions, regiondata):
+        if cutflows is None:
+            self.logger.warning('Cannot read the cutflows. Skipping the CLs calculation.')
+            return -1
+        self.logger.debug('Read the cutflow from the files in '+cutflows.path+':')
         for reg in regions:
             regname = clean_region_name(reg)
             ## getting the initial and final number of events
-            IsInitial = False
-            IsCounter = False
             N0 = 0.
             Nf = 0.
             ## checking if regions must be combined
             theregs=regname.split(';')
             for regiontocombine in theregs:
-                filename=path+'/'+regiontocombine+'.saf'
-                self.logger.debug('+ '+filename)
-                if not os.path.isfile(filename):
-                    self.logger.warning('Cannot find a cutflow for the region '+regiontocombine+' in ' + path)
+                self.logger.debug('+ '+regiontocombine+'.saf')
+                if not cutflows.has(regiontocombine):
+                    self.logger.warning('Cannot find a cutflow for the region '+regiontocombine+' in ' + cutflows.path)
                     self.logger.warning('Skipping the CLs calculation.')
                     return -1
-                mysaffile = open(filename)
-                myN0=-1
-                myNf=-1
-                for line in mysaffile:
-                    if "<InitialCounter>" in line:
-                        IsInitial = True
-                        continue
-                    elif "</InitialCounter>" in line:
-                        IsInitial = False
-                        continue
-                    elif "<Counter>" in line:
-                        IsCounter = True
-                        continue
-                    elif "</Counter>" in line:
-                        IsCounter = False
-                        continue
-                    if IsInitial and "sum of weights" in line and not '^2' in line:
-                        myN0 = float(line.split()[0])+float(line.split()[1])
-                    if IsCounter and "sum of weights" in line and not '^2' in line:
-                        myNf = float(line.split()[0])+float(line.split()[1])
-                mysaffile.close()
-                if myNf==-1 or myN0==-1:
-                    self.logger.warning('Invalid cutflow for the region ' + reg +'('+regname+') in ' + path)
+                if cutflows.get(regiontocombine) is None:
+                    self.logger.warning('Invalid cutflow for the region ' + reg +'('+regname+') in ' + cutflows.path)
                     self.logger.warning('Skipping the CLs calculation.')
                     return -1
+                myN0, myNf = cutflows.get(regiontocombine)
                 Nf+=myNf
                 N0+=myN0
             if Nf==0 and N0==0:
-                self.logger.warning('Invalid cutflow for the region ' + reg +'('+regname+') in ' + path)
+                self.logger.warning('Invalid cutflow for the region ' + reg +'('+regname+') in ' + cutflows.path)
                 self.logger.warning('Skipping the CLs calculation.')
                 return -1
             regiondata[reg]["N0"]=N0
@@ -1398,6 +1541,17 @@ class RunRecast():
         ## computing fi a region belongs to the best expected ones, and derive the CLs in all cases
         bestreg=[]
         rMax = -1
+        # the native calculator handles all the regions in a single pass
+        batch_CLs = {}
+        if isinstance(self.cls_calculator, ToyCLsEngine) and len(regions)>0:
+            nsignals = [xsection * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"] for reg in regions]
+            values   = self.cls_calculator(
+                [regiondata[reg]["nobs"] for reg in regions],
+                [regiondata[reg]["nb"] for reg in regions],
+                [regiondata[reg]["deltanb"] for reg in regions],
+                nsignals, self.ntoys, CLs_obs = True
+            )
+            batch_CLs = dict(zip(regions, [float(x) for x in values]))
         for reg in regions:
             nsignal = xsection * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
             nb      = regiondata[reg]["nb"]
@@ -1409,7 +1563,10 @@ class RunRecast():
             else:
                 n95     = float(regiondata[reg]["s95exp"]) * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
                 rSR     = nsignal/n95
-                myCLs   = self.cls_calculator(nobs, nb, deltanb, nsignal, self.ntoys, CLs_obs = True)
+                if reg in batch_CLs:
+                    myCLs = batch_CLs[reg]
+                else:
+                    myCLs = self.cls_calculator(nobs, nb, deltanb, nsignal, self.ntoys, CLs_obs = True)
             regiondata[reg]["rSR"] = rSR
             regiondata[reg]["CLs"] = myCLs
             if rSR > rMax:
@@ -1429,7 +1586,8 @@ class RunRecast():
                 if all(s <= 0. for s in [regiondata[reg]["Nf"] for reg in cov_regions]):
                     regiondata["cov_subset"][cov_subset]["CLs"]= 0.
                     continue
-                CLs = self.slhCLs(regiondata,cov_regions,xsection,lumi,covariance, ntoys = self.ntoys)
+                CLs = self.slhCLs(regiondata,cov_regions,xsection,lumi,covariance, ntoys = self.ntoys,
+                                  computer = self.sl_computer)
                 s95 = float(regiondata["cov_subset"][cov_subset]["s95exp"])
                 regiondata["cov_subset"][cov_subset]["CLs"] = CLs
                 if 0. < s95 < minsig95:
@@ -1478,13 +1636,104 @@ class RunRecast():
         return regiondata
 
 
+    def extract_cls_variations(self, regiondata, regions, xsection, varied_xsecs, lumi):
+        """ CLs for cross sections {error_key: varied_xsec} differing from the nominal
+            xsection of regiondata, whose results are not modified. Only the signal
+            normalisation changes: the toys, the simplified-likelihood fits and the
+            pyhf models are shared by all the variations. """
+        keys = list(varied_xsecs.keys())
+        if len(keys) == 0:
+            return {}
+        self.logger.debug('Compute CLs for the variations '+', '.join(keys)+'...')
+        xsecs  = np.array([varied_xsecs[key] for key in keys])
+        errors = dict((key, {}) for key in keys)
+
+        # Signal regions: all regions and all variations at once with the native calculator
+        effs = [regiondata[reg]["Nf"] / regiondata[reg]["N0"] for reg in regions]
+        alive = [i for i, reg in enumerate(regions) if xsection * lumi * 1000. * effs[i] > 0]
+        CLs = np.zeros((len(regions), len(keys)))
+        if isinstance(self.cls_calculator, ToyCLsEngine) and len(alive)>0:
+            CLs[alive] = self.cls_calculator(
+                [regiondata[regions[i]]["nobs"] for i in alive],
+                [regiondata[regions[i]]["nb"] for i in alive],
+                [regiondata[regions[i]]["deltanb"] for i in alive],
+                np.outer([lumi * 1000. * effs[i] for i in alive], xsecs), self.ntoys, CLs_obs = True
+            )
+        elif len(alive)>0:
+            # pyhf model built once per region, the variations being tested through the POI
+            pyhf = pyhf_setup()
+            for i in alive:
+                reg = regions[i]
+                model, data = pyhf_simple_model(pyhf, regiondata[reg]["nobs"], regiondata[reg]["nb"],
+                                                regiondata[reg]["deltanb"], lumi * 1000. * effs[i])
+                CLs[i] = [pyhf_hypotest(pyhf, model, data, x, CLs_obs = True) for x in xsecs]
+        for i, reg in enumerate(regions):
+            for k, key in enumerate(keys):
+                nsignal = xsecs[k] * lumi * 1000. * effs[i]
+                if nsignal<=0:
+                    rSR = -1
+                else:
+                    rSR = nsignal / (float(regiondata[reg]["s95exp"]) * lumi * 1000. * effs[i])
+                errors[key][reg] = {"rSR": rSR, "CLs": float(CLs[i,k]), "best": regiondata[reg]["best"]}
+
+        # Simplified likelihoods: one fit per subset
+        if self.cov_config:
+            for key in keys:
+                errors[key]["cov_subset"] = {}
+            for cov_subset, subset in self.cov_config.items():
+                cov_regions = subset["cov_regions"]
+                CLs = [0.] * len(keys)
+                if not all(s <= 0. for s in [regiondata[reg]["Nf"] for reg in cov_regions]):
+                    from madanalysis.misc.simplified_likelihood import Data
+                    LHdata = Data([regiondata[reg]["nobs"] for reg in cov_regions],
+                                  [regiondata[reg]["nb"] for reg in cov_regions], subset["covariance"], None,
+                                  [lumi*1000.*regiondata[reg]["Nf"]/regiondata[reg]["N0"] for reg in cov_regions])
+                    try:
+                        CLs = self.sl_computer.computeCLsBatch(LHdata, xsecs)
+                        if CLs is None:
+                            CLs = [None] * len(keys)
+                    except Exception as err:
+                        self.logger.debug("slhCLs : " + str(err))
+                        CLs = [0.] * len(keys)
+                for key, value in zip(keys, CLs):
+                    errors[key]["cov_subset"][cov_subset] = dict(regiondata["cov_subset"][cov_subset], CLs=value)
+
+        # pyhf profiles: the model is built once for a unit cross section
+        iterator = [] if not self.pyhf_config else copy.deepcopy(self.pyhf_config).items()
+        for likelihood_profile, config in iterator:
+            if regiondata.get('pyhf',{}).get(likelihood_profile, False) is False:
+                continue
+            nominal = regiondata['pyhf'][likelihood_profile]
+            for key in keys:
+                errors[key].setdefault('pyhf', {})[likelihood_profile] = dict(
+                    (x, nominal[x]) for x in ['CLs', 'best', 's95exp', 's95obs'] if x in nominal
+                )
+            background = HF_Background(config)
+            signal     = HF_Signal(config,regiondata,xsection=1.)
+            if not signal.isAlive():
+                continue
+            is_not_extrapolated = signal.lumi == lumi
+            model = PyhfModel(background(lumi), signal(lumi), xsection=1.)
+            for key, xsec in zip(keys, xsecs):
+                if model.isValid():
+                    CLs = model(xsec)
+                else:
+                    CLs = pyhf_wrapper(background(lumi), signal.rescale(xsec)(lumi))
+                CLs_out = CLs['CLs_obs'] if is_not_extrapolated else CLs['CLs_exp'][2]
+                errors[key]['pyhf'][likelihood_profile]['full_CLs_output'] = CLs
+                if CLs_out >= 0.:
+                    errors[key]['pyhf'][likelihood_profile]['CLs'] = CLs_out
+        return errors
+
+
     @staticmethod
-    def slhCLs(regiondata,cov_regions,xsection,lumi,covariance,expected=False, ntoys = 10000):
+    def slhCLs(regiondata,cov_regions,xsection,lumi,covariance,expected=False, ntoys = 10000, computer = None):
         """ (slh for simplified likelihood)
             Compute a global CLs combining the different region yields by using a simplified
             likelihood method (see CMS-NOTE-2017-001 for more information). It relies on the
             simplifiedLikelihood.py code designed by Wolfgang Waltenberger. The method
-            returns the computed CLs value. """
+            returns the computed CLs value. A CLsComputer can be provided to reuse its
+            cached fits. """
         observed, backgrounds, nsignal = [], [], []
         # Collect the input data necessary for the simplified_likelyhood.py method
         for reg in cov_regions:
@@ -1494,8 +1743,9 @@ class RunRecast():
         # data
         from madanalysis.misc.simplified_likelihood import Data
         LHdata = Data(observed, backgrounds, covariance, None, nsignal)
-        from madanalysis.misc.simplified_likelihood import CLsComputer
-        computer = CLsComputer(ntoys = ntoys, cl = .95)
+        if computer is None:
+            from madanalysis.misc.simplified_likelihood import CLsComputer
+            computer = CLsComputer(ntoys = ntoys, cl = .95)
         # calculation and output
         try:
             return computer.computeCLs(LHdata, expected=expected)
@@ -1504,8 +1754,19 @@ class RunRecast():
             return 0.0
 
 
+    def limit_calculator(self):
+        """ Configuration of the CLs calculator, identifying the limit tables """
+        if isinstance(self.cls_calculator, ToyCLsEngine):
+            return 'native:ntoys={}:seed={}:nbins={}'.format(
+                self.cls_calculator.ntoys, self.cls_calculator.seed, self.cls_calculator.nbins
+            )
+        import pyhf
+        return 'pyhf:'+pyhf.__version__
+
     def extract_sig_cls(self,regiondata,regions,lumi,tag):
         self.logger.debug('Compute signal CL...')
+        if isinstance(self.cls_calculator, ToyCLsEngine):
+            return self.extract_sig_cls_native(regiondata,regions,lumi,tag)
         for reg in regions:
             nb = regiondata[reg]["nb"]
             nobs = regiondata[reg]["nobs"]
@@ -1513,42 +1774,83 @@ class RunRecast():
                 nobs = regiondata[reg]["nb"]
             deltanb = regiondata[reg]["deltanb"]
 
-            def sig95(xsection):
-                if regiondata[reg]["Nf"]<=0.:
-                    return 0
-                nsignal=xsection * lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-                return self.cls_calculator(
-                    nobs, nb, deltanb, nsignal, self.ntoys, **{"CLs_"+tag : True}
-                ) - 0.95
-
-            nslow = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-            nshig = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
-
-            if nslow <= 0 and nshig <= 0:
+            nsignal = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
+            if nsignal <= 0:
                 regiondata[reg]["s95"+tag]="-1"
                 continue
 
-            low,hig = 1., 1.
-            while self.cls_calculator(nobs,nb,deltanb,nslow,self.ntoys, **{"CLs_"+tag : True})>0.95:
-                self.logger.debug('region ' + reg + ', lower bound = ' + str(low))
-                nslow*=0.1; low  *=0.1
-            while self.cls_calculator(nobs,nb,deltanb,nshig,self.ntoys, **{"CLs_"+tag : True})<0.95:
-                self.logger.debug('region ' + reg + ', upper bound = ' + str(hig))
-                nshig*=10.; hig  *=10.
-
-            try:
-                import scipy
-                s95 = scipy.optimize.brentq(sig95,low,hig,xtol=low/100.)
-            except ImportError as err:
-                self.logger.debug("Can't import scipy"); s95=-1
-            except Exception as err:
-                self.logger.debug(str(err)); s95=-1
+            # Limit on the number of signal events, independent of the signal efficiency
+            n95 = None if self.limit_table is None else self.limit_table.get(reg, tag, nobs, nb, deltanb)
+            if n95 is None:
+                n95 = self.sig95_events(reg, nobs, nb, deltanb, tag)
+                if self.limit_table is not None:
+                    self.limit_table.set(reg, tag, nobs, nb, deltanb, n95)
 
+            s95 = n95 / nsignal if n95 > 0. else -1
             self.logger.debug('region ' + reg + ', s95 = ' + str(s95) + ' pb')
             regiondata[reg]["s95"+tag] = ("%-20.7f" % s95)
 
         return regiondata
 
+    def sig95_events(self, reg, nobs, nb, deltanb, tag):
+        """ Number of signal events excluded at 95% CL in a region (-1 if not derived) """
+        def sig95(nsignal):
+            return self.cls_calculator(
+                nobs, nb, deltanb, nsignal, self.ntoys, **{"CLs_"+tag : True}
+            ) - 0.95
+
+        low,hig = 1., 1.
+        while self.cls_calculator(nobs,nb,deltanb,low,self.ntoys, **{"CLs_"+tag : True})>0.95:
+            self.logger.debug('region ' + reg + ', lower bound = ' + str(low))
+            low *=0.1
+        while self.cls_calculator(nobs,nb,deltanb,hig,self.ntoys, **{"CLs_"+tag : True})<0.95:
+            self.logger.debug('region ' + reg + ', upper bound = ' + str(hig))
+            hig *=10.
+
+        try:
+            import scipy
+            return scipy.optimize.brentq(sig95,low,hig,xtol=low/100.)
+        except ImportError as err:
+            self.logger.debug("Can't import scipy")
+        except Exception as err:
+            self.logger.debug(str(err))
+        return -1
+
+    def extract_sig_cls_native(self,regiondata,regions,lumi,tag):
+        """
+        Same as extract_sig_cls for the native calculator: the limits on the
+        number of signal events are derived for all regions at once from the
+        toy bank, and then converted into cross sections.
+        """
+        nobs    = [regiondata[reg]["nb" if (tag == "exp" and self.is_apriori) else "nobs"] for reg in regions]
+        nb      = [regiondata[reg]["nb"] for reg in regions]
+        deltanb = [regiondata[reg]["deltanb"] for reg in regions]
+
+        # Limits taken from the table when available, the others are derived together
+        n95 = [None]*len(regions)
+        if self.limit_table is not None:
+            n95 = [self.limit_table.get(reg, tag, nobs[i], nb[i], deltanb[i]) for i, reg in enumerate(regions)]
+        missing = [i for i in range(len(regions)) if n95[i] is None]
+        if len(missing) > 0:
+            limits = upper_limits(
+                self.cls_calculator, [nobs[i] for i in missing],
+                [nb[i] for i in missing], [deltanb[i] for i in missing]
+            )
+            for i, limit in zip(missing, limits):
+                n95[i] = float(limit)
+                if self.limit_table is not None:
+                    self.limit_table.set(regions[i], tag, nobs[i], nb[i], deltanb[i], n95[i])
+
+        for reg, nsig95 in zip(regions, n95):
+            nsignal = lumi * 1000. * regiondata[reg]["Nf"] / regiondata[reg]["N0"]
+            if nsignal <= 0:
+                regiondata[reg]["s95"+tag]="-1"
+                continue
+            s95 = nsig95 / nsignal if nsig95 > 0. else -1
+            self.logger.debug('region ' + reg + ', s95 = ' + str(s95) + ' pb')
+            regiondata[reg]["s95"+tag] = ("%-20.7f" % s95)
+        return regiondata
+
     # Calculating the upper limits on sigma with simplified likelihood
     def extract_sig_lhcls(self,regiondata,lumi,tag):
         """
@@ -1567,11 +1869,7 @@ class RunRecast():
         if "cov_subset" not in regiondata.keys():
             regiondata["cov_subset"] = {}
 
-        def get_s95(regs, matrix):
-            def sig95(xsection):
-                return self.slhCLs(regiondata,regs,xsection,lumi,matrix,(tag=="exp"), ntoys = self.ntoys)-0.95
-            return sig95
-
+        from madanalysis.misc.simplified_likelihood import Data
         for cov_subset in self.cov_config.keys():
             cov_regions = self.cov_config[cov_subset]["cov_regions"]
             covariance  = self.cov_config[cov_subset]["covariance" ]
@@ -1581,23 +1879,18 @@ class RunRecast():
                 regiondata["cov_subset"][cov_subset]["s95"+tag]= "-1"
                 continue
 
-            low, hig = 1., 1.
-            while self.slhCLs(regiondata,cov_regions,low,lumi,covariance,(tag=="exp"), ntoys = self.ntoys)>0.95:
-                self.logger.debug('lower bound = ' + str(low))
-                low *= 0.1
-                if low < 1e-10: break
-            while self.slhCLs(regiondata,cov_regions,hig,lumi,covariance,(tag=="exp"), ntoys = self.ntoys)<0.95:
-                self.logger.debug('upper bound = ' + str(hig))
-                hig *= 10.
-                if hig > 1e10: break
-
+            # The signal scales linearly with the cross section: the limit on the
+            # signal strength of a unit cross section is the limit on the cross section
+            LHdata = Data(
+                [regiondata[reg]["nobs"] for reg in cov_regions],
+                [regiondata[reg]["nb"] for reg in cov_regions],
+                covariance, None,
+                [lumi*1000.*regiondata[reg]["Nf"]/regiondata[reg]["N0"] for reg in cov_regions]
+            )
             try:
-                import scipy
-                sig95 = get_s95(cov_regions, covariance)
-                s95 = scipy.optimize.brentq(sig95,low,hig,xtol=low/100.)
-            except ImportError as err:
-                self.logger.debug("Can't import scipy")
-                s95=-1
+                s95 = self.sl_computer.ulSigma(LHdata, expected=(tag=="exp"))
+                if s95 is None:
+                    s95 = -1
             except Exception as err:
                 self.logger.debug(str(err))
                 s95=-1
@@ -1614,18 +1907,11 @@ class RunRecast():
         if 'pyhf' not in list(regiondata.keys()):
             regiondata['pyhf'] = {}
 
-        def get_pyhf_result(*args):
-            rslt = pyhf_wrapper(*args)
+        def get_pyhf_result(rslt):
             if tag == "exp" and not self.is_apriori:
                 return rslt["CLs_exp"][2]
             return rslt['CLs_obs']
 
-        def sig95(conf, regdat, bkg):
-            def CLs(xsec):
-                signal = HF_Signal(conf, regdat, xsection=xsec)
-                return get_pyhf_result(bkg(lumi), signal(lumi))-0.95
-            return CLs
-
         iterator = [] if self.pyhf_config=={} else copy.deepcopy(list(self.pyhf_config.items()))
         for n, (likelihood_profile, config) in enumerate(iterator):
             self.logger.debug('    * Running sig95'+tag+' for '+likelihood_profile)
@@ -1633,20 +1919,27 @@ class RunRecast():
                 regiondata['pyhf'][likelihood_profile] = {}
             background = HF_Background(config, expected=(tag=='exp' and self.is_apriori))
             self.logger.debug('Config : '+str(config))
-            if not HF_Signal(config, regiondata, xsection=1., background=background).isAlive():
+            signal = HF_Signal(config, regiondata, xsection=1., background=background)
+            if not signal.isAlive():
                 self.logger.debug(likelihood_profile+' has no signal event.')
                 regiondata['pyhf'][likelihood_profile]["s95"+tag] = "-1"
                 continue
 
+            # The model is built once for a unit cross section, the cross
+            # section being then scanned through the POI
+            model = PyhfModel(background(lumi), signal(lumi), xsection=1.)
+            def CLs(xsec):
+                if model.isValid():
+                    return get_pyhf_result(model(xsec))
+                return get_pyhf_result(pyhf_wrapper(background(lumi), signal.rescale(xsec)(lumi)))
+
             low, hig = 1., 1.
-            while get_pyhf_result(background(lumi),\
-                                  HF_Signal(config, regiondata,xsection=low)(lumi)) > 0.95:
+            while CLs(low) > 0.95:
                 self.logger.debug(tag+': profile '+likelihood_profile+\
                                                ', lower bound = '+str(low))
                 low *= 0.1
                 if low < 1e-10: break
-            while get_pyhf_result(background(lumi),\
-                                  HF_Signal(config, regiondata,xsection=hig)(lumi)) < 0.95:
+            while CLs(hig) < 0.95:
                 self.logger.debug(tag+': profile '+likelihood_profile+\
                                                ', higher bound = '+str(hig))
                 hig *= 10.
@@ -1654,7 +1947,7 @@ class RunRecast():
             try:
                 import scipy
                 s95 = scipy.optimize.brentq(
-                    sig95(config, regiondata, background),low,hig,xtol=low/100.
+                    lambda xsec : CLs(xsec)-0.95,low,hig,xtol=low/100.
                 )
             except Exception as err:
                 self.logger.debug(str(err))
@@ -1844,6 +2137,19 @@ def clean_region_name(mystr):
     return newstr
 
 
+def pyhf_setup():
+    """ Importing pyhf, silencing its messages and setting the backend """
+    import pyhf
+    from pyhf.optimize import mixins
+
+    # Scilence pyhf's messages
+    pyhf.pdf.log.setLevel(logging.CRITICAL)
+    pyhf.workspace.log.setLevel(logging.CRITICAL)
+    mixins.log.setLevel(logging.CRITICAL)
+    pyhf.set_backend('numpy', precision="64b")
+    return pyhf
+
+
 def pyhf_wrapper(*args, **kwargs):
     """
     Computes CLs values via pyhf interface
@@ -1856,36 +2162,22 @@ def pyhf_wrapper(*args, **kwargs):
         CLs_obs: bool
             return obs values
     """
-    import pyhf
-    from numpy import isnan, ndarray, warnings
-    from pyhf.optimize import mixins
-
-    # Scilence pyhf's messages
-    pyhf.pdf.log.setLevel(logging.CRITICAL)
-    pyhf.workspace.log.setLevel(logging.CRITICAL)
-    mixins.log.setLevel(logging.CRITICAL)
-    pyhf.set_backend('numpy', precision="64b")
+    import warnings
+    pyhf = pyhf_setup()
 
     with warnings.catch_warnings():
         warnings.filterwarnings('ignore')
         try:
             if len(args) == 2 and all([isinstance(x, (dict, list)) for x in args]):
+                # workspace and starting point shared by all the signals
                 background, signal = args
-                workspace = pyhf.Workspace(background)
-                model     = workspace.model(
-                    patches=[signal],
-                    modifier_settings={'normsys': {'interpcode': 'code4'},
-                                       'histosys': {'interpcode': 'code4p'}}
-                )
-
-                data = workspace.data(model)
+                grid        = PyhfGrid.Get(background)
+                model, data = grid.model(signal)
+                init_pars   = grid.start(model, data)
 
             elif len(args) == 5 and all([isinstance(x, (float, int)) for x in args]):
-                NumObserved, ExpectedBG, BGError, SigHypothesis, _ = args
-                model = pyhf.simplemodels.uncorrelated_background(
-                    [max(SigHypothesis, 0.0)], [ExpectedBG], [BGError]
-                )
-                data = [NumObserved] + model.config.auxdata
+                model, data = pyhf_simple_model(pyhf, *args[:4])
+                init_pars   = model.config.suggested_init()
 
         except (pyhf.exceptions.InvalidSpecification, KeyError) as err:
             logging.getLogger('MA5').error("Invalid JSON file!! "+str(err))
@@ -1898,11 +2190,42 @@ def pyhf_wrapper(*args, **kwargs):
                 return -1
             return {'CLs_obs':-1 , 'CLs_exp' : [-1]*5}
 
+        return pyhf_hypotest(pyhf, model, data, 1., init_pars=init_pars, **kwargs)
+
+
+def pyhf_simple_model(pyhf, NumObserved, ExpectedBG, BGError, SigHypothesis):
+    """ Single-bin model and data of a signal region """
+    model = pyhf.simplemodels.uncorrelated_background(
+        [max(SigHypothesis, 0.0)], [ExpectedBG], [BGError]
+    )
+    return model, [NumObserved] + model.config.auxdata
+
+
+def pyhf_hypotest(pyhf, model, data, poi_test, **kwargs):
+    """
+    Hypothesis test for a given value of the POI, with the CLs_obs/CLs_exp
+    return contract of pyhf_wrapper. The integration bounds (and the initial
+    value) of the POI are scaled by poi_test, so that testing poi_test on a
+    model whose signal has been normalised to one is equivalent to testing
+    one on a model with a signal scaled by poi_test. The initial values of
+    the parameters can be given as init_pars (default: the suggested ones).
+    """
+    import warnings
+    from numpy import isnan
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+
+        poi_index = model.config.poi_index
+        init_pars = list(kwargs.get('init_pars', model.config.suggested_init()))
+        init_pars[poi_index] = init_pars[poi_index] * poi_test
+
         def get_CLs(**kwargs):
             try:
                 CLs_obs, CLs_exp = pyhf.infer.hypotest(
-                    1., data, model,
+                    poi_test, data, model,
                     test_stat=kwargs.get("stats", "qtilde"),
+                    init_pars=init_pars,
                     par_bounds=kwargs.get('bounds', model.config.suggested_bounds()),
                     return_expected_set=True
                 )
@@ -1924,30 +2247,32 @@ def pyhf_wrapper(*args, **kwargs):
 
         #pyhf can raise an error if the poi_test bounds are too stringent
         #they need to be updated dynamically.
-        arguments = dict(bounds=model.config.suggested_bounds(), stats="qtilde")
+        bounds = model.config.suggested_bounds()
+        bounds[poi_index] = (bounds[poi_index][0]*poi_test, bounds[poi_index][1]*poi_test)
+        arguments = dict(bounds=bounds, stats="qtilde")
         iteration_limit = 0
         while True:
             CLs = get_CLs(**arguments)
             if CLs == 'update bounds':
-                arguments["bounds"][model.config.poi_index] = (
-                    arguments["bounds"][model.config.poi_index][0],
-                    2*arguments["bounds"][model.config.poi_index][1]
+                arguments["bounds"][poi_index] = (
+                    arguments["bounds"][poi_index][0],
+                    2*arguments["bounds"][poi_index][1]
                 )
                 logging.getLogger("MA5").debug(
                     "Hypothesis test inference integration bounds has been increased to " + \
-                    str(arguments["bounds"][model.config.poi_index])
+                    str(arguments["bounds"][poi_index])
                 )
                 iteration_limit += 1
             elif isinstance(CLs, dict):
                 if isnan(CLs["CLs_obs"]) or any([isnan(x) for x in CLs["CLs_exp"]]):
                     arguments["stats"] = "q"
-                    arguments["bounds"][model.config.poi_index] = (
-                        arguments["bounds"][model.config.poi_index][0]-5,
-                        arguments["bounds"][model.config.poi_index][1]
+                    arguments["bounds"][poi_index] = (
+                        arguments["bounds"][poi_index][0]-5*poi_test,
+                        arguments["bounds"][poi_index][1]
                     )
                     logging.getLogger("MA5").debug(
                         "Hypothesis test inference integration bounds has been increased to " + \
-                        str(arguments["bounds"][model.config.poi_index])
+                        str(arguments["bounds"][poi_index])
                     )
                 else:
                     break
@@ -1968,42 +2293,121 @@ def pyhf_wrapper(*args, **kwargs):
     return CLs
 
 
+class PyhfGrid(object):
+    """
+    Background likelihood shared by the signal points evaluated against it
+    (the datasets of a signal grid, the cross sections of a limit scan, the
+    theory variations). The pyhf workspace is validated once. The nuisance
+    parameters fitted to the data under the background-only hypothesis do
+    not depend on the signal yields: the fit is done once and its result is
+    the starting point of the fits of all the hypothesis tests. The grids
+    are kept for the lifetime of the process (least recently used ones
+    being dropped).
+    """
+
+    grids     = OrderedDict()
+    max_grids = 16
+
+    def __init__(self, background):
+        import warnings
+        self.background = background # kept alive, its id being the key
+        self.pyhf       = pyhf_setup()
+        self.fit        = None       # background-only fit, parameter name -> values
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore')
+            self.workspace = self.pyhf.Workspace(background)
+
+    @staticmethod
+    def Get(background):
+        """ Grid of a background likelihood, built if needed """
+        key = id(background)
+        if key in PyhfGrid.grids:
+            PyhfGrid.grids.move_to_end(key)
+            return PyhfGrid.grids[key]
+        grid = PyhfGrid(background)
+        PyhfGrid.grids[key] = grid
+        while len(PyhfGrid.grids) > PyhfGrid.max_grids:
+            PyhfGrid.grids.popitem(last=False)
+        return grid
+
+    def model(self, signal):
+        """ Model and data for a signal patch """
+        import warnings
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore')
+            model = self.workspace.model(
+                patches=[signal],
+                modifier_settings={'normsys': {'interpcode': 'code4'},
+                                   'histosys': {'interpcode': 'code4p'}}
+            )
+            return model, self.workspace.data(model)
+
+    def start(self, model, data):
+        """ Initial parameters: background-only fit for the nuisances, suggested POI """
+        import warnings
+        config = model.config
+        if self.fit is None:
+            self.fit = {}
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore')
+                try:
+                    pars = self.pyhf.infer.mle.fixed_poi_fit(0., data, model)
+                    self.fit = dict((name, [float(x) for x in pars[config.par_slice(name)]]) \
+                                    for name in config.par_order)
+                except (AssertionError, self.pyhf.exceptions.FailedMinimization, ValueError) as err:
+                    logging.getLogger('MA5').debug('Background-only fit failed: '+str(err))
+        init = config.suggested_init()
+        for name in config.par_order:
+            parameters = config.par_slice(name)
+            if name != config.poi_name and len(self.fit.get(name, [])) == parameters.stop-parameters.start:
+                init[parameters] = self.fit[name]
+        return init
+
+
+class PyhfModel(object):
+    """
+    pyhf model built once for a background likelihood and a signal patch.
+    The signal normalisation is then varied through the mu_SIG parameter of
+    interest, so that a cross section scan does not require to rebuild the
+    workspace and the model at each step.
+
+    Calling the object with a cross section returns the same output as
+    pyhf_wrapper(background, signal) with the signal rescaled accordingly.
+    """
+
+    def __init__(self, background, signal, xsection=1.):
+        self.logger   = logging.getLogger('MA5')
+        self.xsection = float(xsection)
+        self.model, self.data, self.init = None, None, None
+        self.pyhf     = pyhf_setup()
+        try:
+            grid = PyhfGrid.Get(background)
+            self.model, self.data = grid.model(signal)
+            self.init = grid.start(self.model, self.data)
+        except (self.pyhf.exceptions.InvalidSpecification, KeyError) as err:
+            self.logger.error("Invalid JSON file!! "+str(err))
+        except Exception as err:
+            self.logger.debug("Unknown error, check PyhfModel "+ str(err))
+        if self.model is not None and self.model.config.poi_name != 'mu_SIG':
+            self.logger.debug('The POI of the likelihood is '+str(self.model.config.poi_name)+\
+                              ': the signal normalisation cannot be varied through mu_SIG.')
+
+    def isValid(self):
+        return self.model is not None and self.model.config.poi_name == 'mu_SIG'
+
+    def __call__(self, xsection, **kwargs):
+        if self.model is None:
+            if kwargs.get("CLs_exp", False) or kwargs.get("CLs_obs", False):
+                return -1
+            return {'CLs_obs':-1 , 'CLs_exp' : [-1]*5}
+        return pyhf_hypotest(self.pyhf, self.model, self.data, xsection/self.xsection,
+                             init_pars=self.init, **kwargs)
+
+
 def cls(NumObserved, ExpectedBG, BGError, SigHypothesis, NumToyExperiments, **kwargs):
-    import scipy.stats
-
-    # generate a set of expected-number-of-background-events, one for each toy
-    # experiment, distributed according to a Gaussian with the specified mean
-    # and uncertainty
-    ExpectedBGs = scipy.stats.norm.rvs(loc=ExpectedBG, scale=BGError, size=NumToyExperiments)
-
-    # Ignore values in the tail of the Gaussian extending to negative numbers
-    ExpectedBGs = [value for value in ExpectedBGs if value > 0]
-
-    # For each toy experiment, get the actual number of background events by
-    # taking one value from a Poisson distribution created using the expected
-    # number of events.
-    ToyBGs = scipy.stats.poisson.rvs(ExpectedBGs)
-    ToyBGs = list(map(float, ToyBGs))
-
-    # The probability for the background alone to fluctutate as LOW as
-    # observed = the fraction of the toy experiments with backgrounds as low as
-    # observed = p_b.
-    # NB (1 - this p_b) corresponds to what is usually called p_b for CLs.
-    p_b = scipy.stats.percentileofscore(ToyBGs, NumObserved, kind='weak')*.01
-
-    # Toy MC for background+signal
-    ExpectedBGandS = [expectedbg + SigHypothesis for expectedbg in ExpectedBGs]
-    ExpectedBGandS = [x for x in ExpectedBGandS if x > 0]
-    if len(ExpectedBGandS)==0:
-        return 0.
-    ToyBplusS = scipy.stats.poisson.rvs(ExpectedBGandS)
-    ToyBplusS = list(map(float, ToyBplusS))
-
-    # Calculate the fraction of these that are >= the number observed,
-    # giving p_(S+B). Divide by (1 - p_b) a la the CLs prescription.
-    p_SplusB = scipy.stats.percentileofscore(ToyBplusS, NumObserved, kind='weak')*.01
-
-    if p_SplusB>p_b:
-        return 0.
-    else:
-        return 1.-(p_SplusB / p_b) # 1 - CLs
+    """
+    Computes 1-CLs with a fresh bank of background toys. The arguments can be
+    numbers or arrays (one entry per signal region), see ToyCLsEngine.
+    """
+    engine = ToyCLsEngine(NumToyExperiments, seed=kwargs.get("seed", None))
+    return engine(NumObserved, ExpectedBG, BGError, SigHypothesis)
@@ -730,22 +730,28 @@ class CLsComputer:
         """
         self.ntoys = ntoys
         self.cl = cl
+        self.fits = {}
 
-    def ulSigma(self, model, marginalize=False, toys=None, expected=False ):
-        """ upper limit obtained from the defined Data (using the signal prediction
-            for each signal regio/dataset), by using
-            the q_mu test statistic from the CCGV paper (arXiv:1007.1727).
+    def fit(self, model, marginalize=False, toys=None, expected=False ):
+        """ maximum likelihood fits to the data and to the Asimov data. They only
+            depend on the relative signal strengths in each dataset, and not on the
+            signal normalisation. The fits are thus cached, so that the CLs can be
+            evaluated for any normalisation (and in successive limit and CLs
+            calculations on the same model) without refitting.
 
         :params marginalize: if true, marginalize nuisances, else profile them
         :params toys: specify number of toys. Use default is none
         :params expected: compute the expected value, not the observed.
-        :returns: upper limit on *production* xsec (efficiencies unfolded)
+        :returns: dictionary with the likelihood computers and the fitted likelihoods
         """
-        if model.zeroSignal():
-            """ only zeroes in efficiencies? cannot give a limit! """
-            return None
         if toys==None:
             toys=self.ntoys
+        signal_rel = array(model.signal_rel, dtype=float)
+        key = ( tuple(model.observed), tuple(model.backgrounds), tuple(NP.ravel(model.covariance)),
+                tuple(signal_rel), marginalize, toys, expected )
+        if key in self.fits:
+            return self.fits[key]
+
         oldmodel = model
         if expected:
             model = copy.deepcopy(oldmodel)
@@ -753,71 +759,101 @@ class CLsComputer:
             for i,d in enumerate(model.backgrounds):
                 model.observed[i]=int(NP.round(d))
         computer = LikelihoodComputer(model, toys)
-        mu_hat = computer.findMuHat(model.signal_rel)
-        theta_hat0,_ = computer.findThetaHat(0*model.signal_rel)
-        sigma_mu = computer.getSigmaMu(model.signal_rel)
+        mu_hat = computer.findMuHat(copy.copy(signal_rel))
+        theta_hat0,_ = computer.findThetaHat(0*signal_rel)
+        sigma_mu = computer.getSigmaMu(signal_rel)
 
         aModel = copy.deepcopy(model)
         aModel.observed = array([NP.round(x+y) for x,y in zip(model.backgrounds,theta_hat0)])
-        #print ( "aModeldata=", aModel.observed )
-        #aModel.observed = array ( [ round(x) for x in model.backgrounds ] )
         aModel.name = aModel.name + "A"
         compA = LikelihoodComputer(aModel, toys)
         ## compute
-        mu_hatA = compA.findMuHat(aModel.signal_rel)
-        if mu_hat < 0.:
-            mu_hat = 0.
-        nll0 = computer.likelihood(model.signals(mu_hat),
-                                     marginalize=marginalize,
-                                     nll=True)
+        mu_hatA = compA.findMuHat(copy.copy(signal_rel))
+        # -log L(mu_hat, theta_hat(mu_hat))
+        nll0 = computer.likelihood(mu_hat*signal_rel,
+                                   marginalize=marginalize,
+                                   nll=True)
         if NP.isinf(nll0) and marginalize==False:
             logger.warning("nll is infinite in profiling! we switch to marginalization, but only for this one!" )
             marginalize=True
-            nll0 = computer.likelihood(model.signals(mu_hat),
-                                         marginalize=True,
-                                         nll=True)
+            nll0 = computer.likelihood(mu_hat*signal_rel,
+                                       marginalize=True,
+                                       nll=True)
             if NP.isinf(nll0):
                 logger.warning("marginalization didnt help either. switch back.")
                 marginalize=False
             else:
                 logger.warning("marginalization worked.")
-        nll0A = compA.likelihood(aModel.signals(mu_hatA),
-                                   marginalize=marginalize,
-                                   nll=True)
-        
-        def root_func(mu):
-            ## the function to minimize.
-            nsig = model.signals(mu)
-            computer.ntot = model.backgrounds + nsig
-            nll = computer.likelihood(nsig, marginalize=marginalize, nll=True )
-            nllA = compA.likelihood(nsig, marginalize=marginalize, nll=True )
-            qmu =  2*( nll - nll0 )
-            if qmu<0.: qmu=0.
-            sqmu = sqrt (qmu)
-            qA =  2*( nllA - nll0A )
-            # print ( "mu: %s, qMu: %s, qA: %s nll0A: %s nllA: %s" % ( mu, qmu, qA, nll0A, nllA ) )
-            if qA<0.:
-                qA=0.
-            sqA = sqrt(qA)
+        nll0A = compA.likelihood(mu_hatA*signal_rel,
+                                 marginalize=marginalize,
+                                 nll=True)
+
+        self.fits[key] = { "computer"    : computer,
+                           "compA"       : compA,
+                           "signal_rel"  : signal_rel,
+                           "mu_hat"      : mu_hat,
+                           "sigma_mu"    : sigma_mu,
+                           "nll0"        : nll0,
+                           "nll0A"       : nll0A,
+                           "marginalize" : marginalize }
+        return self.fits[key]
+
+    def exclusionCL(self, fit, mu):
+        """ exclusion confidence level (1-CLs) for a total number of signal events mu,
+            distributed according to the relative signal strengths of the fit.
+            Relies on the q_mu test statistic from the CCGV paper (arXiv:1007.1727).
+        """
+        nsig = mu * fit["signal_rel"]
+        fit["computer"].ntot = fit["computer"].model.backgrounds + nsig
+        # -log L(mu, theta(mu))
+        nll = fit["computer"].likelihood(nsig, marginalize=fit["marginalize"], nll=True )
+        nllA = fit["compA"].likelihood(nsig, marginalize=fit["marginalize"], nll=True )
+        qmu =  2*( nll - fit["nll0"] )
+        if qmu<0.: qmu=0.
+        sqmu = sqrt (qmu)
+        qA =  2*( nllA - fit["nll0A"] )
+        if qA<0.:
+            qA=0.
+        sqA = sqrt(qA)
+        if qA >= qmu:
             CLsb = 1. - stats.multivariate_normal.cdf(sqmu)
-            CLb = 0.
-            if qA >= qmu:
-                CLb =  stats.multivariate_normal.cdf(sqA - sqmu)
+            CLb =  stats.multivariate_normal.cdf(sqA - sqmu)
+        else:
+            if qA == 0.:
+                CLsb = 1.
+                CLb  = 1.
             else:
-                if qA == 0.:
-                    CLsb = 1.
-                    CLb  = 1.
-                else:
-                    CLsb = 1. - stats.multivariate_normal.cdf( (qmu + qA)/(2*sqA) )
-                    CLb = 1. - stats.multivariate_normal.cdf( (qmu - qA)/(2*sqA) )
-            CLs = 0.
-            if CLb > 0.:
-                CLs = CLsb/CLb
-            root = CLs - 1. + self.cl
-            return root
+                CLsb = 1. - stats.multivariate_normal.cdf( (qmu + qA)/(2*sqA) )
+                CLb = 1. - stats.multivariate_normal.cdf( (qmu - qA)/(2*sqA) )
+        CLs = CLsb/CLb if CLb > 0. else 1.
+        return 1 - CLs
+
+    def ulSigma(self, model, marginalize=False, toys=None, expected=False ):
+        """ upper limit obtained from the defined Data (using the signal prediction
+            for each signal regio/dataset), by using
+            the q_mu test statistic from the CCGV paper (arXiv:1007.1727).
+            The signal yields scale linearly with the signal strength, so that the
+            limit is obtained with a single root finding on top of one fit.
+
+        :params marginalize: if true, marginalize nuisances, else profile them
+        :params toys: specify number of toys. Use default is none
+        :params expected: compute the expected value, not the observed.
+        :returns: upper limit on the signal strength, i.e. on the factor multiplying
+                  model.nsignal (the production xsec if nsignal is given for a unit xsec)
+        """
+        if model.zeroSignal():
+            """ only zeroes in efficiencies? cannot give a limit! """
+            return None
+        if toys==None:
+            toys=self.ntoys
+        fit  = self.fit(model, marginalize, toys, expected)
+        norm = NP.sum(model.nsignal)
 
+        def root_func(mu):
+            return self.exclusionCL(fit, mu) - self.cl
 
-        a,b=1.5*mu_hat,2.5*mu_hat+2*sigma_mu
+        mu_hat = max(fit["mu_hat"], 0.)
+        a,b=1.5*mu_hat,2.5*mu_hat+2*fit["sigma_mu"]
         ctr=0
         while True:
             while ( NP.sign ( root_func(a)* root_func(b) ) > -.5 ):
@@ -831,10 +867,10 @@ class CLsComputer:
                         return None
                     else:
                         logger.debug("cannot find brent bracket after 20 trials. but very low number of toys")
-                        return self.ulSigma ( model, marginalize, 4*toys )
+                        return self.ulSigma ( model, marginalize, 4*toys, expected )
             try:
                 mu_lim = optimize.brentq ( root_func, a, b, rtol=1e-03, xtol=1e-06 )
-                return mu_lim
+                return mu_lim / norm
             except ValueError as e: ## it could still be that the signs arent opposite
                 # in that case, try again
                 pass
@@ -862,75 +898,21 @@ class CLsComputer:
         if model.zeroSignal():
             """ only zeroes in efficiencies? cannot give a limit! """
             return None
-        if toys==None:
-            toys=self.ntoys
-        oldmodel = model
-        if expected:
-            model = copy.deepcopy(oldmodel)
-            #model.observed = model.backgrounds
-            for i,d in enumerate(model.backgrounds):
-                model.observed[i]=int(NP.round(d))
-        computer = LikelihoodComputer(model, toys)
-        mu_hat = computer.findMuHat(model.nsignal)
-        theta_hat0,_ = computer.findThetaHat(0*model.nsignal)
-        sigma_mu = computer.getSigmaMu(model.nsignal)
+        fit = self.fit(model, marginalize, toys, expected)
+        return self.exclusionCL(fit, NP.sum(model.nsignal))
 
-        aModel = copy.deepcopy(model)
-        aModel.observed = array([NP.round(x+y) for x,y in zip(model.backgrounds,theta_hat0)])
-        #print ( "aModeldata=", aModel.observed )
-        #aModel.observed = array ( [ round(x) for x in model.backgrounds ] )
-        aModel.name = aModel.name + "A"
-        compA = LikelihoodComputer(aModel, toys)
-        ## compute
-        mu_hatA = compA.findMuHat(aModel.nsignal)
-        # if mu_hat < 0.:
-            # mu_hat = 0.
-        # -log L(mu_hat, theta_hat(mu_hat))
-        nll0 = computer.likelihood(model.signals(mu_hat),
-                                        marginalize=marginalize,
-                                        nll=True)
-        if NP.isinf(nll0) and marginalize==False:
-            logger.warning("nll is infinite in profiling! we switch to marginalization, but only for this one!" )
-            marginalize=True
-            nll0 = computer.likelihood(model.signals(mu_hat),
-                                            marginalize=True,
-                                            nll=True)
-            if NP.isinf(nll0):
-                logger.warning("marginalization didnt help either. switch back.")
-                marginalize=False
-            else:
-                logger.warning("marginalization worked.")
-        nll0A = compA.likelihood(aModel.signals(mu_hatA),
-                                    marginalize=marginalize,
-                                    nll=True)
-        
-        # nsig = model.signals(1.)
-        computer.ntot = model.backgrounds + model.nsignal
-        # -log L(mu = 1, theta(1))
-        nll = computer.likelihood(model.nsignal, marginalize=marginalize, nll=True )
-        nllA = compA.likelihood(model.nsignal, marginalize=marginalize, nll=True )
-        qmu =  2*( nll - nll0 )
-        if qmu<0.: qmu=0.
-        sqmu = sqrt (qmu)
-        qA =  2*( nllA - nll0A )
-        # print ( "mu: %s, qMu: %s, qA: %s nll0A: %s nllA: %s" % ( mu, qmu, qA, nll0A, nllA ) )
-        if qA<0.:
-            qA=0.
-        sqA = sqrt(qA)
-        if qA >= qmu:
-            CLsb = 1. - stats.multivariate_normal.cdf(sqmu)
-            CLb =  stats.multivariate_normal.cdf(sqA - sqmu)
-        else:
-            if qA == 0.:
-                CLsb = 1.
-                CLb  = 1.
-            else:
-                CLsb = 1. - stats.multivariate_normal.cdf( (qmu + qA)/(2*sqA) )
-                CLb = 1. - stats.multivariate_normal.cdf( (qmu - qA)/(2*sqA) )
-        # CLs = 0.
-        # if CLb > 0.:
-        CLs = CLsb/CLb if CLb > 0. else 1.
-        return 1 - CLs
+    def computeCLsBatch(self, model, scales, marginalize=False, toys=None, expected=False ):
+        """ exclusion confidence levels (1-CLs) for the signal prediction of the model
+            multiplied by each of the scales, obtained from a single fit.
+
+        :params scales: factors multiplying model.nsignal
+        :returns: list of exclusion confidence levels, None if the signal vanishes
+        """
+        if model.zeroSignal():
+            return None
+        fit  = self.fit(model, marginalize, toys, expected)
+        norm = NP.sum(model.nsignal)
+        return [self.exclusionCL(fit, scale*norm) for scale in scales]
 
 
 if __name__ == "__main__":
@@ -950,10 +932,10 @@ if __name__ == "__main__":
               third_moment = [ 0. ] * 8,
               nsignal = nsignal,
               name="CMS-NOTE-2017-001 model" )
-    ulComp = UpperLimitComputer(ntoys=500, cl=.95)
+    ulComp = CLsComputer(ntoys=500, cl=.95)
     #uls = ulComp.ulSigma ( Data ( 15,17.5,3.2,0.00454755 ) )
     #print ( "uls=", uls )
-    ul_old = 131.828*sum(nsignal) #With respect to the older refernece value one must normalize the xsec
+    ul_old = 131.828 # reference value, ulSigma giving the limit on the factor multiplying nsignal
     print ( "old ul=", ul_old )
     ul = ulComp.ulSigma ( m )
     print ( "ul (marginalized)", ul )
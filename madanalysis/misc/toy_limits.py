@@ -0,0 +1,101 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Upper limits on the number of signal events with the native toy calculator.
+
+The background toys of each region are histogrammed once by the
+ToyCLsEngine and the background-only p-value is computed once. As the toy
+bank is fixed, 1-CLs is a smooth, monotonically increasing function of the
+number of signal events, which is inverted by a bisection performed
+simultaneously for all regions.
+"""
+
+from __future__ import absolute_import
+import logging
+import numpy as np
+
+
+def upper_limits(engine, nobs, nb, deltanb, cl=0.95, rtol=1e-5,
+                 max_iterations=100):
+    """
+    Number of signal events excluded at the confidence level cl, for each
+    signal region.
+
+    Parameters
+    ----------
+    engine : ToyCLsEngine
+        native CLs calculator holding the toy bank
+    nobs, nb, deltanb : lists of float
+        observed events, expected background and its uncertainty per region
+    cl : float
+        confidence level
+    rtol : float
+        relative precision on the limits
+
+    Returns
+    -------
+    numpy array
+        limits in number of events, -1 if the limit could not be derived
+    """
+    logger  = logging.getLogger('MA5')
+    nobs    = np.atleast_1d(np.asarray(nobs, dtype=float))
+    nb      = np.atleast_1d(np.asarray(nb, dtype=float))
+    deltanb = np.atleast_1d(np.asarray(deltanb, dtype=float))
+    if len(nb) == 0:
+        return np.array([])
+
+    # Background-only quantities, computed once per region
+    centres, weights = engine.backgrounds(nb, deltanb)
+    p_b = engine.p_values(nobs, centres, weights, np.zeros((len(nb), 1)))[:, 0]
+
+    def CLs(nsignal):
+        p_SplusB = engine.p_values(nobs, centres, weights, nsignal[:, None])[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = 1. - p_SplusB / p_b
+        result[~np.isfinite(result) | (p_SplusB > p_b)] = 0.
+        return result
+
+    # Bracketing the limits
+    low, high = np.zeros(len(nb)), np.ones(len(nb))
+    toolow    = CLs(high) < cl
+    while np.any(toolow):
+        if np.max(high[toolow]) > 1e10:
+            break
+        low[toolow]   = high[toolow]
+        high[toolow] *= 10.
+        toolow[toolow] = CLs(high)[toolow] < cl
+    valid = ~toolow & np.isfinite(p_b) & (p_b > 0.)
+
+    # Bisection, all regions at once
+    for i in range(max_iterations):
+        if np.all(high - low <= rtol * high):
+            break
+        middle = 0.5 * (low + high)
+        above  = CLs(middle) >= cl
+        high   = np.where(above, middle, high)
+        low    = np.where(above, low, middle)
+    logger.debug('Toy upper limits derived after '+str(i)+' bisection steps')
+
+    return np.where(valid, 0.5 * (low + high), -1.)
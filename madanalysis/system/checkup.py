@@ -26,6 +26,7 @@ from __future__ import absolute_import
 from madanalysis.system.user_info          import UserInfo
 from madanalysis.system.config_checker     import ConfigChecker
 from madanalysis.system.detect_manager     import DetectManager
+from madanalysis.system.detection_cache    import DetectionCache
 from string_tools                          import StringTools
 from shell_command import ShellCommand
 import logging
@@ -285,44 +286,31 @@ class CheckUp():
             return False
         return True
 
+    def CachedDetection(self,phase,steps,cache=True):
+        """ Running detection steps, or restoring their result from the detection cache """
+        detection = DetectionCache(self.archi_info,self.session_info,self.user_info)
+        if cache and detection.Restore(phase):
+            return True
+        return detection.Record(phase,steps)
+
     def CheckMandatoryPackages(self):
         # Mandatory packages
         self.logger.info("Checking mandatory packages:")
 
-        if not self.checker.Execute('python'):
-            return False
-        if not self.checker.Execute('gpp'):
-            return False
-        if not self.checker.Execute('make'):
-            return False
-        return True
+        return self.checker.ExecuteAll(['python','gpp','make'])
 
     def CheckOptionalGraphicalPackages(self):
         # Optional packages
         self.logger.info("Checking optional packages devoted to histogramming:")
 
-        if not self.checker.Execute('root_graphical'):
-            return False
-        if not self.checker.Execute('matplotlib'):
-            return False
-        if not self.checker.Execute('gnuplot'):
-            return False
-        if not self.checker.Execute('pdflatex'):
-            return False
-        if not self.checker.Execute('latex'):
-            return False
-        return True
+        return self.checker.ExecuteAll(['root_graphical','matplotlib','gnuplot','pdflatex','latex'])
 
     def CheckOptionalProcessingPackages(self):
         # Optional packages
         self.logger.info("Checking optional packages devoted to data processing:")
         checker2 = ConfigChecker(self.archi_info, self.user_info, self.session_info, self.script, self.debug)
 
-        if not self.checker.Execute('zlib'):
-            return False
-        if not self.checker.Execute('fastjet'):
-            return False
-        if not self.checker.Execute('root'):
+        if not self.checker.ExecuteAll(['zlib','fastjet','root']):
             return False
 
         self.archi_info.has_delphes           = checker2.checkDelphes()
@@ -334,19 +322,7 @@ class CheckUp():
         # Optional packages
         self.logger.info("Checking optional packages devoted to reinterpretation:")
 
-        if not self.checker.Execute('scipy'):
-            return False
-        if not self.checker.Execute('pad'):
-            return False
-        if not self.checker.Execute('padma5'):
-            return False
-        if not self.checker.Execute('padsfs'):
-            return False
-        if not self.checker.Execute('pyhf'):
-            return False
-        if not self.checker.Execute('simplify'):
-            return False
-        return True
+        return self.checker.ExecuteAll(['scipy','pad','padma5','padsfs','pyhf','simplify'])
 
 
     def CreateSymLink(self,source,destination):
@@ -23,17 +23,42 @@
 
 
 from __future__ import absolute_import
+import concurrent.futures
 import logging
 import sys
+import threading
 from string_tools import StringTools
 from madanalysis.enumeration.detect_status_type import DetectStatusType
 
 
+class DetectLogBuffer(logging.Filter):
+    """ Holding back the log records emitted by the registered threads """
+
+    def __init__(self):
+        logging.Filter.__init__(self)
+        self.records = {}
+
+    def filter(self, record):
+        # Thread handling the record (not record.thread: the records are replayed by the main thread)
+        buffer = self.records.get(threading.current_thread().ident)
+        if buffer is None:
+            return True
+        buffer.append(record)
+        return False
+
+
 class DetectManager():
 
     # same as checker.name
     hidden_packages = ["likelihood simplifier"]
 
+    # Packages to detect before a package when they are detected together
+    dependencies = {'zlib'          : ['gpp'],
+                    'root_graphical': ['root'],
+                    'pyroot'        : ['root'],
+                    'pyhf'          : ['scipy'],
+                    'simplify'      : ['pyhf']}
+
     def __init__(self,archi_info,user_info,session_info,script,debug):
         self.archi_info      = archi_info
         self.user_info       = user_info
@@ -330,6 +355,66 @@ class DetectManager():
         return True
 
 
+    def ExecuteAll(self, packages):
+        """
+        Detecting several packages. The packages are detected concurrently on
+        a thread pool, a package waiting for its dependencies in the list. The
+        log lines of each package are then displayed in the order of the list,
+        up to the first failure of a mandatory package (-> False).
+        """
+        buffer  = DetectLogBuffer()
+        results = {}
+        logs    = {}
+
+        def detect(package):
+            records = []
+            buffer.records[threading.current_thread().ident] = records
+            try:
+                return self.Execute(package)
+            finally:
+                del buffer.records[threading.current_thread().ident]
+                logs[package] = records
+
+        pending = list(packages)
+        running = {}
+        self.logger.addFilter(buffer)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,min(len(packages),8))) as pool:
+                while len(pending)!=0 or len(running)!=0:
+                    for package in list(pending):
+                        required = [x for x in DetectManager.dependencies.get(package.lower(),[]) \
+                                    if x in packages and x!=package]
+                        if any(x in pending or x in running.values() for x in required):
+                            continue
+                        if any(results.get(x) is not True for x in required):
+                            pending.remove(package)
+                            continue
+                        pending.remove(package)
+                        running[pool.submit(detect, package)] = package
+                    if len(running)==0:
+                        break
+                    done, _ = concurrent.futures.wait(list(running.keys()),
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        package = running.pop(future)
+                        try:
+                            results[package] = future.result()
+                        except Exception as error:
+                            results[package] = error
+        finally:
+            self.logger.removeFilter(buffer)
+
+        # Displaying the results in the usual order
+        for package in packages:
+            for record in logs.get(package,[]):
+                self.logger.handle(record)
+            if isinstance(results.get(package), Exception):
+                raise results[package]
+            if results.get(package) is not True:
+                return False
+        return True
+
+
     def Print(self,status):
         if status==DetectStatusType.FOUND:
             PrintOK('')
@@ -0,0 +1,199 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Cache of the package detection.
+
+The effect of a detection phase (changes of ArchitectureInfo and
+SessionInfo, of sys.path and of the environment, and the displayed lines)
+is saved in tools/detection_cache.ma5. It is restored instead of running
+the detection again if the fingerprint of the environment is unchanged:
+environment variables, user options, python interpreter and packages,
+executables in the PATH, packages of the tools folder, and modification
+times of the files found by the detection.
+"""
+
+from __future__ import absolute_import
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import sys
+
+
+class DetectionRecorder(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.INFO)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
+class DetectionCache():
+
+    version     = 1
+    variables   = ['PATH', 'LD_LIBRARY_PATH', 'DYLD_LIBRARY_PATH', 'LIBRARY_PATH', 'CPLUS_INCLUDE_PATH',
+                   'C_INCLUDE_PATH', 'PYTHONPATH', 'ROOTSYS', 'CC', 'CXX', 'FC', 'MA5_BASE']
+    executables = ['g++', 'make', 'root-config', 'root', 'fastjet-config', 'gnuplot',
+                   'latex', 'pdflatex', 'dvipdf']
+    # Folders of tools/ modified by MadAnalysis itself
+    ignored     = ['SampleAnalyzer', 'ReportGenerator', 'RecoEventsCache']
+
+    def __init__(self, archi_info, session_info, user_info):
+        self.archi_info   = archi_info
+        self.session_info = session_info
+        self.user_info    = user_info
+        self.filename     = os.path.join(archi_info.ma5dir, 'tools', 'detection_cache.ma5')
+        self.logger       = logging.getLogger('MA5')
+
+
+    @staticmethod
+    def State(obj):
+        return dict((key, value) for key, value in vars(obj).items() if key!='logger')
+
+
+    @staticmethod
+    def Time(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+
+    def Fingerprint(self, phase):
+        items = [str(DetectionCache.version), phase, self.archi_info.ma5dir,
+                 self.archi_info.ma5_version, self.archi_info.ma5_date, sys.executable, sys.version]
+        items += [name+'='+os.environ.get(name, '') for name in DetectionCache.variables]
+        items += [key+'='+repr(value) for key, value in sorted(DetectionCache.State(self.user_info).items())]
+        for name in DetectionCache.executables:
+            path = shutil.which(name)
+            items.append(name+':'+str(path)+':'+str(DetectionCache.Time(path) if path else None))
+        for path in sys.path:
+            if os.path.basename(os.path.normpath(path)) in ['site-packages', 'dist-packages']:
+                items.append(path+':'+str(DetectionCache.Time(path)))
+        tools = os.path.join(self.archi_info.ma5dir, 'tools')
+        if os.path.isdir(tools):
+            for name in sorted(os.listdir(tools)):
+                if name not in DetectionCache.ignored and os.path.isdir(os.path.join(tools, name)):
+                    items.append(name+':'+str(DetectionCache.Time(os.path.join(tools, name))))
+        return hashlib.sha1('\n'.join(items).encode('utf-8')).hexdigest()
+
+
+    def Files(self):
+        """ Modification times of the binaries and libraries found by the detection """
+        paths = []
+        for key in ['root_original_bins', 'fastjet_original_bins', 'zlib_original_libs',
+                    'delphes_original_libs', 'delphesMA5tune_original_libs']:
+            paths += list(getattr(self.archi_info, key, []))
+        for key in ['pad_original_bins', 'padma5_original_bins', 'padsfs_original_bins']:
+            paths += list(getattr(self.session_info, key, []))
+        paths += [x.split(':')[0] for x in self.archi_info.libraries.values()]
+        return dict((path, DetectionCache.Time(path)) for path in paths if path!='')
+
+
+    def Read(self):
+        try:
+            with open(self.filename, 'rb') as stream:
+                content = pickle.load(stream)
+        except Exception:
+            return {}
+        if not isinstance(content, dict) or content.get('version')!=DetectionCache.version:
+            return {}
+        return content
+
+
+    def Restore(self, phase):
+        """ Restoring the result of a detection phase; False if not cached or out of date """
+        entry = self.Read().get(phase)
+        if entry is None or entry['fingerprint']!=self.Fingerprint(phase):
+            return False
+        if any(DetectionCache.Time(path)!=time for path, time in entry['files'].items()):
+            self.logger.debug('Some files found by the package detection have changed')
+            return False
+
+        for key, value in entry['archi_info'].items():
+            setattr(self.archi_info, key, copy.deepcopy(value))
+        for key, value in entry['session_info'].items():
+            setattr(self.session_info, key, copy.deepcopy(value))
+        for path in entry['sys_path']:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        for key, value in entry['environ'].items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for level, message in entry['log']:
+            self.logger.log(level, message)
+        self.logger.debug('Package detection ('+phase+') restored from '+self.filename)
+        return True
+
+
+    def Record(self, phase, steps):
+        """ Running the detection steps and saving their result if they succeed """
+        fingerprint  = self.Fingerprint(phase)
+        archi_info   = copy.deepcopy(DetectionCache.State(self.archi_info))
+        session_info = copy.deepcopy(DetectionCache.State(self.session_info))
+        sys_path     = list(sys.path)
+        environ      = dict(os.environ)
+
+        # Recorder placed before the other handlers, whose formatters modify the messages
+        recorder = DetectionRecorder()
+        self.logger.handlers.insert(0, recorder)
+        try:
+            for step in steps:
+                if not step():
+                    return False
+        finally:
+            self.logger.removeHandler(recorder)
+
+        def changes(before, after):
+            return dict((key, value) for key, value in after.items() \
+                        if key not in before or before[key]!=value)
+
+        entry = {'fingerprint' : fingerprint,
+                 'files'       : self.Files(),
+                 'archi_info'  : changes(archi_info, DetectionCache.State(self.archi_info)),
+                 'session_info': changes(session_info, DetectionCache.State(self.session_info)),
+                 'sys_path'    : [x for x in sys.path if x not in sys_path][::-1],
+                 'environ'     : changes(environ, dict(os.environ)),
+                 'log'         : recorder.records}
+        for key in environ:
+            if key not in os.environ:
+                entry['environ'][key] = None
+
+        content = self.Read()
+        content['version'] = DetectionCache.version
+        content[phase]     = entry
+        try:
+            with open(self.filename+'.tmp', 'wb') as stream:
+                pickle.dump(content, stream)
+            os.rename(self.filename+'.tmp', self.filename)
+        except Exception as err:
+            self.logger.debug('Cannot write the detection cache '+self.filename+': '+str(err))
+        return True
@@ -0,0 +1,94 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+from __future__ import absolute_import
+import logging
+import multiprocessing
+
+
+class ProcessPool():
+    """
+    Running a Python function over a list of arguments in forked processes.
+    The function is inherited by the children through the fork, so that it
+    can be a bound method of any (non picklable) object; only the arguments
+    and the results must be picklable. The results are returned in the
+    order of the arguments.
+    """
+
+    function  = None
+    in_worker = False
+
+    @staticmethod
+    def CanFork():
+        return 'fork' in multiprocessing.get_all_start_methods()
+
+    @staticmethod
+    def Initialize():
+        ProcessPool.in_worker = True
+
+    @staticmethod
+    def Run(function, argument):
+        try:
+            return True, function(argument)
+        except Exception as err:
+            logging.getLogger('MA5').debug(str(err))
+            return False, str(err)
+
+    @staticmethod
+    def Call(argument):
+        return ProcessPool.Run(ProcessPool.function, argument)
+
+    @staticmethod
+    def Map(function, arguments, ncores):
+        """
+        Returns the list of function(argument). A failing call is reported as
+        an error and gives None (in the serial mode too). The execution is
+        serial with one core, with a single argument, or from a process that
+        is already a pool worker.
+        """
+        arguments = list(arguments)
+        ncores    = min(int(ncores), len(arguments))
+        if ncores <= 1 or ProcessPool.in_worker or not ProcessPool.CanFork():
+            outputs = [ProcessPool.Run(function, x) for x in arguments]
+        else:
+            logging.getLogger('MA5').debug('Running '+str(len(arguments))+' tasks on '+\
+                                           str(ncores)+' processes')
+            ProcessPool.function = function
+            context = multiprocessing.get_context('fork')
+            pool    = context.Pool(ncores, initializer=ProcessPool.Initialize)
+            try:
+                outputs = pool.map(ProcessPool.Call, arguments, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+                ProcessPool.function = None
+
+        results = []
+        for argument, (ok, output) in zip(arguments, outputs):
+            if not ok:
+                logging.getLogger('MA5').error('Problem with the task '+str(argument)+\
+                                               ': '+output)
+                output = None
+            results.append(output)
+        return results
@@ -0,0 +1,149 @@
+################################################################################
+#
+#  Copyright (C) 2012-2023 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+"""
+Profiling of the startup (option --profile-startup).
+
+The import statements are timed by a wrapper of builtins.__import__: for
+each module, the cumulative time of its first import (execution of the
+module, including the modules it imports) and its self time, also for the
+imports of the threads (package detection). The startup is divided in
+phases whose durations are reported together with the time spent in the
+imports of the main thread during each phase.
+"""
+
+from __future__ import absolute_import
+import builtins
+import importlib.util
+import logging
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+
+    active   = False
+    start    = 0.
+    original = None
+    modules  = {}    # name -> [cumulative time, self time, phase]
+    phases   = []    # [name, begin, end, import time]
+    threads  = threading.local()
+
+
+    @staticmethod
+    def Start():
+        if StartupProfiler.active:
+            return
+        StartupProfiler.active   = True
+        StartupProfiler.start    = time.time()
+        StartupProfiler.phases   = [['initialization', StartupProfiler.start, None, 0.]]
+        StartupProfiler.original = builtins.__import__
+        builtins.__import__      = StartupProfiler.Import
+
+
+    @staticmethod
+    def Stop():
+        if not StartupProfiler.active:
+            return
+        builtins.__import__    = StartupProfiler.original
+        StartupProfiler.active = False
+        StartupProfiler.phases[-1][2] = time.time()
+
+
+    @staticmethod
+    def Step(name):
+        """ Ending the current phase and beginning a new one """
+        if not StartupProfiler.active:
+            return
+        now = time.time()
+        StartupProfiler.phases[-1][2] = now
+        StartupProfiler.phases.append([name, now, None, 0.])
+
+
+    @staticmethod
+    def Loading(name, globals, fromlist, level):
+        """ Name of the module loaded by an import statement, None if already loaded """
+        if level!=0:
+            try:
+                name = importlib.util.resolve_name('.'*level+name, globals.get('__package__'))
+            except (AttributeError, ImportError, ValueError):
+                return None
+        if name not in sys.modules:
+            return name
+        for item in fromlist or []:
+            if item!='*' and name+'.'+item not in sys.modules and not hasattr(sys.modules[name], item):
+                return name+'.'+item
+        return None
+
+
+    @staticmethod
+    def Import(name, globals=None, locals=None, fromlist=(), level=0):
+        original = StartupProfiler.original
+        module   = StartupProfiler.Loading(name, globals, fromlist, level)
+        if module is None:
+            return original(name, globals, locals, fromlist, level)
+
+        # Stack of the imports in progress in the thread (time spent in the sub-imports)
+        if not hasattr(StartupProfiler.threads, 'stack'):
+            StartupProfiler.threads.stack = []
+        stack = StartupProfiler.threads.stack
+        stack.append(0.)
+        begin = time.time()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            duration = time.time()-begin
+            children = stack.pop()
+            if len(stack)!=0:
+                stack[-1] += duration
+            elif threading.current_thread() is threading.main_thread():
+                StartupProfiler.phases[-1][3] += duration
+            entry = StartupProfiler.modules.setdefault(module, [0., 0., StartupProfiler.phases[-1][0]])
+            entry[0] += duration
+            entry[1] += duration-children
+
+
+    @staticmethod
+    def Report(nmodules=25):
+        """ Displaying the profile (and stopping the profiling) """
+        if not StartupProfiler.active:
+            return
+        StartupProfiler.Stop()
+        logger = logging.getLogger('MA5')
+        logger.info('Startup profile: time-to-prompt = {:.3f} s'.format(time.time()-StartupProfiler.start))
+        logger.info('   Phases (total / imports):')
+        for name, begin, end, imports in StartupProfiler.phases:
+            logger.info('     - {:<44}{:8.3f} s {:8.3f} s'.format(name, end-begin, imports))
+
+        modules = sorted(StartupProfiler.modules.items(), key=lambda x: x[1][0], reverse=True)
+        logger.info('   Modules (cumulative / self time, phase):')
+        for index, (name, (cumulative, own, phase)) in enumerate(modules):
+            line = '     - {:<50}{:8.3f} s {:8.3f} s   {}'.format(name, cumulative, own, phase)
+            if index<nmodules:
+                logger.info(line)
+            else:
+                logger.debug(line)
+        if len(modules)>nmodules:
+            logger.info('     ... '+str(len(modules)-nmodules)+' other modules (displayed in debug mode)')
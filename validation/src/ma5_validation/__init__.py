@@ -1,4 +1,5 @@
 from ma5_validation import utils
 from ma5_validation import system
+from ma5_validation import regression
 
-__all__ = utils.__all__ + system.__all__
+__all__ = utils.__all__ + system.__all__ + regression.__all__
@@ -0,0 +1,344 @@
+################################################################################
+#
+#  Copyright (C) 2012-2022 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+import os
+import random
+import shutil
+import time
+from typing import Dict, List, Text
+
+import numpy as np
+
+from ma5_validation.utils.path_handler import PathHandler
+
+# Relative precision of the numbers written by SampleAnalyzer (%e)
+SAF_PRECISION = 1e-6
+
+
+class SafWriter:
+    """
+    Synthetic SampleAnalyzer outputs with known contents: a sample file, a
+    histos.saf file (Histo, HistoLogX and HistoFrequency) and a cutflow.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the random contents.
+    """
+
+    labels = [-13, -11, 11, 13, 22, 211]
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+
+    @staticmethod
+    def row(*values) -> Text:
+        return "      " + "".join(
+            (str(x) if isinstance(x, int) else "%e" % x).ljust(15) for x in values
+        )
+
+    def histo(self, kind: Text, name: Text, nbins: int, regions: List[Text]) -> Dict:
+        rnd = self.random
+        return {
+            "kind": kind,
+            "name": name,
+            "nbins": nbins,
+            "xmin": 1.0 if kind == "HistoLogX" else 0.0,
+            "xmax": 100.0,
+            "regions": regions,
+            "statistics": [
+                (rnd.randint(0, 99), rnd.randint(0, 9)),
+                (rnd.random(), rnd.random()),
+                (rnd.randint(0, 99), rnd.randint(0, 9)),
+            ]
+            + [(rnd.random(), rnd.random()) for _ in range(4)],
+            "data": [(rnd.random(), 0.1 * rnd.random()) for _ in range(nbins + 2)],
+        }
+
+    def frequency(self, name: Text) -> Dict:
+        rnd = self.random
+        labels = sorted(rnd.sample(SafWriter.labels, 4))
+        return {
+            "kind": "HistoFrequency",
+            "name": name,
+            "regions": [],
+            "statistics": [
+                (rnd.randint(0, 99), rnd.randint(0, 9)),
+                (rnd.random(), rnd.random()),
+                (rnd.randint(0, 99), rnd.randint(0, 9)),
+                (rnd.random(), rnd.random()),
+            ],
+            "data": [(label, rnd.random(), 0.0) for label in labels],
+        }
+
+    def histos(self) -> List[Dict]:
+        return [
+            self.histo("Histo", "pt_1", 20, ["SR1", "SR2"]),
+            self.frequency("npid"),
+            self.histo("HistoLogX", "ht", 40, ["SR1"]),
+            self.histo("Histo", "eta", 5, ["SR2"]),
+        ]
+
+    def write_histos(self, filename: Text, histos: List[Dict]) -> None:
+        lines = ["<SAFheader>", "</SAFheader>", ""]
+        for histo in histos:
+            lines += ["<" + histo["kind"] + ">", "  <Description>", '    "' + histo["name"] + '"']
+            if histo["kind"] != "HistoFrequency":
+                lines += ["    # nbins      xmin           xmax"]
+                lines += [self.row(histo["nbins"], histo["xmin"], histo["xmax"])]
+            if len(histo["regions"]) != 0:
+                lines += ["    # Defined regions"]
+                lines += [
+                    "      " + reg + "    # Region nr. " + str(i + 1)
+                    for i, reg in enumerate(histo["regions"])
+                ]
+            lines += ["  </Description>", "  <Statistics>"]
+            lines += [self.row(*x) + " # statistics" for x in histo["statistics"]]
+            lines += ["  </Statistics>", "  <Data>"]
+            lines += [self.row(*x) for x in histo["data"]]
+            lines += ["  </Data>", "</" + histo["kind"] + ">", ""]
+        lines += ["<SAFfooter>", "</SAFfooter>"]
+        with open(filename, "w") as output:
+            output.write("\n".join(lines) + "\n")
+
+    def cutflow(self, ncuts: int) -> List[List[float]]:
+        rnd = self.random
+        counters = []
+        for _ in range(ncuts + 1):
+            counters.append([float(rnd.randint(10, 99)), rnd.random() * 50.0, rnd.random() * 25.0])
+        return counters
+
+    def write_cutflow(self, filename: Text, counters: List[List[float]]) -> None:
+        lines = ["<SAFheader>", "</SAFheader>", "", "<InitialCounter>"]
+        lines += ['"Initial number of events"      #']
+        lines += [self.row(x, 0.0) + " # counter" for x in counters[0]]
+        lines += ["</InitialCounter>", ""]
+        for i, counter in enumerate(counters[1:]):
+            lines += ["<Counter>", '"cut ' + str(i) + '"  # ' + str(i)]
+            lines += [self.row(x, 0.0) + " # counter" for x in counter]
+            lines += ["</Counter>", ""]
+        lines += ["<SAFfooter>", "</SAFfooter>"]
+        with open(filename, "w") as output:
+            output.write("\n".join(lines) + "\n")
+
+    def write_sample(self, filename: Text, files: List[Text], nevents: List[int]) -> None:
+        header = "    # xsection      xsection_error nevents        sum_weight+    sum_weight-\n"
+        details = [self.row(1.5, 0.1, n, float(n), 0.0) for n in nevents]
+        total = self.row(1.5, 0.1 / len(files) ** 0.5, sum(nevents), float(sum(nevents)), 0.0)
+        with open(filename, "w") as output:
+            output.write("<SAFheader>\n</SAFheader>\n\n<SampleGlobalInfo>\n" + header)
+            output.write(total + "\n</SampleGlobalInfo>\n\n<FileInfo>\n")
+            output.write("".join("    " + x + "\n" for x in files))
+            output.write("</FileInfo>\n\n<SampleDetailedInfo>\n" + header)
+            output.write("".join(x + "\n" for x in details))
+            output.write("</SampleDetailedInfo>\n\n<SAFfooter>\n</SAFfooter>\n")
+
+
+class SafRegression:
+    """
+    Check the block-wise SAF reader (``SafHistoFile``), the binary index of
+    the SAF outputs (``SafIndex``) and the merging of the outputs of the
+    shards of a dataset (``SAFMerger``) on synthetic SAF files.
+
+    Parameters
+    ----------
+    workdir : Text
+        Folder where the SAF files are written (removed beforehand).
+        Default: ``saf_regression`` in the log path.
+    seed : int
+        Seed of the contents of the files.
+    """
+
+    def __init__(self, workdir: Text = None, seed: int = 12345):
+        self.workdir = workdir or os.path.join(PathHandler.LOGPATH, "saf_regression")
+        self.seed = seed
+        self.failures = []
+
+    def check(self, condition: bool, message: str) -> None:
+        if not condition:
+            self.failures.append(message)
+            print("     - FAILED: " + message)
+
+    @staticmethod
+    def close(value, reference) -> bool:
+        value, reference = np.asarray(value, dtype=float), np.asarray(reference, dtype=float)
+        return value.shape == reference.shape and np.allclose(
+            value, reference, rtol=SAF_PRECISION, atol=SAF_PRECISION
+        )
+
+    def compare(self, histo, reference: Dict, where: Text) -> None:
+        """Decoded histogram against the written contents"""
+        self.check(histo.name == reference["name"], f"{where}: name {histo.name}")
+        self.check(
+            list(histo.regions) == reference["regions"], f"{where}: regions {histo.regions}"
+        )
+        statistics = np.array(reference["statistics"], dtype=float)
+        fields = ["nevents", "sumwentries", "nentries", "sumw"]
+        if reference["kind"] != "HistoFrequency":
+            fields += ["sumw2", "sumwx", "sumw2x"]
+        for field, row in zip(fields, statistics):
+            values = (getattr(histo.positive, field), getattr(histo.negative, field))
+            self.check(self.close(values, row), f"{where}: {field} {values} instead of {row}")
+
+        data = np.array(reference["data"], dtype=float)
+        if reference["kind"] == "HistoFrequency":
+            self.check(
+                list(histo.labels) == [int(x) for x in data[:, 0]], f"{where}: labels {histo.labels}"
+            )
+            data = data[:, 1:]
+        else:
+            binning = (histo.nbins, histo.xmin, histo.xmax)
+            expected = (reference["nbins"], reference["xmin"], reference["xmax"])
+            self.check(self.close(binning, expected), f"{where}: binning {binning}")
+            flows = [
+                (histo.positive.underflow, histo.negative.underflow),
+                (histo.positive.overflow, histo.negative.overflow),
+            ]
+            self.check(self.close(flows, data[[0, -1]]), f"{where}: underflow/overflow {flows}")
+            data = data[1:-1]
+        self.check(self.close(histo.positive.array, data[:, 0]), f"{where}: positive bin contents")
+        self.check(self.close(histo.negative.array, data[:, 1]), f"{where}: negative bin contents")
+
+    def validate_reader(self, writer: SafWriter) -> None:
+        from madanalysis.IOinterface.saf_reader import SafHistoFile
+
+        print("   * Reading the histograms with SafHistoFile")
+        filename = os.path.join(self.workdir, "reader", "histos.saf")
+        os.makedirs(os.path.dirname(filename))
+        histos = writer.histos()
+        writer.write_histos(filename, histos)
+        safs = SafHistoFile(filename)
+        self.check(len(safs) == len(histos), f"{len(safs)} histograms read instead of {len(histos)}")
+        self.check(safs.Names() == [x["name"] for x in histos], f"histogram names {safs.Names()}")
+        for histo, reference in zip(safs, histos):
+            self.compare(histo, reference, "reader, " + reference["name"])
+
+    def validate_index(self, writer: SafWriter) -> None:
+        from madanalysis.IOinterface.saf_index import SafIndex
+        from madanalysis.IOinterface.saf_reader import SafHistoFile
+
+        print("   * Saving and reloading the histograms with SafIndex")
+        path = os.path.join(self.workdir, "index")
+        filename = os.path.join(path, "histos.saf")
+        os.makedirs(path)
+        histos = writer.histos()
+        writer.write_histos(filename, histos)
+
+        index = SafIndex(path)
+        index.SetHistos(filename, list(SafHistoFile(filename)))
+        self.check(index.Save(), "the index cannot be written")
+
+        index = SafIndex(path)
+        saved = index.GetHistos(filename)
+        self.check(saved is not None, "the index entry is not found after reloading")
+        for histo, reference in zip(saved or [], histos):
+            self.compare(histo, reference, "index, " + reference["name"])
+
+        # An entry is dropped as soon as its file changes
+        histos[0]["data"][1] = (histos[0]["data"][1][0] + 1.0, histos[0]["data"][1][1])
+        writer.write_histos(filename, histos)
+        os.utime(filename, (time.time() + 10, time.time() + 10))
+        self.check(SafIndex(path).Get(filename) is None, "a modified SAF file is served from the index")
+
+    def validate_merger(self, writer: SafWriter) -> None:
+        from madanalysis.IOinterface.saf_merger import SAFMerger
+        from madanalysis.IOinterface.saf_reader import SafHistoFile, SafReader
+
+        print("   * Merging the outputs of the shards of a dataset with SAFMerger")
+        names = ["ds_shard0", "ds_shard1", "ds_shard2"]
+        shards = [os.path.join(self.workdir, "merger", x) for x in names]
+        target = os.path.join(self.workdir, "merger", "ds")
+        contents = []
+        for i, (shard, name) in enumerate(zip(shards, names)):
+            os.makedirs(os.path.join(shard, "ana_0", "Histograms"))
+            os.makedirs(os.path.join(shard, "ana_0", "Cutflows"))
+            writer.write_sample(os.path.join(shard, name + ".saf"), [f"events_{i}.lhe"], [100 * (i + 1)])
+            histos = writer.histos() if i == 0 else self.same_layout(writer, contents[0][0])
+            counters = writer.cutflow(3)
+            writer.write_histos(os.path.join(shard, "ana_0", "Histograms", "histos.saf"), histos)
+            writer.write_cutflow(os.path.join(shard, "ana_0", "Cutflows", "SR1.saf"), counters)
+            contents.append((histos, counters))
+        self.check(SAFMerger.Merge(shards, names, target, "ds"), "the merging failed")
+
+        # Sample information
+        text = SafReader.Read(os.path.join(target, "ds.saf")) or ""
+        summary = SafReader.Numbers(SafReader.Blocks(text, "SampleGlobalInfo")[0], 5)[0]
+        self.check(summary[2] == 600, f"merged number of events {summary[2]} instead of 600")
+        files = SafReader.Lines(SafReader.Blocks(text, "FileInfo")[0])
+        self.check(files == [f"events_{i}.lhe" for i in range(3)], f"merged file list {files}")
+
+        # Histograms: statistics and bin contents summed, frequency labels merged
+        merged = list(SafHistoFile(os.path.join(target, "ana_0", "Histograms", "histos.saf")))
+        for j, histo in enumerate(merged):
+            shard_histos = [x[0][j] for x in contents]
+            reference = dict(shard_histos[0])
+            reference["statistics"] = np.sum([x["statistics"] for x in shard_histos], axis=0)
+            if reference["kind"] == "HistoFrequency":
+                stack = {}
+                for x in shard_histos:
+                    for label, pos, neg in x["data"]:
+                        stack[label] = np.add(stack.get(label, (0.0, 0.0)), (pos, neg))
+                reference["data"] = [(label,) + tuple(stack[label]) for label in sorted(stack)]
+            else:
+                reference["data"] = np.sum([x["data"] for x in shard_histos], axis=0)
+            self.compare(histo, reference, "merger, " + reference["name"])
+
+        # Cutflow counters summed
+        text = SafReader.Read(os.path.join(target, "ana_0", "Cutflows", "SR1.saf")) or ""
+        blocks = SafReader.Blocks(text, "InitialCounter") + SafReader.Blocks(text, "Counter")
+        counters = np.array(
+            [SafReader.Numbers("\n".join(SafReader.Lines(x)[1:]), 2)[:, 0] for x in blocks]
+        )
+        reference = np.sum([x[1] for x in contents], axis=0)
+        self.check(self.close(counters, reference), "merged cutflow counters")
+
+    @staticmethod
+    def same_layout(writer: SafWriter, histos: List[Dict]) -> List[Dict]:
+        """New contents for the histograms of another shard"""
+        result = []
+        for histo in histos:
+            if histo["kind"] == "HistoFrequency":
+                result.append(writer.frequency(histo["name"]))
+            else:
+                result.append(writer.histo(histo["kind"], histo["name"], histo["nbins"], histo["regions"]))
+        return result
+
+    def validate(self) -> bool:
+        """
+        Run the checks
+
+        Returns
+        -------
+        bool
+            True if all the contents are recovered within the SAF precision
+        """
+        PathHandler.add_ma5_to_path()
+        self.failures = []
+        if os.path.isdir(self.workdir):
+            shutil.rmtree(self.workdir)
+        writer = SafWriter(self.seed)
+        self.validate_reader(writer)
+        self.validate_index(writer)
+        self.validate_merger(writer)
+        return len(self.failures) == 0
@@ -0,0 +1,184 @@
+################################################################################
+#
+#  Copyright (C) 2012-2022 Jack Araz, Eric Conte & Benjamin Fuks
+#  The MadAnalysis development team, email: <ma5team@iphc.cnrs.fr>
+#
+#  This file is part of MadAnalysis 5.
+#  Official website: <https://github.com/MadAnalysis/madanalysis5>
+#
+#  MadAnalysis 5 is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  MadAnalysis 5 is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with MadAnalysis 5. If not, see <http://www.gnu.org/licenses/>
+#
+################################################################################
+
+
+import time
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ma5_validation.utils.path_handler import PathHandler
+
+# (nobs, nb, deltanb): from an empty region to a large background
+DEFAULT_POINTS = (
+    (0.0, 0.5, 0.2),
+    (3.0, 2.1, 0.8),
+    (12.0, 10.0, 3.0),
+    (50.0, 45.0, 9.0),
+    (180.0, 200.0, 20.0),
+)
+
+
+def legacy_cls(NumObserved, ExpectedBG, BGError, SigHypothesis, NumToyExperiments):
+    """
+    Per-call toy CLs calculator of MadAnalysis 5 v1.10 (``run_recast.cls``),
+    kept as the reference of the native CLs engine. Returns 1-CLs.
+    """
+    import scipy.stats
+
+    ExpectedBGs = scipy.stats.norm.rvs(loc=ExpectedBG, scale=BGError, size=NumToyExperiments)
+    ExpectedBGs = [value for value in ExpectedBGs if value > 0]
+    ToyBGs = scipy.stats.poisson.rvs(ExpectedBGs)
+    ToyBGs = list(map(float, ToyBGs))
+    p_b = scipy.stats.percentileofscore(ToyBGs, NumObserved, kind="weak") * 0.01
+
+    ExpectedBGandS = [expectedbg + SigHypothesis for expectedbg in ExpectedBGs]
+    ExpectedBGandS = [x for x in ExpectedBGandS if x > 0]
+    if len(ExpectedBGandS) == 0:
+        return 0.0
+    ToyBplusS = scipy.stats.poisson.rvs(ExpectedBGandS)
+    ToyBplusS = list(map(float, ToyBplusS))
+    p_SplusB = scipy.stats.percentileofscore(ToyBplusS, NumObserved, kind="weak") * 0.01
+
+    if p_SplusB > p_b:
+        return 0.0
+    return 1.0 - (p_SplusB / p_b)
+
+
+def legacy_s95(nobs, nb, deltanb, ntoys, cl=0.95):
+    """
+    Number of signal events excluded at the confidence level cl, obtained as
+    in MadAnalysis 5 v1.10 (bracketing and brentq on ``legacy_cls``).
+    """
+    import scipy.optimize
+
+    def sig95(nsignal):
+        return legacy_cls(nobs, nb, deltanb, nsignal, ntoys) - cl
+
+    low, high = 1.0, 1.0
+    while sig95(low) > 0.0:
+        low *= 0.1
+    while sig95(high) < 0.0:
+        high *= 10.0
+    return scipy.optimize.brentq(sig95, low, high, xtol=low / 100.0)
+
+
+class StatisticsRegression:
+    """
+    Compare the native toy CLs engine (``ToyCLsEngine.cls_batch`` and
+    ``toy_limits.upper_limits``) with the legacy per-call calculator.
+
+    Both calculators are Monte Carlo estimates: the legacy one draws new
+    toys at each call, so that the comparison holds within the statistical
+    precision of the toys. The checks are made deterministic by the seeds.
+
+    Parameters
+    ----------
+    points : Sequence[Tuple[float, float, float]]
+        (nobs, nb, deltanb) of the tested signal regions.
+    ntoys : int
+        Number of toy experiments of both calculators.
+    cls_tolerance : float
+        Maximal absolute difference on 1-CLs.
+    limit_tolerance : float
+        Maximal relative difference on the 95% CL upper limits.
+    seed : int
+        Seed of the toys.
+    """
+
+    def __init__(
+        self,
+        points: Sequence[Tuple[float, float, float]] = DEFAULT_POINTS,
+        ntoys: int = 100000,
+        cls_tolerance: float = 0.02,
+        limit_tolerance: float = 0.02,
+        seed: int = 12345,
+    ):
+        self.points = [tuple(float(x) for x in point) for point in points]
+        self.ntoys = ntoys
+        self.cls_tolerance = cls_tolerance
+        self.limit_tolerance = limit_tolerance
+        self.seed = seed
+        self.failures = []
+
+    def check(self, condition: bool, message: str) -> None:
+        if not condition:
+            self.failures.append(message)
+            print("     - FAILED: " + message)
+
+    def validate(self) -> bool:
+        """
+        Run the comparisons
+
+        Returns
+        -------
+        bool
+            True if all the differences are within the tolerances
+        """
+        PathHandler.add_ma5_to_path()
+        from madanalysis.misc.toy_cls import ToyCLsEngine
+        from madanalysis.misc.toy_limits import upper_limits
+
+        self.failures = []
+        engine = ToyCLsEngine(self.ntoys, seed=self.seed)
+        np.random.seed(self.seed)
+        nobs, nb, deltanb = [np.array(x) for x in zip(*self.points)]
+
+        # 1-CLs for a few signal hypotheses around the exclusion
+        print("   * Comparing 1-CLs with the legacy calculator")
+        start = time.time()
+        scales = np.array([1.0, 3.0, 10.0])
+        nsignal = np.outer(np.maximum(1.0, np.sqrt(nb)), scales)
+        batch = engine.cls_batch(nobs, nb, deltanb, nsignal)
+        for i, (n, b, db) in enumerate(self.points):
+            for j, s in enumerate(nsignal[i]):
+                single = engine(n, b, db, s)
+                self.check(
+                    abs(single - batch[i, j]) < 1e-12,
+                    f"batch and single evaluations differ for {(n, b, db, s)}: "
+                    f"{batch[i, j]} vs {single}",
+                )
+                reference = legacy_cls(n, b, db, s, self.ntoys)
+                self.check(
+                    abs(batch[i, j] - reference) <= self.cls_tolerance,
+                    f"1-CLs for {(n, b, db, s)}: {batch[i, j]:.4f} (legacy {reference:.4f})",
+                )
+        print(f"     - {nsignal.size} hypotheses compared in {time.time() - start:.1f} s")
+
+        # Upper limits on the number of signal events
+        print("   * Comparing the 95% CL upper limits with the legacy calculator")
+        start = time.time()
+        limits = upper_limits(engine, nobs, nb, deltanb)
+        for (n, b, db), limit in zip(self.points, limits):
+            self.check(
+                abs(engine(n, b, db, limit) - 0.95) < 1e-3,
+                f"1-CLs at the upper limit for {(n, b, db)}: {engine(n, b, db, limit):.5f}",
+            )
+            reference = legacy_s95(n, b, db, self.ntoys)
+            self.check(
+                abs(limit - reference) <= self.limit_tolerance * reference,
+                f"upper limit for {(n, b, db)}: {limit:.4f} (legacy {reference:.4f})",
+            )
+        print(f"     - {len(self.points)} limits compared in {time.time() - start:.1f} s")
+
+        return len(self.failures) == 0
@@ -104,26 +104,34 @@ class PathHandler:
         PathHandler.LOGPATH = logpath
 
     @staticmethod
-    def check_ma5_setup():
+    def add_ma5_to_path() -> None:
         """
-        Check current MadAnalysis Architecture
-
-        Returns
-        -------
-        session and architecture info
+        Make the MadAnalysis 5 modules importable
         """
         if not os.path.isdir(PathHandler.MA5PATH):
             raise InvalidMadAnalysisPath(
                 "Detected MadAnalysis 5 general folder is not correct: " + PathHandler.MA5PATH
             )
         os.environ["MA5_BASE"] = PathHandler.MA5PATH
-        sys.path.insert(0, PathHandler.MA5PATH)
         servicedir = os.path.join(PathHandler.MA5PATH, "tools/ReportGenerator/Services")
         if not os.path.isdir(servicedir):
             raise InvalidMadAnalysisPath(
                 "Detected MadAnalysis 5 service folder is not correct: " + PathHandler.MA5PATH
             )
-        sys.path.insert(0, servicedir)
+        for path in [PathHandler.MA5PATH, servicedir]:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+
+    @staticmethod
+    def check_ma5_setup():
+        """
+        Check current MadAnalysis Architecture
+
+        Returns
+        -------
+        session and architecture info
+        """
+        PathHandler.add_ma5_to_path()
         from madanalysis.core.main import Main as ma5_main
 
         curdir = os.getcwd()